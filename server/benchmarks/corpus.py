@@ -0,0 +1,147 @@
+
+import os
+import random
+import zipfile
+from typing import Dict, List, Sequence
+from xml.sax.saxutils import escape
+
+# A small vocabulary with a Zipf-like draw so term frequencies resemble real text.
+VOCABULARY = (
+    "the of and to in is that for it as was with be by on not he this are or his from at which but have "
+    "an had they you were their one all we can her has there been if more when will would who so no "
+    "cell energy protein membrane enzyme reaction molecule structure function process system theory "
+    "equation variable model data analysis result method experiment sample measurement error value "
+    "history empire trade policy economy market capital labour revolution culture society government "
+    "algorithm network memory processor compiler function recursion graph matrix vector gradient"
+).split()
+
+def _zipf_words(rng: random.Random, count: int) -> List[str]:
+    weights = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+    return rng.choices(VOCABULARY, weights=weights, k=count)
+
+def generate_paragraphs(size_chars: int, seed: int = 0) -> List[str]:
+    """Generates deterministic pseudo-text paragraphs totalling roughly `size_chars` characters."""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size_chars:
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            words = _zipf_words(rng, rng.randint(8, 20))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return paragraphs
+
+def write_txt(path: str, paragraphs: Sequence[str]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
+
+def write_md(path: str, paragraphs: Sequence[str]):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, paragraph in enumerate(paragraphs):
+            if i % 5 == 0:
+                f.write(f"## Section {i // 5 + 1}\n\n")
+            f.write(paragraph + "\n\n")
+
+def write_pdf(path: str, paragraphs: Sequence[str], lines_per_page: int = 45, line_chars: int = 90):
+    """Writes a minimal, valid PDF with one Helvetica text stream per page."""
+    lines = []
+    for paragraph in paragraphs:
+        words, line = paragraph.split(), ""
+        for word in words:
+            if len(line) + len(word) + 1 > line_chars:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}".strip()
+        lines.extend([line, ""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    def pdf_escape(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page_lines in zip(page_ids, pages):
+        content = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({pdf_escape(line)}) Tj T*" for line in page_lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        stream = content.encode("latin-1", "replace")
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_docx(path: str, paragraphs: Sequence[str]):
+    """Writes a minimal DOCX containing only the parts docx2txt needs."""
+    body = "".join(f"<w:p><w:r><w:t>{escape(paragraph)}</w:t></w:r></w:p>" for paragraph in paragraphs)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", rels)
+        archive.writestr("word/document.xml", document)
+
+WRITERS = {
+    ".txt": write_txt,
+    ".md": write_md,
+    ".pdf": write_pdf,
+    ".docx": write_docx,
+}
+
+def generate_corpus(out_dir: str, sizes: Sequence[int], formats: Sequence[str] = tuple(WRITERS), seed: int = 0) -> List[Dict]:
+    """
+    Writes one synthetic document per (size, format) pair into `out_dir`.
+
+    Args:
+        out_dir: Directory to write the documents into.
+        sizes: Approximate document sizes in characters.
+        formats: File extensions to generate, from WRITERS.
+        seed: Seed for the text generator; the same seed yields the same corpus.
+
+    Returns:
+        A list of dicts with 'path', 'format' and 'size' for each document.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    corpus = []
+    for size in sizes:
+        paragraphs = generate_paragraphs(size, seed=seed + size)
+        for ext in formats:
+            path = os.path.join(out_dir, f"synthetic_{size}{ext}")
+            WRITERS[ext](path, paragraphs)
+            corpus.append({"path": path, "format": ext, "size": size})
+    return corpus
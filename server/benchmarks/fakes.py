@@ -0,0 +1,128 @@
+
+import hashlib
+import json
+import re
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_DIM = 384
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def _hashed_vector(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Deterministic bag-of-words embedding using the hashing trick."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
+class FakeEmbeddings:
+    """Drop-in for SentenceTransformerEmbeddings that needs no downloaded model."""
+    def __init__(self, model_name: str = "fake", **kwargs):
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [_hashed_vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return _hashed_vector(text)
+
+class FakeCrossEncoder:
+    """Drop-in for sentence_transformers.CrossEncoder scoring pairs by token overlap."""
+    def __init__(self, model_name: str = "fake", **kwargs):
+        self.model_name = model_name
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], **kwargs):
+        scores = []
+        for query, text in pairs:
+            query_tokens = set(TOKEN_PATTERN.findall(query.lower()))
+            text_tokens = set(TOKEN_PATTERN.findall(text.lower()))
+            scores.append(len(query_tokens & text_tokens) / (len(query_tokens) or 1))
+        return np.asarray(scores, dtype=np.float32)
+
+class StubLLM:
+    """
+    A local stand-in for the Gemini model with configurable latency.
+
+    It reads the instructions the pipeline puts in its prompts (quiz question
+    counts, flashcard counts and batched task ids) and answers with well-formed
+    JSON of the requested shape, so downstream parsing runs as in production.
+    """
+    QUIZ_PATTERN = re.compile(r"quiz with (\d+) questions")
+    FLASHCARD_PATTERN = re.compile(r"Generate (\d+) flashcards")
+    TASK_PATTERN = re.compile(r"^- (task_\d+): (.+)$", re.MULTILINE)
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def _items_for(self, instruction: str):
+        match = self.QUIZ_PATTERN.search(instruction)
+        if match:
+            return [
+                {
+                    "question": f"Stub question {i + 1}?",
+                    "options": ["A", "B", "C", "D"],
+                    "answer": "A",
+                }
+                for i in range(int(match.group(1)))
+            ]
+        match = self.FLASHCARD_PATTERN.search(instruction)
+        if match:
+            return [{"front": f"Stub term {i + 1}", "back": "Stub definition"} for i in range(int(match.group(1)))]
+        return None
+
+    def complete(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        tasks = self.TASK_PATTERN.findall(prompt)
+        if tasks:
+            return json.dumps({task_id: self._items_for(instruction) or [] for task_id, instruction in tasks})
+        items = self._items_for(prompt)
+        if items is not None:
+            return "```json\n" + json.dumps(items) + "\n```"
+        return "This is a stub answer."
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class _StubGenerativeModel:
+    llm: StubLLM = StubLLM()
+
+    def __init__(self, model_name: str, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, **kwargs):
+        return _StubResponse(self.llm.complete(prompt))
+
+def install(llm_latency: float = 0.0) -> StubLLM:
+    """
+    Replaces the embedding model, cross-encoder and Gemini client with fakes.
+
+    Must be called before any `src` module is imported, since those modules
+    load their models at import time.
+
+    Returns:
+        The StubLLM answering all LLM calls, for inspecting call counts.
+    """
+    import google.generativeai as genai
+    import langchain_community.embeddings
+    import sentence_transformers
+
+    langchain_community.embeddings.SentenceTransformerEmbeddings = FakeEmbeddings
+    sentence_transformers.CrossEncoder = FakeCrossEncoder
+
+    llm = StubLLM(latency=llm_latency)
+    _StubGenerativeModel.llm = llm
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = _StubGenerativeModel
+    return llm
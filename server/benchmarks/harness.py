@@ -0,0 +1,171 @@
+
+import json
+import math
+import resource
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+@dataclass
+class BenchmarkResult:
+    """Timing and memory figures for one benchmark case."""
+    name: str
+    iterations: int
+    items: int
+    throughput: float  # items per second
+    p50_ms: float
+    p99_ms: float
+    peak_rss_mb: float  # the whole process's high-water mark so far
+    rss_increase_mb: float = 0.0  # peak RSS while this case ran, above the RSS it started at
+
+# Growth in a case's RSS increase below this many MiB is treated as noise
+RSS_SLACK_MB = 1.0
+
+def peak_rss_mb() -> float:
+    """Returns the process's peak resident set size in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def current_rss_mb() -> Optional[float]:
+    """Returns the process's current resident set size in MiB, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+class RssMonitor:
+    """
+    Measures how far RSS rises above its starting point while a block runs.
+
+    Current RSS is sampled on a background thread. Without /proc, the growth
+    of the process's high-water mark is used instead, which only shows cases
+    that use more memory than any case before them.
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.increase_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while True:
+            rss = current_rss_mb()
+            if rss is not None:
+                self._peak = max(self._peak, rss)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self) -> "RssMonitor":
+        current = current_rss_mb()
+        self._sampling = current is not None
+        self._start = current if self._sampling else peak_rss_mb()
+        self._peak = self._start
+        if self._sampling:
+            self._thread = threading.Thread(target=self._sample, name="rss-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        else:
+            self._peak = peak_rss_mb()
+        self.increase_mb = max(0.0, self._peak - self._start)
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def measure(name: str, fn: Callable[[], Optional[int]], iterations: int = 20, warmup: int = 2) -> BenchmarkResult:
+    """
+    Runs `fn` repeatedly and records per-call latency and how much the
+    process's RSS rose while the case ran (warm-up included).
+
+    Args:
+        name: The benchmark case name.
+        fn: The operation to time. May return the number of items it
+            processed (e.g. chunks); otherwise one item per call is assumed.
+        iterations: Number of timed calls.
+        warmup: Number of untimed calls made first.
+
+    Returns:
+        A BenchmarkResult for the case.
+    """
+    samples = []
+    items = 0
+    with RssMonitor() as rss:
+        for _ in range(warmup):
+            fn()
+
+        for _ in range(iterations):
+            start = time.perf_counter()
+            processed = fn()
+            samples.append(time.perf_counter() - start)
+            items += processed if processed is not None else 1
+
+    total = sum(samples)
+    return BenchmarkResult(
+        name=name,
+        iterations=iterations,
+        items=items,
+        throughput=items / total if total > 0 else float("inf"),
+        p50_ms=percentile(samples, 50) * 1000,
+        p99_ms=percentile(samples, 99) * 1000,
+        peak_rss_mb=peak_rss_mb(),
+        rss_increase_mb=rss.increase_mb,
+    )
+
+def save_results(path: str, results: List[BenchmarkResult]):
+    with open(path, "w") as f:
+        json.dump({result.name: asdict(result) for result in results}, f, indent=2, sort_keys=True)
+
+def load_results(path: str) -> Dict[str, Dict]:
+    with open(path) as f:
+        return json.load(f)
+
+def compare_to_baseline(results: List[BenchmarkResult], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """
+    Compares results against a saved baseline.
+
+    A case regresses if its p50 or p99 latency grew, or its throughput fell,
+    by more than `tolerance` (a fraction, e.g. 0.2 for 20%), or if its RSS
+    increase grew by more than `tolerance` plus RSS_SLACK_MB.
+
+    Returns:
+        A list of human-readable regression descriptions; empty if none.
+    """
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if base[metric] > 0 and getattr(result, metric) > base[metric] * (1 + tolerance):
+                regressions.append(f"{result.name}: {metric} {getattr(result, metric):.2f} vs baseline {base[metric]:.2f}")
+        if result.throughput < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{result.name}: throughput {result.throughput:.1f}/s vs baseline {base['throughput']:.1f}/s")
+        base_rss = base.get("rss_increase_mb")
+        if base_rss is not None and result.rss_increase_mb > base_rss * (1 + tolerance) + RSS_SLACK_MB:
+            regressions.append(f"{result.name}: RSS increase {result.rss_increase_mb:.1f} MiB vs baseline {base_rss:.1f} MiB")
+    return regressions
+
+def format_table(results: List[BenchmarkResult], baseline: Optional[Dict[str, Dict]] = None) -> str:
+    header = f"{'benchmark':<32} {'items/s':>12} {'p50 ms':>10} {'p99 ms':>10} {'+RSS MiB':>10} {'peak MiB':>10} {'vs p50':>8}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        change = ""
+        base = (baseline or {}).get(result.name)
+        if base and base["p50_ms"] > 0:
+            change = f"{(result.p50_ms / base['p50_ms'] - 1) * 100:+.0f}%"
+        lines.append(
+            f"{result.name:<32} {result.throughput:>12.1f} {result.p50_ms:>10.2f} {result.p99_ms:>10.2f} {result.rss_increase_mb:>10.1f} {result.peak_rss_mb:>10.1f} {change:>8}"
+        )
+    return "\n".join(lines)
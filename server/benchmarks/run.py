@@ -0,0 +1,193 @@
+"""
+Benchmarks the ingestion, retrieval and generation paths with fake models.
+
+Usage (from the `server` directory):
+
+    python -m benchmarks.run                      # run and compare with baseline.json
+    python -m benchmarks.run --update-baseline    # run and save as the new baseline
+    python -m benchmarks.run --sizes 5000,50000 --llm-latency 0.2 --only retrieve,end_to_end
+
+Exits with status 1 if any case regresses beyond --tolerance.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from . import fakes
+from .corpus import VOCABULARY, WRITERS, generate_corpus
+from .harness import compare_to_baseline, format_table, load_results, measure, save_results
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="2000,20000,200000", help="Comma-separated document sizes in characters.")
+    parser.add_argument("--formats", default=",".join(WRITERS), help="Comma-separated file extensions to generate.")
+    parser.add_argument("--iterations", type=int, default=10, help="Timed iterations per case.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds the stub LLM sleeps per call.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus and queries.")
+    parser.add_argument("--only", default="", help="Comma-separated case name prefixes to run.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results file.")
+    parser.add_argument("--update-baseline", action="store_true", help="Save this run as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed fractional regression.")
+    parser.add_argument("--output", help="Also write this run's results to this file.")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    formats = [fmt if fmt.startswith(".") else f".{fmt}" for fmt in args.formats.split(",")]
+    only = [prefix for prefix in args.only.split(",") if prefix]
+    rng = random.Random(args.seed)
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    def selected(name: str) -> bool:
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    # Isolate all on-disk state (vector store, uploads) in a scratch directory.
+    workdir = tempfile.mkdtemp(prefix="contextiq-bench-")
+    os.environ["PERSIST_DIRECTORY"] = os.path.join(workdir, "db")
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    llm = fakes.install(llm_latency=args.llm_latency)
+    corpus = generate_corpus(os.path.join(workdir, "corpus"), sizes, formats, seed=args.seed)
+    sys.path.insert(0, SERVER_DIR)
+    os.chdir(workdir)
+
+    from fastapi import UploadFile
+    from src.pipeline.ingestion.file_processor import extract_and_chunk_file
+    from src.pipeline.llm.safety_filter import filter_safety
+    from src.pipeline.retrieval.context_assembler import assemble_context
+    from src.pipeline.retrieval.ranker import rerank_results
+    from src.stores.vector_store import embed_and_store, embed_and_store_batch, retrieve
+
+    def chunk_file(path: str):
+        with open(path, "rb") as f:
+            return asyncio.run(extract_and_chunk_file(UploadFile(filename=os.path.basename(path), file=f)))
+
+    def random_query() -> str:
+        return " ".join(rng.choices(VOCABULARY, k=6))
+
+    results = []
+
+    for doc in corpus:
+        name = f"extract_and_chunk_file[{doc['format'][1:]}-{doc['size']}]"
+        if selected(name):
+            results.append(measure(name, lambda path=doc["path"]: len(chunk_file(path)), iterations=args.iterations))
+
+    store_counter = 0
+    for size in sizes:
+        txt_path = next(doc["path"] for doc in corpus if doc["size"] == size and doc["format"] == formats[0])
+        chunks = chunk_file(txt_path)
+        doc_id = f"bench_{size}"
+
+        def store_all(chunks=chunks, doc_id=doc_id):
+            nonlocal store_counter
+            store_counter += 1
+            for chunk in chunks:
+                metadata = {"doc_id": doc_id, "source": "bench", "paragraph_id": chunk["paragraph_id"]}
+                embed_and_store(chunk["text"], metadata, f"{doc_id}_{store_counter}_{chunk['paragraph_id']}")
+            return len(chunks)
+
+        name = f"embed_and_store[{size}]"
+        if selected(name):
+            results.append(measure(name, store_all, iterations=max(1, args.iterations // 5), warmup=0))
+        else:
+            store_all()
+
+        def store_batched(chunks=chunks, doc_id=doc_id):
+            nonlocal store_counter
+            store_counter += 1
+            embed_and_store_batch(
+                [chunk["text"] for chunk in chunks],
+                [{"doc_id": doc_id, "source": "bench", "paragraph_id": chunk["paragraph_id"]} for chunk in chunks],
+                [f"{doc_id}_{store_counter}_{chunk['paragraph_id']}" for chunk in chunks],
+            )
+            return len(chunks)
+
+        name = f"embed_and_store_batch[{size}]"
+        if selected(name):
+            results.append(measure(name, store_batched, iterations=max(1, args.iterations // 5), warmup=0))
+
+        name = f"retrieve[{size}]"
+        if selected(name):
+            results.append(measure(name, lambda doc_id=doc_id: retrieve(random_query(), k=10, filter={"doc_id": doc_id}) and None, iterations=args.iterations))
+
+        name = f"retrieve_mmr[{size}]"
+        if selected(name):
+            results.append(measure(name, lambda doc_id=doc_id: retrieve(random_query(), k=10, filter={"doc_id": doc_id}, mmr=True, fetch_k=50) and None, iterations=args.iterations))
+
+        retrieved = retrieve(random_query(), k=10, filter={"doc_id": doc_id})
+        name = f"rerank_results[{size}]"
+        if selected(name):
+            def rerank(retrieved=retrieved):
+                docs = [dict(doc) for doc in retrieved["results"]]
+                rerank_results({"results": docs, "query": random_query()})
+                return len(docs)
+            results.append(measure(name, rerank, iterations=args.iterations))
+
+        name = f"assemble_context[{size}]"
+        if selected(name):
+            results.append(measure(name, lambda retrieved=retrieved: len(assemble_context(retrieved)), iterations=args.iterations))
+
+        name = f"filter_safety[{size}]"
+        if selected(name):
+            text = "\n".join(chunk["text"] for chunk in chunks)
+            results.append(measure(name, lambda text=text: filter_safety(text, method="redact") and None, iterations=args.iterations))
+
+    if selected("end_to_end"):
+        from fastapi.testclient import TestClient
+        from src import main as app_main
+
+        client = TestClient(app_main.app)
+        e2e_doc = next(doc for doc in corpus if doc["format"] == formats[0])
+
+        def end_to_end():
+            with open(e2e_doc["path"], "rb") as f:
+                upload = client.post(
+                    "/documents",
+                    files={"file": (os.path.basename(e2e_doc["path"]), f)},
+                    headers={"session-id": "bench"},
+                )
+            doc_id = upload.json()["doc_id"]
+            app_main.process_document_background(doc_id)
+            quiz_id = client.post(f"/documents/{doc_id}/quiz", json={}).json()["quiz_id"]
+            deadline = time.monotonic() + 60
+            while time.monotonic() < deadline:
+                status = client.get(f"/quiz/{quiz_id}/status").json()["status"]
+                if status in ("READY", "FAILED"):
+                    if status == "FAILED":
+                        raise RuntimeError(f"Quiz {quiz_id} failed during benchmark.")
+                    return None
+                time.sleep(0.01)
+            raise TimeoutError(f"Quiz {quiz_id} did not finish within 60s.")
+
+        results.append(measure("end_to_end[upload->processed->quiz]", end_to_end, iterations=max(1, args.iterations // 2), warmup=1))
+
+    baseline = load_results(baseline_path) if os.path.exists(baseline_path) else None
+    print(format_table(results, baseline))
+    print(f"\nStub LLM calls: {llm.calls}; scratch directory: {workdir}")
+
+    if output_path:
+        save_results(output_path, results)
+    if args.update_baseline:
+        save_results(baseline_path, results)
+        print(f"Saved baseline to {baseline_path}")
+        return 0
+    if baseline is None:
+        print("No baseline found; run with --update-baseline to create one.")
+        return 0
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
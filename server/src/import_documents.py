@@ -0,0 +1,77 @@
+"""
+Imports a local directory tree of documents without going through the API.
+
+Usage (from the `server` directory):
+
+    python -m src.import_documents /path/to/course --session-id <session_id>
+
+Documents are processed in parallel on the same extraction and batched
+embedding path as POST /documents/bulk. Vectors are written to the persistent
+vector store, and the document records are appended to IMPORT_MANIFEST_PATH,
+which the server loads on startup.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+from . import main as app_main
+from .pipeline.ingestion.bulk import iter_directory_files
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Directory to import recursively.")
+    parser.add_argument("--session-id", default=None, help="Session the documents belong to.")
+    parser.add_argument("--manifest", default=app_main.IMPORT_MANIFEST_PATH, help="Manifest file to append document records to.")
+    parser.add_argument("--progress-interval", type=float, default=2.0, help="Seconds between progress lines.")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    paths = list(iter_directory_files(args.directory))
+    if not paths:
+        print(f"No supported documents found under {args.directory}.")
+        return 1
+
+    # Offline imports reference the files in place rather than copying them into the upload directory.
+    doc_ids = []
+    for path in paths:
+        doc_id = str(uuid.uuid4())
+        app_main.metadata_store.add_document(
+            doc_id, os.path.basename(path), os.path.abspath(path), args.session_id, status="QUEUED"
+        )
+        doc_ids.append(doc_id)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+
+    batch = app_main.start_ingestion_batch(doc_ids, total_bytes)
+    while not batch.done:
+        time.sleep(args.progress_interval)
+        progress = batch.progress()
+        print(
+            f"{progress['processed'] + progress['failed']}/{progress['total']} documents "
+            f"({progress['failed']} failed), {progress['chunks']} chunks, "
+            f"{progress['documents_per_second']} docs/s, {progress['chunks_per_second']} chunks/s"
+        )
+
+    progress = batch.progress()
+    print(
+        f"Imported {progress['processed']} of {progress['total']} documents in {progress['elapsed_seconds']}s "
+        f"({progress['megabytes_per_second']} MB/s, {progress['chunks']} chunks)."
+    )
+
+    records = []
+    if os.path.exists(args.manifest):
+        with open(args.manifest) as f:
+            records = json.load(f)
+    records.extend(app_main.metadata_store.export_documents(doc_ids))
+    os.makedirs(os.path.dirname(args.manifest) or ".", exist_ok=True)
+    with open(args.manifest, "w") as f:
+        json.dump(records, f)
+    print(f"Wrote {len(doc_ids)} document records to {args.manifest}.")
+    return 0 if progress["failed"] == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
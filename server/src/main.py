@@ -7,25 +7,42 @@ import uuid
 import json
 import asyncio
 import hashlib
+import hmac
+import math
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Header, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Header, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
 from .stores.metadata_store import MetadataStore
-from .stores.vector_store import embed_and_store, retrieve
+from .stores.vector_store import embed_and_store_batch, embed_texts, retrieve, delete_document as delete_document_vectors
+from .stores.lifecycle import Compactor, delete_raw_upload
 from .pipeline.ingestion.file_processor import extract_and_chunk_file
 from .pipeline.ingestion import storage as ingestion_storage
 from .pipeline.ingestion import validator as ingestion_validator
-from .pipeline.llm.prompt_composer import compose_prompt
+from .pipeline.ingestion.bulk import BatchRegistry, IngestionBatch, is_archive, iter_archive_members
+from .pipeline.llm.prompt_composer import compose_prompt, compose_batch_prompt, compose_generation_instruction
+from .pipeline.llm.generation_coordinator import GenerationCoordinator, GenerationJob
 from .pipeline.llm.llm_invoker import invoke_llm
+from .pipeline.llm.map_reduce import MapExecutor, item_text, partition_sections, reduce_candidates
+from .pipeline.llm import structured_output
+from .pipeline.llm.structured_output import StructuredOutputError, extract_items, parse_json_tolerant, validate_items
+from .pipeline.llm.precompute import Precomputer, PrecomputeTask
 from .pipeline.retrieval.context_assembler import assemble_context
+from .pipeline.retrieval.pagination import CursorExpiredError
+from .pipeline.retrieval.query_validator import validate_query
+from .pipeline.shared.metrics import REGISTRY, EXECUTOR_QUEUE_DEPTH, GENERATION_JOBS, IN_FLIGHT_JOBS
+from .pipeline.shared import profiling
+from .pipeline.shared.logging_config import Payload, configure_logging
 
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configure logging: queue-based, written by a background thread, levels from LOG_LEVEL/LOG_LEVELS
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -44,12 +61,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Token required by the /admin endpoints and to force profiling; without it they are disabled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+def _is_admin(admin_token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and admin_token is not None and hmac.compare_digest(admin_token, ADMIN_TOKEN)
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """Profiles a request when it is sampled, or carries the x-profile header with a valid admin token."""
+    forced = request.headers.get(profiling.PROFILE_HEADER) == "1" and _is_admin(request.headers.get("admin-token"))
+    if not forced and request.url.path.startswith(("/admin", "/metrics")):
+        return await call_next(request)
+    # Handlers may run on the event loop or a worker thread, so sample all threads.
+    with profiling.profile(f"{request.method} {request.url.path}", forced=forced, mode="sampling") as captured:
+        response = await call_next(request)
+    if captured is not None:
+        response.headers["x-profile-id"] = captured.profile_id
+    return response
+
 metadata_store = MetadataStore()
 
 # Background executor for processing-intensive tasks
 executor = ThreadPoolExecutor(max_workers=os.cpu_count())
 loop = asyncio.get_event_loop()
 
+# Where raw uploads are stored, and where offline imports record their documents
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "server/uploads")
+IMPORT_MANIFEST_PATH = os.environ.get("IMPORT_MANIFEST_PATH", "server/db/import_manifest.json")
+_manifest_lock = threading.Lock()
+
+# Retention of raw uploads ("keep" or "delete_processed"), plus memory/disk budgets enforced by the compactor
+UPLOAD_RETENTION = os.environ.get("UPLOAD_RETENTION", "keep")
+UPLOAD_RETENTION_SECONDS = float(os.environ.get("UPLOAD_RETENTION_SECONDS", 3600))
+ARTIFACT_MEMORY_BUDGET_MB = float(os.environ.get("ARTIFACT_MEMORY_BUDGET_MB", 256))
+DISK_BUDGET_MB = float(os.environ.get("DISK_BUDGET_MB", 0))
+COMPACTION_INTERVAL_SECONDS = float(os.environ.get("COMPACTION_INTERVAL_SECONDS", 300))
+compactor = Compactor(
+    metadata_store,
+    UPLOAD_DIR,
+    upload_retention=UPLOAD_RETENTION,
+    upload_grace_seconds=UPLOAD_RETENTION_SECONDS,
+    memory_budget_bytes=int(ARTIFACT_MEMORY_BUDGET_MB * 1024 * 1024),
+    disk_budget_bytes=int(DISK_BUDGET_MB * 1024 * 1024),
+)
+
+# Bulk ingestion batches, for progress reporting
+ingestion_batches = BatchRegistry()
+# Size caps enforced while bulk uploads are streamed to disk, so archives cannot expand without bound
+BULK_MAX_FILE_MB = float(os.environ.get("BULK_MAX_FILE_MB", 100))
+BULK_MAX_TOTAL_MB = float(os.environ.get("BULK_MAX_TOTAL_MB", 1024))
+
+# Map-reduce generation settings for large documents
+MAP_REDUCE_MIN_CHUNKS = int(os.environ.get("MAP_REDUCE_MIN_CHUNKS", 30))
+MAP_REDUCE_SECTION_CHUNKS = int(os.environ.get("MAP_REDUCE_SECTION_CHUNKS", 10))
+# Sections grow up to this many chunks so large documents are covered rather than sampled
+MAP_REDUCE_MAX_SECTION_CHUNKS = int(os.environ.get("MAP_REDUCE_MAX_SECTION_CHUNKS", 25))
+MAP_REDUCE_MAX_SECTIONS = int(os.environ.get("MAP_REDUCE_MAX_SECTIONS", 8))
+MAP_REDUCE_OVERSAMPLE = float(os.environ.get("MAP_REDUCE_OVERSAMPLE", 1.5))
+MAP_REDUCE_SIMILARITY_THRESHOLD = float(os.environ.get("MAP_REDUCE_SIMILARITY_THRESHOLD", 0.9))
+map_executor = MapExecutor(max_concurrency=int(os.environ.get("MAP_REDUCE_CONCURRENCY", 8)))
+
+# Follow-up calls asking only for the items a short or truncated response is missing
+STRUCTURED_MAX_CONTINUATIONS = int(os.environ.get("STRUCTURED_MAX_CONTINUATIONS", 1))
+
 # --- Request/Response Models ---
 
 class DocumentMetadata(BaseModel):
@@ -65,6 +140,58 @@ class DocumentUploadResponse(BaseModel):
     doc_id: str
     status: str
 
+class BulkUploadResponse(BaseModel):
+    batch_id: str
+    status: str
+    doc_ids: List[str]
+    skipped: List[str]
+    errors: List[str]
+
+class IngestionBatchResponse(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+    processed: int
+    failed: int
+    chunks: int
+    bytes: int
+    elapsed_seconds: float
+    documents_per_second: float
+    chunks_per_second: float
+    megabytes_per_second: float
+    doc_ids: List[str]
+
+class DocumentDeleteResponse(BaseModel):
+    doc_id: str
+    status: str
+    chunks_deleted: int
+    vectors_deleted: int
+    artifacts_deleted: int
+    bytes_freed: int
+
+class SearchRequest(BaseModel):
+    query: Optional[str] = Field(None, description="Search query; not needed when passing a cursor")
+    doc_id: Optional[str] = Field(None, description="Restrict the search to one document instead of the whole session")
+    k: int = Field(5, ge=1, le=50, description="Number of results per page")
+    mmr: bool = Field(True, description="Diversify results with maximal marginal relevance")
+    lambda_mult: float = Field(0.5, ge=0.0, le=1.0, description="MMR trade-off between relevance (1) and diversity (0)")
+    fetch_k: int = Field(50, ge=1, le=200, description="Number of results ranked and available through pagination")
+    cursor: Optional[str] = Field(None, description="next_cursor from a previous search, to fetch its next page")
+
+class SearchResponse(BaseModel):
+    results: List[Dict]
+    next_cursor: Optional[str] = None
+
+class SummaryCreateResponse(BaseModel):
+    doc_id: str
+    status: str
+
+class SummaryStatusResponse(BaseModel):
+    doc_id: str
+    status: str
+    summary: Optional[str] = None
+    key_points: Optional[List[Dict]] = None
+
 class QuizRequest(BaseModel):
     difficulty: str = Field("medium", description="Difficulty of the quiz")
     question_count: int = Field(5, ge=1, le=20, description="Number of questions")
@@ -94,15 +221,21 @@ class FlashcardStatusResponse(BaseModel):
 
 # --- Background Processing Functions ---
 
+def _profile_requested_by_client() -> bool:
+    """True when the current request is being profiled because it asked to be."""
+    captured = profiling.current_profile()
+    return captured is not None and captured.forced
+
+@profiling.profiled("process_document_background", keys=lambda doc_id: [doc_id])
 def process_document_background(doc_id: str):
     """Background task to process a single document."""
     try:
         doc_info = metadata_store.get_document(doc_id)
         if not doc_info:
-            logger.error(f"[Worker] Document {doc_id} not found.")
+            logger.error("[Worker] Document %s not found.", doc_id)
             return
 
-        logger.info(f"[Worker] Starting processing for document: {doc_id}")
+        logger.info("[Worker] Starting processing for document: %s", doc_id)
         metadata_store.update_document_status(doc_id, "PROCESSING")
 
         # 1. Extract and chunk file
@@ -112,170 +245,462 @@ def process_document_background(doc_id: str):
 
         if not chunks:
             metadata_store.update_document_status(doc_id, "FAILED")
-            logger.error(f"[Worker] Failed to extract chunks from {doc_id}.")
+            logger.error("[Worker] Failed to extract chunks from %s.", doc_id)
             return
 
-        # 2. Store chunks and generate embeddings
-        for chunk in chunks:
-            chunk_id = f"{doc_id}_{chunk['paragraph_id']}"
-            chunk_metadata = {
-                "doc_id": doc_id,
-                "source": doc_info['filename'],
-                "paragraph_id": chunk["paragraph_id"],
-            }
-            embed_and_store(chunk['text'], chunk_metadata, chunk_id)
+        # 2. Store chunks and generate embeddings in batches
+        embed_and_store_batch(
+            [chunk['text'] for chunk in chunks],
+            [
+                {
+                    "doc_id": doc_id,
+                    "source": doc_info['filename'],
+                    "paragraph_id": chunk["paragraph_id"],
+                    # Page numbers (PDF) and heading paths (Markdown) only exist for some file types
+                    **{key: chunk[key] for key in ("page", "page_end", "section") if key in chunk},
+                }
+                for chunk in chunks
+            ],
+            [f"{doc_id}_{chunk['paragraph_id']}" for chunk in chunks],
+        )
 
         metadata_store.add_chunks(doc_id, chunks)
         metadata_store.update_document_status(doc_id, "PROCESSED")
-        logger.info(f"[Worker] Successfully processed document: {doc_id}")
+        logger.info("[Worker] Successfully processed document: %s", doc_id)
+        schedule_precompute(doc_info)
 
     except Exception as e:
         metadata_store.update_document_status(doc_id, "FAILED")
-        logger.error(f"[Worker] Error processing document {doc_id}: {e}", exc_info=True)
-
-def generate_quiz_background(quiz_id: str):
-    """Background task to generate a quiz."""
-    logger.debug(f"[QuizWorker] Starting quiz generation for quiz_id: {quiz_id}")
+        logger.error("[Worker] Error processing document %s: %s", doc_id, e, exc_info=True)
+
+def _process_batch_document(batch: IngestionBatch, doc_id: str):
+    """Processes one document of an ingestion batch and records the outcome on the batch."""
+    process_document_background(doc_id)
+    doc_info = metadata_store.get_document(doc_id) or {}
+    succeeded = doc_info.get('status') == "PROCESSED"
+    size_bytes = os.path.getsize(doc_info['file_path']) if doc_info.get('file_path') and os.path.exists(doc_info['file_path']) else 0
+    batch.record(succeeded, len(metadata_store.get_chunks(doc_id) or []), size_bytes)
+    if batch.done:
+        logger.info("[BulkWorker] Batch %s finished: %s", batch.batch_id, batch.progress())
+
+def start_ingestion_batch(doc_ids: List[str], total_bytes: int) -> IngestionBatch:
+    """
+    Queues already registered documents for parallel processing on the
+    background executor and returns a batch tracking their progress.
+
+    The documents must have been registered with status 'QUEUED' so the
+    polling worker never picks them up a second time.
+    """
+    batch = IngestionBatch(doc_ids, total_bytes)
+    ingestion_batches.add(batch)
+    for doc_id in doc_ids:
+        executor.submit(_process_batch_document, batch, doc_id)
+    logger.info("[BulkWorker] Started batch %s with %s documents", batch.batch_id, len(doc_ids))
+    return batch
+
+def _store_upload(stream, filename: str, session_id: Optional[str], max_bytes: Optional[int] = None, status: str = "UPLOADED") -> Tuple[str, int]:
+    """Saves a raw document stream to the upload directory and registers it with `status`; returns (doc_id, bytes)."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    doc_id = str(uuid.uuid4())
+    file_path = os.path.join(UPLOAD_DIR, f"{doc_id}_{filename}")
+    size_bytes = ingestion_storage.save_raw_stream(stream, file_path, max_bytes)
+    metadata_store.add_document(doc_id, filename, file_path, session_id, status=status)
+    return doc_id, size_bytes
+
+def _store_bulk_uploads(files: List[UploadFile], session_id: Optional[str], batch: IngestionBatch) -> Tuple[List[str], List[str]]:
+    """
+    Stores plain files and archive members one at a time, adding each to the
+    batch and queuing it for processing as soon as it is on disk.
+
+    Every file and archive member is capped at BULK_MAX_FILE_MB and the whole
+    upload at BULK_MAX_TOTAL_MB, enforced while streaming. Members stored
+    before an archive turns out to be unreadable are kept and processed.
+
+    Returns:
+        A tuple of (skipped unsupported file names, error descriptions).
+    """
+    skipped, errors = [], []
+    file_limit = int(BULK_MAX_FILE_MB * 1024 * 1024)
+    remaining = int(BULK_MAX_TOTAL_MB * 1024 * 1024)
+
+    def store(stream, name: str, label: str) -> bool:
+        """Stores one document; returns False once the total cap is reached."""
+        nonlocal remaining
+        limit = min(file_limit, remaining)
+        try:
+            # Registered as QUEUED so the polling worker never sees it as a plain upload
+            doc_id, size_bytes = _store_upload(stream, name, session_id, limit, status="QUEUED")
+        except ingestion_storage.UploadTooLargeError:
+            if limit < file_limit:
+                errors.append(f"{label}: upload exceeds the total limit of {BULK_MAX_TOTAL_MB:g} MB; it and any later files were not stored.")
+                return False
+            errors.append(f"{label}: exceeds the per-file limit of {BULK_MAX_FILE_MB:g} MB.")
+            return True
+        remaining -= size_bytes
+        batch.add(doc_id, size_bytes)
+        executor.submit(_process_batch_document, batch, doc_id)
+        return True
+
+    for file in files:
+        file.file.seek(0)
+        if is_archive(file.filename):
+            stored = len(batch.doc_ids)
+            try:
+                for member_name, member in iter_archive_members(file.file, file.filename):
+                    if not store(member, member_name, f"{file.filename}/{member_name}"):
+                        return skipped, errors
+            except Exception as e:
+                stored = len(batch.doc_ids) - stored
+                logger.error("[BulkWorker] Could not read archive %s after %s member(s): %s", file.filename, stored, e)
+                errors.append(f"{file.filename}: archive could not be read after {stored} member(s) were stored: {e}")
+        elif ingestion_validator.is_supported_filename(file.filename):
+            if not store(file.file, os.path.basename(file.filename), file.filename):
+                return skipped, errors
+        else:
+            skipped.append(file.filename)
+    return skipped, errors
+
+def _requested_count(job: GenerationJob) -> int:
+    """Returns the number of items a quiz or flashcard job asks for."""
+    return job.params['question_count'] if job.kind == "quiz" else job.params['count']
+
+def _generation_instruction(job: GenerationJob, count: Optional[int] = None) -> str:
+    """Builds the LLM instruction for a quiz or flashcard job, optionally overriding its item count."""
+    return compose_generation_instruction(job.kind, job.params, count)
+
+def _continue_items(context: str, job: GenerationJob, existing: List[Dict], missing: int) -> List[Dict]:
+    """Asks the LLM for only the items a response was missing, excluding the ones it already produced."""
+    instruction = (
+        f"{_generation_instruction(job, missing)} "
+        f"Do not repeat any of these existing items: {json.dumps([item_text(item) for item in existing])}"
+    )
+    llm_response_str = invoke_llm(compose_prompt(context, instruction))
     try:
-        quiz_info = metadata_store.get_quiz(quiz_id)
-        if not quiz_info:
-            logger.error(f"[QuizWorker] Quiz {quiz_id} not found.")
-            return
-        
-        logger.debug(f"[QuizWorker] Quiz info retrieved: {quiz_info}")
-        doc_id = quiz_info['doc_id']
-        logger.info(f"[QuizWorker] Starting quiz generation for quiz_id: {quiz_id} on doc: {doc_id}")
+        data, _ = parse_json_tolerant(llm_response_str)
+    except StructuredOutputError:
+        data = None
+    items, _ = validate_items(extract_items(data, job.kind), job.kind, job.params.get('question_types'))
+    structured_output.stats.record_continuation(len(items[:missing]))
+    return items[:missing]
+
+def _generate_from_context(
+    context: str,
+    jobs: List[GenerationJob],
+    counts: Optional[Dict[str, int]] = None,
+    continue_missing: bool = True,
+) -> Dict[str, List[Dict]]:
+    """
+    Runs one LLM call generating items for every job over the given context.
+
+    A single job uses the plain prompt; several jobs are combined into one
+    structured prompt keyed by task id and split back into the individual jobs.
+    The response is parsed tolerantly and every item is validated on its own,
+    so a truncated or chatty response still yields its complete items. Jobs
+    left short get a targeted continuation call for the missing items only
+    (if `continue_missing`); jobs with no valid items are left out of the
+    result for the coordinator to retry.
+    """
+    counts = counts or {}
+    if len(jobs) == 1:
+        prompt = compose_prompt(context, _generation_instruction(jobs[0], counts.get(jobs[0].job_id)))
+    else:
+        tasks = {f"task_{i}": _generation_instruction(job, counts.get(job.job_id)) for i, job in enumerate(jobs)}
+        prompt = compose_batch_prompt(context, tasks)
+    logger.debug("[GenerationWorker] Composed prompt: %s", Payload(prompt))
+
+    llm_response_str = invoke_llm(prompt)
+    logger.debug("[GenerationWorker] LLM response: %s", Payload(llm_response_str))
 
-        logger.debug("[QuizWorker] Retrieving context from vector store...")
-        retrieved_results = retrieve(query="", k=10, filter={"doc_id": doc_id})
-        logger.debug(f"[QuizWorker] Retrieved results: {retrieved_results}")
-
-        if not retrieved_results.get('results'):
-            logger.error("[QuizWorker] No results retrieved from vector store. Aborting.")
-            metadata_store.update_quiz_status(quiz_id, "FAILED")
-            return
-            
-        logger.debug("[QuizWorker] Assembling context...")
-        context_chunks = assemble_context(retrieved_results)
-        context = "\n\n---\n\n".join(context_chunks)
-        logger.debug(f"[QuizWorker] Assembled context: {context}")
-
-        logger.debug("[QuizWorker] Composing prompt...")
-        prompt = compose_prompt(
-            context,
-            f"Generate a {quiz_info['request_params']['difficulty']} quiz with {quiz_info['request_params']['question_count']} questions in JSON format."
+    try:
+        data, recovered = parse_json_tolerant(llm_response_str)
+    except StructuredOutputError as e:
+        structured_output.stats.record_response(True, 0, 0)
+        raise ValueError(f"Failed to parse LLM response: {e}") from e
+
+    validated = {}
+    for i, job in enumerate(jobs):
+        key = None if len(jobs) == 1 else f"task_{i}"
+        validated[job.job_id] = validate_items(
+            extract_items(data, job.kind, key), job.kind, job.params.get('question_types')
         )
-        logger.debug(f"[QuizWorker] Composed prompt: {prompt}")
-
-        logger.debug("[QuizWorker] Invoking LLM...")
-        llm_response_str = invoke_llm(prompt)
-        logger.debug(f"[QuizWorker] LLM response: {llm_response_str}")
-        
+    structured_output.stats.record_response(
+        recovered,
+        sum(len(items) for items, _ in validated.values()),
+        sum(rejected for _, rejected in validated.values()),
+    )
+
+    results = {}
+    for job in jobs:
+        items, rejected = validated[job.job_id]
+        if not items:
+            continue
+        wanted = counts.get(job.job_id) or _requested_count(job)
+        for _ in range(STRUCTURED_MAX_CONTINUATIONS if continue_missing else 0):
+            if len(items) >= wanted:
+                break
+            logger.info("[GenerationWorker] %s has %s of %s items (%s rejected); requesting the rest.", job.job_id, len(items), wanted, rejected)
+            items = items + _continue_items(context, job, items, wanted - len(items))
+        results[job.job_id] = items[:wanted]
+    return results
+
+def _run_map_reduce(jobs: List[GenerationJob], chunks: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    Generates items for a large document section by section.
+
+    Map: the chunks are partitioned into sections and every section gets one
+    (batched) LLM call for a share of each job's items, in parallel on the
+    shared map executor. Reduce: each job's candidates are deduplicated by
+    embedding similarity and trimmed to the requested count. A job left short
+    after deduplication gets continuation calls for the missing items over a
+    sample of the whole document.
+    """
+    sections = partition_sections(chunks, MAP_REDUCE_MAX_SECTIONS, MAP_REDUCE_SECTION_CHUNKS, MAP_REDUCE_MAX_SECTION_CHUNKS)
+    counts = {
+        job.job_id: max(1, math.ceil(_requested_count(job) * MAP_REDUCE_OVERSAMPLE / len(sections)))
+        for job in jobs
+    }
+    logger.info("[GenerationWorker] Map-reduce over %s chunks in %s sections for doc: %s", len(chunks), len(sections), jobs[0].doc_id)
+
+    section_results = map_executor.map_sections(
+        sections,
+        # Sections are oversampled and reduced, so short sections are not topped up
+        lambda section: _generate_from_context("\n\n---\n\n".join(chunk['text'] for chunk in section), jobs, counts, continue_missing=False),
+    )
+
+    results = {}
+    for job in jobs:
+        candidates = [section_result[job.job_id] for section_result in section_results if job.job_id in section_result]
+        if not candidates:
+            continue
+        wanted = _requested_count(job)
+        items = reduce_candidates(candidates, wanted, embed_texts, MAP_REDUCE_SIMILARITY_THRESHOLD)
+        for _ in range(STRUCTURED_MAX_CONTINUATIONS):
+            if len(items) >= wanted:
+                break
+            logger.info("[GenerationWorker] %s has %s of %s items after deduplication; requesting the rest.", job.job_id, len(items), wanted)
+            overview = partition_sections(chunks, 1, MAP_REDUCE_SECTION_CHUNKS)[0]
+            extra = _continue_items("\n\n---\n\n".join(chunk['text'] for chunk in overview), job, items, wanted - len(items))
+            items = reduce_candidates([items + extra], wanted, embed_texts, MAP_REDUCE_SIMILARITY_THRESHOLD)
+        results[job.job_id] = items
+    return results
+
+def _generate_items(jobs: List[GenerationJob]) -> Dict[str, List[Dict]]:
+    """
+    Generates quizzes and/or flashcards for jobs on the same document.
+
+    Documents with more than MAP_REDUCE_MIN_CHUNKS chunks use map-reduce
+    generation; smaller ones retrieve their context once and make a single
+    LLM call.
+    """
+    doc_id = jobs[0].doc_id
+    chunks = metadata_store.get_chunks(doc_id) or []
+    if len(chunks) > MAP_REDUCE_MIN_CHUNKS:
+        return _run_map_reduce(jobs, chunks)
+
+    logger.debug("[GenerationWorker] Retrieving context from vector store...")
+    # MMR keeps overlapping neighbouring chunks from crowding out the rest of the document
+    retrieved_results = retrieve(query="", k=10, filter={"doc_id": doc_id}, mmr=True)
+    logger.debug("[GenerationWorker] Retrieved results: %s", Payload(retrieved_results))
+
+    if not retrieved_results.get('results'):
+        raise ValueError(f"No results retrieved from vector store for doc: {doc_id}")
+
+    context_chunks = assemble_context(retrieved_results)
+    context = "\n\n---\n\n".join(context_chunks)
+    logger.debug("[GenerationWorker] Assembled context: %s", Payload(context))
+    return _generate_from_context(context, jobs)
+
+@profiling.profiled(
+    lambda jobs: "+".join(sorted({f"generate_{job.kind}_background" for job in jobs})),
+    keys=lambda jobs: [job.job_id for job in jobs],
+)
+def run_generation_batch(jobs: List[GenerationJob]) -> Dict[str, List[Dict]]:
+    """
+    Generates quizzes, flashcards and/or summaries for a batch of jobs on the same document.
+
+    Quizzes and flashcards share one generation pass; each summary is
+    generated separately. Jobs missing from the result are retried by the
+    coordinator.
+    """
+    doc_id = jobs[0].doc_id
+    logger.info("[GenerationWorker] Generating %s job(s) for doc: %s", len(jobs), doc_id)
+
+    results: Dict[str, List[Dict]] = {}
+    for job in jobs:
+        if job.kind == "summary":
+            try:
+                results[job.job_id] = _generate_summary(doc_id)
+            except Exception as e:
+                logger.error("[GenerationWorker] Error generating summary for doc %s: %s", doc_id, e, exc_info=True)
+
+    item_jobs = [job for job in jobs if job.kind != "summary"]
+    if item_jobs:
         try:
-            logger.debug("[QuizWorker] Cleaning and parsing LLM response...")
-            if llm_response_str.startswith("```json"):
-                llm_response_str = llm_response_str[7:]
-            if llm_response_str.endswith("```"):
-                llm_response_str = llm_response_str[:-3]
-            
-            data = json.loads(llm_response_str)
-
-            questions = None
-            if isinstance(data, list):
-                questions = data
-            elif isinstance(data, dict):
-                questions = data.get("quiz")
-
-            if not isinstance(questions, list):
-                logger.error("[QuizWorker] 'quiz' key not found or is not a list in LLM response.")
-                raise ValueError("'quiz' key not found or is not a list.")
-
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"[QuizWorker] Failed to parse or validate LLM response: {e}")
-            metadata_store.update_quiz_status(quiz_id, "FAILED")
-            return
+            results.update(_generate_items(item_jobs))
+        except Exception:
+            # Without partial results the coordinator records the error itself
+            if not results:
+                raise
+            logger.error("[GenerationWorker] Error generating items for doc %s.", doc_id, exc_info=True)
+
+    if len(results) < len(jobs):
+        logger.error("[GenerationWorker] LLM response was missing %s of %s result(s).", len(jobs) - len(results), len(jobs))
+    return results
+
+def _on_generation_success(job: GenerationJob, items: List[Dict]):
+    GENERATION_JOBS.inc(kind=job.kind, outcome="ready")
+    if job.kind == "quiz":
+        metadata_store.update_quiz_status(job.job_id, "READY", questions=items)
+    elif job.kind == "summary":
+        metadata_store.update_summary_status(job.doc_id, "READY", summary=items[0]['summary'], key_points=items[0]['key_points'])
+    else:
+        metadata_store.update_flashcards_status(job.job_id, "READY", flashcards=items)
+    logger.info("[GenerationWorker] Successfully generated %s: %s", job.kind, job.job_id)
+
+def _on_generation_failure(job: GenerationJob, error: Exception):
+    GENERATION_JOBS.inc(kind=job.kind, outcome="failed")
+    if job.kind == "quiz":
+        metadata_store.update_quiz_status(job.job_id, "FAILED")
+    elif job.kind == "summary":
+        metadata_store.update_summary_status(job.doc_id, "FAILED")
+    else:
+        metadata_store.update_flashcards_status(job.job_id, "FAILED")
+    logger.error("[GenerationWorker] Error generating %s %s: %s", job.kind, job.job_id, error)
+
+generation_coordinator = GenerationCoordinator(
+    executor,
+    run_generation_batch,
+    on_success=_on_generation_success,
+    on_failure=_on_generation_failure,
+    batch_window=float(os.environ.get("GENERATION_BATCH_WINDOW", 0.5)),
+    max_batch_size=int(os.environ.get("GENERATION_MAX_BATCH_SIZE", 4)),
+    max_attempts=int(os.environ.get("GENERATION_MAX_ATTEMPTS", 3)),
+    backoff_base=float(os.environ.get("GENERATION_BACKOFF_SECONDS", 1.0)),
+)
 
-        logger.debug("[QuizWorker] Updating quiz status to READY...")
-        metadata_store.update_quiz_status(quiz_id, "READY", questions=questions)
-        logger.info(f"[QuizWorker] Successfully generated quiz: {quiz_id}")
+# Gauges are computed when /metrics is scraped.
+EXECUTOR_QUEUE_DEPTH.set_function(lambda: executor._work_queue.qsize(), pool="background")
+EXECUTOR_QUEUE_DEPTH.set_function(lambda: map_executor.pool._work_queue.qsize(), pool="map_reduce")
+IN_FLIGHT_JOBS.set_function(lambda: generation_coordinator.in_flight, kind="generation")
+IN_FLIGHT_JOBS.set_function(lambda: len(metadata_store.get_documents_by_status('PROCESSING')), kind="document_processing")
+
+def _section_key_points(section: List[Dict]) -> List[str]:
+    """Asks the LLM for the key points of one section of a document."""
+    context = "\n\n---\n\n".join(chunk['text'] for chunk in section)
+    llm_response_str = invoke_llm(compose_prompt(context, "List the 3 to 5 key points of this text as a JSON array of short strings."))
+    data, _ = parse_json_tolerant(llm_response_str)
+    return [str(point) for point in extract_items(data, "key_points") or []]
+
+def _generate_summary(doc_id: str) -> List[Dict]:
+    """
+    Generates a document summary with per-section key points.
+
+    The document is split into the same sections as map-reduce generation;
+    each section's key points are extracted in parallel on the map executor,
+    then one more call summarizes the document from those key points.
+
+    Returns:
+        A single-item list holding the summary and its key points.
+    """
+    chunks = metadata_store.get_chunks(doc_id) or []
+    sections = partition_sections(chunks, MAP_REDUCE_MAX_SECTIONS, MAP_REDUCE_SECTION_CHUNKS, MAP_REDUCE_MAX_SECTION_CHUNKS)
+    section_points = map_executor.map_sections(sections, _section_key_points)
+    key_points = [
+        {"section": i + 1, "paragraph_id": section[0].get('paragraph_id'), "points": points}
+        for i, (section, points) in enumerate(zip(sections, section_points)) if points
+    ]
+    if not key_points:
+        raise ValueError(f"No key points generated for doc: {doc_id}")
+
+    outline = "\n".join(f"- {point}" for entry in key_points for point in entry['points'])
+    summary = invoke_llm(compose_prompt(
+        outline,
+        "Write a concise one-paragraph summary of the document these key points were taken from. Respond with plain text only.",
+    )).strip()
+    return [{"summary": summary, "key_points": key_points}]
+
+def _summary_job(doc_id: str) -> GenerationJob:
+    return GenerationJob("summary", f"summary_{doc_id}", doc_id, {})
+
+def generate_summary_background(doc_id: str):
+    """Queues a document summary for generation."""
+    logger.info("[SummaryWorker] Queueing summary generation for doc: %s", doc_id)
+    generation_coordinator.submit(_summary_job(doc_id))
 
-    except Exception as e:
-        logger.error(f"[QuizWorker] An unexpected error occurred: {e}", exc_info=True)
-        metadata_store.update_quiz_status(quiz_id, "FAILED")
-        logger.error(f"[QuizWorker] Error generating quiz {quiz_id}: {e}", exc_info=True)
+def generate_quiz_background(quiz_id: str):
+    """Background task to queue a quiz for generation."""
+    quiz_info = metadata_store.get_quiz(quiz_id)
+    if not quiz_info:
+        logger.error("[QuizWorker] Quiz %s not found.", quiz_id)
+        return
+    logger.info("[QuizWorker] Queueing quiz generation for quiz_id: %s on doc: %s", quiz_id, quiz_info['doc_id'])
+    generation_coordinator.submit(GenerationJob("quiz", quiz_id, quiz_info['doc_id'], quiz_info['request_params']))
 
 def generate_flashcards_background(flashcards_id: str):
-    """Background task to generate flashcards."""
-    logger.debug(f"[FlashcardWorker] Starting flashcard generation for flashcards_id: {flashcards_id}")
-    try:
-        flashcards_info = metadata_store.get_flashcards(flashcards_id)
-        if not flashcards_info:
-            logger.error(f"[FlashcardWorker] Flashcards {flashcards_id} not found.")
-            return
-        
-        logger.debug(f"[FlashcardWorker] Flashcards info retrieved: {flashcards_info}")
-        doc_id = flashcards_info['doc_id']
-        logger.info(f"[FlashcardWorker] Starting flashcard generation for flashcards_id: {flashcards_id} on doc: {doc_id}")
-
-        logger.debug("[FlashcardWorker] Retrieving context from vector store...")
-        retrieved_results = retrieve(query="", k=10, filter={"doc_id": doc_id})
-        logger.debug(f"[FlashcardWorker] Retrieved results: {retrieved_results}")
-
-        if not retrieved_results.get('results'):
-            logger.error("[FlashcardWorker] No results retrieved from vector store. Aborting.")
-            metadata_store.update_flashcards_status(flashcards_id, "FAILED")
-            return
-            
-        logger.debug("[FlashcardWorker] Assembling context...")
-        context_chunks = assemble_context(retrieved_results)
-        context = "\n\n---\n\n".join(context_chunks)
-        logger.debug(f"[FlashcardWorker] Assembled context: {context}")
-
-        logger.debug("[FlashcardWorker] Composing prompt...")
-        prompt = compose_prompt(
-            context,
-            f"Generate {flashcards_info['request_params']['count']} flashcards in JSON format. Each flashcard should have a 'front' and a 'back'."
-        )
-        logger.debug(f"[FlashcardWorker] Composed prompt: {prompt}")
-
-        logger.debug("[FlashcardWorker] Invoking LLM...")
-        llm_response_str = invoke_llm(prompt)
-        logger.debug(f"[FlashcardWorker] LLM response: {llm_response_str}")
-        
-        try:
-            logger.debug("[FlashcardWorker] Cleaning and parsing LLM response...")
-            # Clean the response string
-            if llm_response_str.startswith("```json"):
-                llm_response_str = llm_response_str[7:]
-            if llm_response_str.endswith("```"):
-                llm_response_str = llm_response_str[:-3]
-            
-            data = json.loads(llm_response_str)
-
-            flashcards = None
-            if isinstance(data, list):
-                flashcards = data
-            elif isinstance(data, dict):
-                flashcards = data.get("flashcards")
-
-            if not isinstance(flashcards, list):
-                logger.error("[FlashcardWorker] 'flashcards' key not found or is not a list in LLM response.")
-                raise ValueError("'flashcards' key not found or is not a list.")
-
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"[FlashcardWorker] Failed to parse or validate LLM response: {e}")
-            metadata_store.update_flashcards_status(flashcards_id, "FAILED")
-            return
-
-        logger.debug("[FlashcardWorker] Updating flashcards status to READY...")
-        metadata_store.update_flashcards_status(flashcards_id, "READY", flashcards=flashcards)
-        logger.info(f"[FlashcardWorker] Successfully generated flashcards: {flashcards_id}")
-
-    except Exception as e:
-        logger.error(f"[FlashcardWorker] An unexpected error occurred: {e}", exc_info=True)
-        metadata_store.update_flashcards_status(flashcards_id, "FAILED")
-        logger.error(f"[FlashcardWorker] Error generating flashcards {flashcards_id}: {e}", exc_info=True)
+    """Background task to queue a flashcard set for generation."""
+    flashcards_info = metadata_store.get_flashcards(flashcards_id)
+    if not flashcards_info:
+        logger.error("[FlashcardWorker] Flashcards %s not found.", flashcards_id)
+        return
+    logger.info("[FlashcardWorker] Queueing flashcard generation for flashcards_id: %s on doc: %s", flashcards_id, flashcards_info['doc_id'])
+    generation_coordinator.submit(GenerationJob("flashcards", flashcards_id, flashcards_info['doc_id'], flashcards_info['request_params']))
+
+def _quiz_id(doc_id: str, request: QuizRequest) -> str:
+    """The deterministic quiz id for a request; no topics and an empty topic list are the same request."""
+    params = request.dict()
+    params['topics'] = params['topics'] or None
+    request_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"quiz_{doc_id}_{request_hash}"
+
+def _flashcards_id(doc_id: str, request: FlashcardRequest) -> str:
+    """The deterministic flashcard set id for a request."""
+    request_hash = hashlib.sha256(json.dumps(request.dict(), sort_keys=True).encode()).hexdigest()
+    return f"flashcards_{doc_id}_{request_hash}"
+
+# Speculative generation of default quizzes, flashcards and summaries for newly processed documents
+PRECOMPUTE_ENABLED = os.environ.get("PRECOMPUTE_ENABLED", "0") == "1"
+precomputer = Precomputer(
+    is_idle=lambda: generation_coordinator.in_flight == 0,
+    session_budget=int(os.environ.get("PRECOMPUTE_SESSION_BUDGET", 12)),
+    idle_poll_interval=float(os.environ.get("PRECOMPUTE_IDLE_POLL_SECONDS", 1.0)),
+    budget_ttl_seconds=float(os.environ.get("PRECOMPUTE_BUDGET_TTL_SECONDS", 24 * 3600)),
+)
 
+def _precompute_quiz(doc_id: str) -> bool:
+    request = QuizRequest()
+    quiz_id = _quiz_id(doc_id, request)
+    if metadata_store.get_quiz(quiz_id) or not metadata_store.get_document(doc_id):
+        return False
+    metadata_store.create_quiz(quiz_id, doc_id, request.dict())
+    generation_coordinator.submit(GenerationJob("quiz", quiz_id, doc_id, request.dict())).result()
+    return True
+
+def _precompute_flashcards(doc_id: str) -> bool:
+    request = FlashcardRequest()
+    flashcards_id = _flashcards_id(doc_id, request)
+    if metadata_store.get_flashcards(flashcards_id) or not metadata_store.get_document(doc_id):
+        return False
+    metadata_store.create_flashcards(flashcards_id, doc_id, request.dict())
+    generation_coordinator.submit(GenerationJob("flashcards", flashcards_id, doc_id, request.dict())).result()
+    return True
+
+def _precompute_summary(doc_id: str) -> bool:
+    if metadata_store.get_summary(doc_id) or not metadata_store.get_document(doc_id):
+        return False
+    metadata_store.create_summary(doc_id)
+    generation_coordinator.submit(_summary_job(doc_id)).result()
+    return True
+
+def schedule_precompute(doc_info: Dict):
+    """Queues default-parameter artifacts for a processed document, if precomputation is enabled."""
+    if not PRECOMPUTE_ENABLED:
+        return
+    doc_id, session_id = doc_info['doc_id'], doc_info.get('session_id')
+    precomputer.enqueue([
+        PrecomputeTask("quiz", doc_id, session_id, lambda: _precompute_quiz(doc_id)),
+        PrecomputeTask("flashcards", doc_id, session_id, lambda: _precompute_flashcards(doc_id)),
+        PrecomputeTask("summary", doc_id, session_id, lambda: _precompute_summary(doc_id)),
+    ])
 
 async def poll_for_uploaded_documents():
     """Periodically polls the metadata store for documents with 'UPLOADED' status."""
@@ -283,22 +708,118 @@ async def poll_for_uploaded_documents():
         try:
             uploaded_docs = metadata_store.get_documents_by_status('UPLOADED')
             if uploaded_docs:
-                logger.info(f"[PollingWorker] Found {len(uploaded_docs)} documents to process.")
+                logger.info("[PollingWorker] Found %s documents to process.", len(uploaded_docs))
                 for doc in uploaded_docs:
+                    # Mark as queued so a backed-up executor does not get the same document twice
+                    metadata_store.update_document_status(doc['doc_id'], "QUEUED")
                     # Use the executor to run the synchronous processing function in a separate thread
                     loop.run_in_executor(executor, process_document_background, doc['doc_id'])
         except Exception as e:
-            logger.error(f"[PollingWorker] Error polling for documents: {e}", exc_info=True)
+            logger.error("[PollingWorker] Error polling for documents: %s", e, exc_info=True)
         await asyncio.sleep(10) # Poll every 10 seconds
 
+async def run_compaction_periodically():
+    """Periodically expires artifacts, applies upload retention and enforces memory/disk budgets."""
+    while True:
+        await asyncio.sleep(COMPACTION_INTERVAL_SECONDS)
+        try:
+            await loop.run_in_executor(executor, compactor.run_once)
+        except Exception as e:
+            logger.error("[CompactionWorker] Error compacting: %s", e, exc_info=True)
+
 @app.on_event("startup")
 async def startup_event():
-    """On application startup, starts the background polling worker."""
+    """On application startup, loads offline imports and starts the background polling and compaction workers."""
+    if os.path.exists(IMPORT_MANIFEST_PATH):
+        with open(IMPORT_MANIFEST_PATH) as f:
+            metadata_store.import_documents(json.load(f))
     logger.info("Application starting up. Initializing background worker.")
     asyncio.create_task(poll_for_uploaded_documents())
+    if COMPACTION_INTERVAL_SECONDS > 0:
+        asyncio.create_task(run_compaction_periodically())
+    if PRECOMPUTE_ENABLED:
+        precomputer.start()
+
+def _remove_from_import_manifest(doc_id: str):
+    """Drops a document's record from the import manifest so it is not reloaded on the next startup."""
+    with _manifest_lock:
+        if not os.path.exists(IMPORT_MANIFEST_PATH):
+            return
+        with open(IMPORT_MANIFEST_PATH) as f:
+            records = json.load(f)
+        kept = [record for record in records if record.get('doc_id') != doc_id]
+        if len(kept) == len(records):
+            return
+        tmp_path = f"{IMPORT_MANIFEST_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(kept, f)
+        os.replace(tmp_path, IMPORT_MANIFEST_PATH)
+        logger.info("Removed document %s from the import manifest", doc_id)
 
 # --- API Endpoints ---
 
+@app.get("/metrics")
+def get_metrics():
+    """Exposes pipeline metrics in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
+def _require_admin(admin_token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.")
+    if not _is_admin(admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@app.get("/admin/profiles")
+def list_profiles(admin_token: Optional[str] = Header(None)):
+    """Lists retained profiles, newest first."""
+    _require_admin(admin_token)
+    return {"profiles": profiling.store.list()}
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "folded", admin_token: Optional[str] = Header(None)):
+    """
+    Downloads a profile as collapsed stacks ('folded', for flamegraph.pl or
+    speedscope), a span tree ('json') or cProfile stats ('pstats').
+    """
+    _require_admin(admin_token)
+    captured = profiling.store.get(profile_id)
+    if not captured:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+
+    if format == "json":
+        return captured.to_dict()
+    if format == "pstats":
+        if captured.pstats is None:
+            raise HTTPException(status_code=400, detail="Profile was not captured with cProfile.")
+        return Response(
+            content=captured.pstats,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+        )
+    if format == "folded":
+        return Response(
+            content=captured.to_folded(),
+            media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+        )
+    raise HTTPException(status_code=400, detail="format must be one of 'folded', 'json' or 'pstats'.")
+
+@app.get("/admin/structured-output")
+def get_structured_output_report(admin_token: Optional[str] = Header(None)):
+    """Reports how many LLM calls tolerant parsing and targeted continuation saved."""
+    _require_admin(admin_token)
+    return structured_output.stats.report()
+
+@app.get("/admin/compaction")
+def get_compaction_report(run: bool = False, admin_token: Optional[str] = Header(None)):
+    """Returns the last compaction report, or runs a compaction pass first if `run` is set."""
+    _require_admin(admin_token)
+    if run:
+        return compactor.run_once()
+    if compactor.last_report is None:
+        raise HTTPException(status_code=404, detail="No compaction has run yet.")
+    return compactor.last_report
+
 @app.get("/documents", response_model=DocumentListResponse)
 def get_documents(
     session_id: Optional[str] = Header(None)
@@ -324,21 +845,120 @@ async def upload_document(
 ):
     ingestion_validator.validate_file(file)
     
-    upload_dir = "server/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
     
     doc_id = str(uuid.uuid4())
-    file_path = os.path.join(upload_dir, f"{doc_id}_{file.filename}")
+    file_path = os.path.join(UPLOAD_DIR, f"{doc_id}_{file.filename}")
     
     await file.seek(0)
     ingestion_storage.save_raw_file(file, file_path)
     
     metadata_store.add_document(doc_id, file.filename, file_path, session_id)
+    if _profile_requested_by_client():
+        profiling.request_profile(doc_id)
     
-    logger.info(f"Document {doc_id} uploaded. Worker will pick it up for processing.")
+    logger.info("Document %s uploaded. Worker will pick it up for processing.", doc_id)
     return {"doc_id": doc_id, "status": "UPLOADED"}
 
-@app.post("/documents/{doc_id}/quiz", response_model=QuizCreate.py)
+@app.post("/documents/bulk", response_model=BulkUploadResponse)
+async def upload_documents_bulk(
+    files: List[UploadFile] = File(...),
+    session_id: Optional[str] = Header(None)
+):
+    """
+    Uploads many documents at once. Plain files and the members of .zip/.tar
+    archives are stored one by one (archives are streamed, not extracted) and
+    each is queued for processing as soon as it is stored, as one batch.
+    """
+    batch = IngestionBatch(sealed=False)
+    ingestion_batches.add(batch)
+    try:
+        skipped, errors = await run_in_threadpool(_store_bulk_uploads, files, session_id, batch)
+    finally:
+        batch.seal()
+    if not batch.doc_ids:
+        raise HTTPException(status_code=400, detail=" ".join(errors) or "No supported documents found in upload.")
+
+    logger.info("[BulkWorker] Stored batch %s with %s documents", batch.batch_id, len(batch.doc_ids))
+    return {
+        "batch_id": batch.batch_id,
+        "status": "PROCESSING",
+        "doc_ids": list(batch.doc_ids),
+        "skipped": skipped,
+        "errors": errors,
+    }
+
+@app.get("/documents/batches/{batch_id}", response_model=IngestionBatchResponse)
+def get_ingestion_batch(batch_id: str):
+    batch = ingestion_batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return batch.progress()
+
+@app.delete("/documents/{doc_id}", response_model=DocumentDeleteResponse)
+def delete_document(doc_id: str):
+    """
+    Deletes a document with its vectors, chunks, generated quizzes and
+    flashcards, its raw upload (files imported in place are left alone) and
+    its import manifest record.
+    """
+    doc = metadata_store.get_document(doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    if doc['status'] in ("QUEUED", "PROCESSING"):
+        raise HTTPException(status_code=409, detail="Document is still being processed. Try again once it has finished.")
+
+    precomputer.discard(doc_id)
+    vectors_deleted = delete_document_vectors(doc_id)
+    bytes_freed = delete_raw_upload(doc, UPLOAD_DIR)
+    deleted = metadata_store.delete_document(doc_id)
+    _remove_from_import_manifest(doc_id)
+    return {
+        "doc_id": doc_id,
+        "status": "DELETED",
+        "chunks_deleted": deleted['chunks_deleted'] if deleted else 0,
+        "vectors_deleted": vectors_deleted,
+        "artifacts_deleted": deleted['artifacts_deleted'] if deleted else 0,
+        "bytes_freed": bytes_freed,
+    }
+
+@app.post("/search", response_model=SearchResponse)
+def search(request: SearchRequest, session_id: Optional[str] = Header(None)):
+    """
+    Searches a document, or all documents of the session, for relevant chunks.
+    Pass the returned `next_cursor` to fetch the next page of the same search.
+    """
+    if request.cursor:
+        try:
+            return retrieve(query=None, k=request.k, cursor=request.cursor)
+        except CursorExpiredError:
+            raise HTTPException(status_code=410, detail="Cursor has expired. Run the search again.")
+
+    if not request.query:
+        raise HTTPException(status_code=400, detail="query is required.")
+    validate_query(request.query)
+    if request.doc_id:
+        if not metadata_store.get_document(request.doc_id):
+            raise HTTPException(status_code=404, detail="Document not found.")
+        search_filter = {"doc_id": request.doc_id}
+    else:
+        if not session_id:
+            raise HTTPException(status_code=400, detail="session_id header is required when no doc_id is given.")
+        doc_ids = [doc['doc_id'] for doc in metadata_store.get_documents_by_session(session_id)]
+        if not doc_ids:
+            return {"results": [], "next_cursor": None}
+        search_filter = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
+
+    return retrieve(
+        query=request.query,
+        k=request.k,
+        filter=search_filter,
+        mmr=request.mmr,
+        lambda_mult=request.lambda_mult,
+        fetch_k=max(request.k, request.fetch_k),
+    )
+
+@app.post("/documents/{doc_id}/quiz", response_model=QuizCreateResponse)
 def create_quiz_job(
     doc_id: str,
     request: QuizRequest,
@@ -351,14 +971,20 @@ def create_quiz_job(
     if doc_info['status'] != "PROCESSED":
         raise HTTPException(status_code=400, detail=f"Document status is '{doc_info['status']}', not 'PROCESSED'.")
 
-    request_hash = hashlib.sha256(json.dumps(request.dict(), sort_keys=True).encode()).hexdigest()
-    quiz_id = f"quiz_{doc_id}_{request_hash}"
+    quiz_id = _quiz_id(doc_id, request)
 
     existing_quiz = metadata_store.get_quiz(quiz_id)
-    if existing_quiz:
+    if _profile_requested_by_client():
+        profiling.request_profile(quiz_id)
+
+    if existing_quiz and existing_quiz['status'] != "FAILED":
         return {"quiz_id": quiz_id, "status": existing_quiz['status']}
 
-    metadata_store.create_quiz(quiz_id, doc_id, request.dict())
+    if existing_quiz:
+        # A previous attempt failed; regenerate under the same id.
+        metadata_store.update_quiz_status(quiz_id, "GENERATING")
+    else:
+        metadata_store.create_quiz(quiz_id, doc_id, request.dict())
     background_tasks.add_task(generate_quiz_background, quiz_id)
     
     return {"quiz_id": quiz_id, "status": "GENERATING"}
@@ -388,14 +1014,20 @@ def create_flashcards_job(
     if doc_info['status'] != "PROCESSED":
         raise HTTPException(status_code=400, detail=f"Document status is '{doc_info['status']}', not 'PROCESSED'.")
 
-    request_hash = hashlib.sha256(json.dumps(request.dict(), sort_keys=True).encode()).hexdigest()
-    flashcards_id = f"flashcards_{doc_id}_{request_hash}"
+    flashcards_id = _flashcards_id(doc_id, request)
 
     existing_flashcards = metadata_store.get_flashcards(flashcards_id)
-    if existing_flashcards:
+    if _profile_requested_by_client():
+        profiling.request_profile(flashcards_id)
+
+    if existing_flashcards and existing_flashcards['status'] != "FAILED":
         return {"flashcards_id": flashcards_id, "status": existing_flashcards['status']}
 
-    metadata_store.create_flashcards(flashcards_id, doc_id, request.dict())
+    if existing_flashcards:
+        # A previous attempt failed; regenerate under the same id.
+        metadata_store.update_flashcards_status(flashcards_id, "GENERATING")
+    else:
+        metadata_store.create_flashcards(flashcards_id, doc_id, request.dict())
     background_tasks.add_task(generate_flashcards_background, flashcards_id)
     
     return {"flashcards_id": flashcards_id, "status": "GENERATING"}
@@ -412,6 +1044,42 @@ def get_flashcards_status(flashcards_id: str):
         "flashcards": flashcards_info.get('flashcards') if flashcards_info['status'] == "READY" else None
     }
 
+@app.post("/documents/{doc_id}/summary", response_model=SummaryCreateResponse)
+def create_summary_job(doc_id: str):
+    doc_info = metadata_store.get_document(doc_id)
+    if not doc_info:
+        raise HTTPException(status_code=404, detail="Document not found.")
+
+    if doc_info['status'] != "PROCESSED":
+        raise HTTPException(status_code=400, detail=f"Document status is '{doc_info['status']}', not 'PROCESSED'.")
+
+    existing_summary = metadata_store.get_summary(doc_id)
+    if existing_summary and existing_summary['status'] != "FAILED":
+        return {"doc_id": doc_id, "status": existing_summary['status']}
+
+    if existing_summary:
+        # A previous attempt failed; regenerate.
+        metadata_store.update_summary_status(doc_id, "GENERATING")
+    else:
+        metadata_store.create_summary(doc_id)
+    generate_summary_background(doc_id)
+
+    return {"doc_id": doc_id, "status": "GENERATING"}
+
+@app.get("/documents/{doc_id}/summary", response_model=SummaryStatusResponse)
+def get_summary_status(doc_id: str):
+    summary_info = metadata_store.get_summary(doc_id)
+    if not summary_info:
+        raise HTTPException(status_code=404, detail="Summary not found.")
+
+    ready = summary_info['status'] == "READY"
+    return {
+        "doc_id": doc_id,
+        "status": summary_info['status'],
+        "summary": summary_info.get('summary') if ready else None,
+        "key_points": summary_info.get('key_points') if ready else None,
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 3000)))
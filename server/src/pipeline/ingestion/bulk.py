@@ -0,0 +1,143 @@
+import os
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .validator import is_supported_filename
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+def is_archive(filename: str) -> bool:
+    """Returns True if the filename looks like a supported archive."""
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+def _usable_member(name: str) -> bool:
+    basename = os.path.basename(name)
+    return (
+        bool(basename)
+        and not basename.startswith(".")
+        and "__MACOSX" not in name.split("/")
+        and is_supported_filename(basename)
+    )
+
+def iter_archive_members(fileobj: BinaryIO, filename: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Yields (member filename, readable stream) for each supported document in
+    an archive, one member at a time, without extracting the archive to disk.
+
+    Zip archives are read through their central directory (the upload is
+    already a seekable temporary file); tar archives are read as a stream.
+    Member paths are reduced to their basename.
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _usable_member(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    yield os.path.basename(info.filename), member
+    else:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile() or not _usable_member(info.name):
+                    continue
+                member = archive.extractfile(info)
+                if member is not None:
+                    yield os.path.basename(info.name), member
+
+def iter_directory_files(root: str) -> Iterator[str]:
+    """Yields the paths of supported documents under a directory tree, in sorted order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if not name.startswith(".") and is_supported_filename(name):
+                yield os.path.join(dirpath, name)
+
+class IngestionBatch:
+    """
+    Tracks aggregate progress and throughput of a group of documents processed together.
+
+    A batch created with `sealed=False` accepts documents through `add()` while
+    they are still being received (e.g. members of an archive being streamed),
+    and is not done until `seal()` is called.
+    """
+    def __init__(self, doc_ids: List[str] = (), total_bytes: int = 0, sealed: bool = True):
+        self.batch_id = str(uuid.uuid4())
+        self.doc_ids = list(doc_ids)
+        self.total_bytes = total_bytes
+        self.sealed = sealed
+        self.processed = 0
+        self.failed = 0
+        self.chunks = 0
+        self.processed_bytes = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.sealed and self.processed + self.failed >= len(self.doc_ids)
+
+    def add(self, doc_id: str, size_bytes: int):
+        """Adds a document received after the batch was created."""
+        with self._lock:
+            self.doc_ids.append(doc_id)
+            self.total_bytes += size_bytes
+
+    def seal(self):
+        """Marks the batch as complete: no more documents will be added."""
+        with self._lock:
+            self.sealed = True
+            if self.done and self.finished_at is None:
+                self.finished_at = time.time()
+
+    def record(self, succeeded: bool, chunk_count: int = 0, size_bytes: int = 0):
+        """Records the outcome of one document."""
+        with self._lock:
+            self.processed_bytes += size_bytes
+            if succeeded:
+                self.processed += 1
+                self.chunks += chunk_count
+            else:
+                self.failed += 1
+            if self.done and self.finished_at is None:
+                self.finished_at = time.time()
+
+    def progress(self) -> Dict:
+        with self._lock:
+            elapsed = max((self.finished_at or time.time()) - self.started_at, 1e-9)
+            return {
+                "batch_id": self.batch_id,
+                "status": "COMPLETED" if self.done else "PROCESSING",
+                "total": len(self.doc_ids),
+                "processed": self.processed,
+                "failed": self.failed,
+                "chunks": self.chunks,
+                "bytes": self.total_bytes,
+                "elapsed_seconds": round(elapsed, 3),
+                "documents_per_second": round((self.processed + self.failed) / elapsed, 3),
+                "chunks_per_second": round(self.chunks / elapsed, 3),
+                "megabytes_per_second": round(self.processed_bytes / 1e6 / elapsed, 3),
+                "doc_ids": list(self.doc_ids),
+            }
+
+class BatchRegistry:
+    """Keeps the most recent ingestion batches for progress queries."""
+    def __init__(self, max_batches: int = 100):
+        self.max_batches = max_batches
+        self._batches: "OrderedDict[str, IngestionBatch]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, batch: IngestionBatch):
+        with self._lock:
+            self._batches[batch.batch_id] = batch
+            while len(self._batches) > self.max_batches:
+                self._batches.popitem(last=False)
+
+    def get(self, batch_id: str) -> Optional[IngestionBatch]:
+        with self._lock:
+            return self._batches.get(batch_id)
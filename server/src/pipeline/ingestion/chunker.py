@@ -0,0 +1,250 @@
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Counts the tokens of a batch of texts in one call
+TokenCounter = Callable[[List[str]], List[int]]
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t\r\f\v]*\n\s*")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\S+")
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+_APPROXIMATE_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Separator between the pages of a PDF in the document text that offsets refer to
+PAGE_SEPARATOR = "\n\n"
+
+def approximate_token_counts(texts: List[str]) -> List[int]:
+    """Approximates token counts (words and punctuation) when no tokenizer is available."""
+    return [len(_APPROXIMATE_TOKEN.findall(text)) for text in texts]
+
+@dataclass
+class ChunkingConfig:
+    """
+    How documents of one file type are chunked.
+
+    Args:
+        chunk_tokens: Maximum tokens per chunk; None for the embedding model's input limit.
+        overlap_tokens: Tokens of trailing segments repeated at the start of the next chunk.
+        min_tokens: A chunk is not closed at a heading or page boundary until it
+                    has at least this many tokens, so short sections are merged.
+        respect_headings: Start a new chunk at Markdown headings.
+        respect_pages: Start a new chunk at PDF page boundaries.
+    """
+    chunk_tokens: Optional[int] = None
+    overlap_tokens: int = 32
+    min_tokens: int = 64
+    respect_headings: bool = False
+    respect_pages: bool = False
+
+DEFAULT_CONFIGS: Dict[str, ChunkingConfig] = {
+    ".pdf": ChunkingConfig(respect_pages=True),
+    ".md": ChunkingConfig(respect_headings=True, overlap_tokens=16),
+    ".docx": ChunkingConfig(),
+    ".txt": ChunkingConfig(),
+}
+
+def load_configs(overrides: str = "") -> Dict[str, ChunkingConfig]:
+    """
+    Returns the per-file-type configs with overrides applied, given as JSON,
+    e.g. '{".pdf": {"chunk_tokens": 200, "respect_pages": false}}'.
+    """
+    configs = dict(DEFAULT_CONFIGS)
+    if overrides:
+        for ext, fields in json.loads(overrides).items():
+            configs[ext] = replace(configs.get(ext, ChunkingConfig()), **fields)
+    return configs
+
+CHUNKING_CONFIGS = load_configs(os.environ.get("CHUNKING_CONFIG", ""))
+
+@dataclass
+class _Segment:
+    start: int  # offsets into the document text
+    end: int
+    page: Optional[int]
+    section: Optional[str]
+    boundary: bool  # a new heading section or page starts here
+    tokens: int = 0
+
+def _spans(text: str, pattern: "re.Pattern", offset: int) -> List[Tuple[int, int]]:
+    """Splits `text` at `pattern` matches into non-blank (start, end) spans, shifted by `offset`."""
+    spans, position = [], 0
+    for match in pattern.finditer(text):
+        spans.append((position, match.start()))
+        position = match.end()
+    spans.append((position, len(text)))
+
+    result = []
+    for start, end in spans:
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            lead = len(piece) - len(piece.lstrip())
+            result.append((offset + start + lead, offset + start + lead + len(stripped)))
+    return result
+
+def _markdown_sections(text: str) -> List[Tuple[int, int, Optional[str]]]:
+    """Splits Markdown into (start, end, heading path) sections at each heading."""
+    sections, path = [], []
+    position, title = 0, None
+    for match in _MARKDOWN_HEADING.finditer(text):
+        if match.start() > position:
+            sections.append((position, match.start(), title))
+        level = len(match.group(1))
+        path = path[:level - 1] + [match.group(2).strip()]
+        position, title = match.start(), " > ".join(path)
+    sections.append((position, len(text), title))
+    return sections
+
+def _segments(pages: Sequence[str], ext: str, config: ChunkingConfig) -> Tuple[str, List[_Segment]]:
+    """Joins the pages into the document text and splits it into paragraph segments."""
+    text, segments = "", []
+    for page_number, page_text in enumerate(pages, start=1):
+        if text:
+            text += PAGE_SEPARATOR
+        offset = len(text)
+        text += page_text
+        page = page_number if ext == ".pdf" else None
+
+        sections = _markdown_sections(page_text) if ext == ".md" else [(0, len(page_text), None)]
+        first_on_page = True
+        for section_start, section_end, section in sections:
+            first_in_section = True
+            for start, end in _spans(page_text[section_start:section_end], _PARAGRAPH_BREAK, offset + section_start):
+                boundary = (config.respect_pages and first_on_page) or (config.respect_headings and first_in_section)
+                segments.append(_Segment(start, end, page, section, boundary))
+                first_on_page = first_in_section = False
+    return text, segments
+
+def _character_spans(segment: _Segment, limit: int) -> List[Tuple[int, int]]:
+    """Cuts a segment into equal character spans, as many as its token count needs at `limit` tokens each."""
+    length = segment.end - segment.start
+    parts = min(length, max(2, -(-segment.tokens // limit)))
+    step = -(-length // parts)
+    return [(start, min(start + step, segment.end)) for start in range(segment.start, segment.end, step)]
+
+def _split_oversized(text: str, segments: List[_Segment], limit: int, count_tokens: TokenCounter) -> List[_Segment]:
+    """
+    Counts every segment's tokens in one batched call and splits segments over
+    `limit` into sentences, then words, counting each level in one more call.
+    Runs that are still too long (no whitespace, e.g. URLs or encoded data)
+    are then cut into character spans until every piece fits.
+    """
+    counts = count_tokens([text[segment.start:segment.end] for segment in segments])
+    for segment, tokens in zip(segments, counts):
+        segment.tokens = tokens
+
+    levels = [_SENTENCE_BREAK, _WORD]
+    while True:
+        pattern = levels.pop(0) if levels else None
+        oversized = [
+            segment for segment in segments
+            if segment.tokens > limit and (pattern is not None or segment.end - segment.start > 1)
+        ]
+        if not oversized:
+            if pattern is None:
+                break
+            continue
+        pieces: Dict[int, List[_Segment]] = {}
+        for segment in oversized:
+            if pattern is None:
+                spans = _character_spans(segment, limit)
+            elif pattern is _WORD:
+                spans = [(segment.start + m.start(), segment.start + m.end()) for m in _WORD.finditer(text[segment.start:segment.end])]
+            else:
+                spans = _spans(text[segment.start:segment.end], pattern, segment.start)
+            pieces[id(segment)] = [
+                _Segment(start, end, segment.page, segment.section, segment.boundary and i == 0)
+                for i, (start, end) in enumerate(spans)
+            ]
+        flat = [piece for group in pieces.values() for piece in group]
+        for piece, tokens in zip(flat, count_tokens([text[piece.start:piece.end] for piece in flat])):
+            piece.tokens = tokens
+        segments = [piece for segment in segments for piece in pieces.get(id(segment), [segment])]
+    return segments
+
+def chunk_pages(
+    pages: Sequence[str],
+    ext: str,
+    count_tokens: TokenCounter = approximate_token_counts,
+    max_input_tokens: int = 256,
+    config: Optional[ChunkingConfig] = None,
+) -> List[Dict]:
+    """
+    Chunks a document into pieces that fill, but never exceed, the embedding
+    model's input window.
+
+    Paragraphs (split further into sentences, words or, for unbroken runs,
+    characters only when too long) are packed greedily into chunks measured
+    in tokens. A new chunk starts at Markdown headings or PDF pages when the
+    config asks for it, once the current chunk holds at least `min_tokens`.
+    Trailing paragraphs of up to `overlap_tokens` are repeated at the start
+    of the next chunk.
+
+    Args:
+        pages: The extracted text, one entry per PDF page (or a single entry).
+        ext: The file extension, selecting the config and structure rules.
+        count_tokens: Counts tokens for a batch of texts (the embedder's tokenizer).
+        max_input_tokens: The embedding model's input limit, used when the
+                          config has no `chunk_tokens`.
+        config: Overrides the config for `ext`.
+
+    Returns:
+        A list of chunk dictionaries with the text, paragraph_id, start/end
+        offsets into the document text (pages joined by PAGE_SEPARATOR),
+        page numbers (PDF), heading path (Markdown) and token count.
+    """
+    config = config or CHUNKING_CONFIGS.get(ext, ChunkingConfig())
+    limit = min(config.chunk_tokens or max_input_tokens, max_input_tokens)
+    text, segments = _segments(pages, ext, config)
+    if not segments:
+        return []
+    segments = _split_oversized(text, segments, limit, count_tokens)
+
+    groups: List[List[_Segment]] = []
+    current: List[_Segment] = []
+    current_tokens = 0
+    for segment in segments:
+        at_boundary = segment.boundary and current_tokens >= config.min_tokens
+        if current and (at_boundary or current_tokens + segment.tokens > limit):
+            groups.append(current)
+            overlap: List[_Segment] = []
+            if not at_boundary:
+                overlap_tokens = 0
+                for previous in reversed(current):
+                    if overlap_tokens + previous.tokens > config.overlap_tokens or overlap_tokens + previous.tokens + segment.tokens > limit:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_tokens += previous.tokens
+            current, current_tokens = overlap, sum(previous.tokens for previous in overlap)
+        current.append(segment)
+        current_tokens += segment.tokens
+    if current:
+        groups.append(current)
+
+    chunks = []
+    for i, group in enumerate(groups):
+        start, end = group[0].start, group[-1].end
+        chunk = {
+            "text": text[start:end],
+            "paragraph_id": i,
+            "start_offset": start,
+            "end_offset": end,
+            "token_count": sum(segment.tokens for segment in group),
+        }
+        if group[0].page is not None:
+            chunk["page"] = group[0].page
+            chunk["page_end"] = group[-1].page
+        sections = [segment.section for segment in group if segment.section]
+        if sections:
+            chunk["section"] = sections[0]
+        chunks.append(chunk)
+    logger.debug("Chunked %s characters into %s chunks of at most %s tokens.", len(text), len(chunks), limit)
+    return chunks
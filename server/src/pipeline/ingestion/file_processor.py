@@ -1,11 +1,14 @@
 from fastapi import UploadFile, HTTPException
 from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 import tempfile
 import os
 
+from ..shared.metrics import time_stage
+from ..shared.embedding import MAX_INPUT_TOKENS, count_tokens
+from .chunker import chunk_pages
+
 async def extract_and_chunk_file(file: UploadFile):
-    """Extracts text from a file and chunks it."""
+    """Extracts text from a file and chunks it to the embedding model's token window."""
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
             tmp.write(await file.read())
@@ -22,13 +25,14 @@ async def extract_and_chunk_file(file: UploadFile):
         if ext not in loader_map:
             raise HTTPException(status_code=400, detail="Unsupported file type.")
 
-        loader = loader_map[ext](tmp_path)
-        documents = loader.load()
-
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100, length_function=len)
-        chunks = text_splitter.split_documents(documents)
+        with time_stage("extraction"):
+            loader = loader_map[ext](tmp_path)
+            documents = loader.load()
 
-        return [{"text": chunk.page_content, "paragraph_id": i, "start_offset": 0, "end_offset": len(chunk.page_content)} for i, chunk in enumerate(chunks)]
+        with time_stage("chunking"):
+            # PyPDFLoader yields one document per page; the other loaders a single document
+            pages = [document.page_content for document in documents]
+            return chunk_pages(pages, ext, count_tokens=count_tokens, max_input_tokens=MAX_INPUT_TOKENS)
 
     finally:
         if 'tmp_path' in locals() and os.path.exists(tmp_path):
@@ -1,15 +1,112 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
 import nltk
-from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 
-nltk.download('stopwords')
-nltk.download('wordnet')
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# NLTK corpora are read from this directory and never downloaded at import.
+# Populate it once with: python -m nltk.downloader -d <NLTK_DATA_PATH> stopwords wordnet omw-1.4
+NLTK_DATA_PATH = os.environ.get("NLTK_DATA_PATH", "server/nltk_data")
+# Distinct words whose lemmas are cached (per process)
+LEMMA_CACHE_SIZE = int(os.environ.get("LEMMA_CACHE_SIZE", 100000))
+# Batches with at least this many characters in total are spread over a process pool
+PREPROCESS_PARALLEL_MIN_CHARS = int(os.environ.get("PREPROCESS_PARALLEL_MIN_CHARS", 1000000))
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", os.cpu_count() or 1))
+
+if NLTK_DATA_PATH not in nltk.data.path:
+    nltk.data.path.insert(0, NLTK_DATA_PATH)
+
+_TOKEN = re.compile(r"\w+(?:'\w+)?")
 
-stop_words = set(stopwords.words('english'))
 lemmatizer = WordNetLemmatizer()
+_stop_words: Optional[frozenset] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_stop_words() -> frozenset:
+    """Loads the English stopword list from NLTK_DATA_PATH on first use."""
+    global _stop_words
+    if _stop_words is None:
+        try:
+            from nltk.corpus import stopwords
+            _stop_words = frozenset(stopwords.words('english'))
+        except LookupError as e:
+            raise LookupError(
+                f"NLTK data not found in {NLTK_DATA_PATH}. Run: "
+                f"python -m nltk.downloader -d {NLTK_DATA_PATH} stopwords wordnet omw-1.4"
+            ) from e
+    return _stop_words
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word: str) -> str:
+    """Lemmatizes one word, caching the result since word frequencies are heavily skewed."""
+    return lemmatizer.lemmatize(word)
 
 def preprocess_text(text):
     """Cleans, normalizes, and lemmatizes text."""
-    words = text.lower().split()
-    lemmatized_words = [lemmatizer.lemmatize(w) for w in words if w not in stop_words]
-    return " ".join(lemmatized_words)
+    stop_words = _get_stop_words()
+    return " ".join(lemmatize(w) for w in _TOKEN.findall(text.lower()) if w not in stop_words)
+
+def _preprocess_many(texts: Sequence[str]) -> List[str]:
+    return [preprocess_text(text) for text in texts]
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Creates the shared process pool on first use. Workers are spawned rather
+    than forked, since forking a process that runs server threads can copy
+    locks held by other threads into the children.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _shutdown_pool():
+    """Stops the pool's worker processes, if it was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+atexit.register(_shutdown_pool)
+
+def preprocess_batch(texts: Sequence[str], parallel: Optional[bool] = None) -> List[str]:
+    """
+    Preprocesses a list of chunks, preserving order.
+
+    Large batches (PREPROCESS_PARALLEL_MIN_CHARS or more in total) are split
+    into one slice per worker and run on a shared process pool; each worker
+    keeps its own lemma cache across batches.
+
+    Args:
+        texts: The chunk texts to preprocess.
+        parallel: Force (True) or disable (False) the process pool; by default
+                  it is used only for large batches.
+
+    Returns:
+        The preprocessed texts, in the same order.
+    """
+    texts = list(texts)
+    if parallel is None:
+        parallel = len(texts) > 1 and sum(len(text) for text in texts) >= PREPROCESS_PARALLEL_MIN_CHARS
+    if not parallel or PREPROCESS_WORKERS <= 1:
+        return _preprocess_many(texts)
+
+    # Fail fast in the parent if the NLTK data is missing
+    _get_stop_words()
+    slice_size = -(-len(texts) // PREPROCESS_WORKERS)
+    slices = [texts[i:i + slice_size] for i in range(0, len(texts), slice_size)]
+    logger.debug("Preprocessing %s texts in %s slices on the process pool.", len(texts), len(slices))
+    return [result for results in _get_pool().map(_preprocess_many, slices) for result in results]
@@ -1,7 +1,36 @@
 import os
 import shutil
 
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+class UploadTooLargeError(ValueError):
+    """Raised when a stream exceeds the size allowed for it while being saved."""
+
 def save_raw_file(file, file_path):
     """Saves the raw file to the specified path."""
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
+
+def save_raw_stream(stream, file_path, max_bytes=None) -> int:
+    """
+    Copies a readable binary stream to the specified path and returns the bytes written.
+
+    If `max_bytes` is given, copying stops as soon as the stream exceeds it;
+    the partial file is removed and UploadTooLargeError is raised, so a
+    compressed archive member can never expand past its limit on disk.
+    """
+    written = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            while True:
+                data = stream.read(_COPY_BUFFER_SIZE)
+                if not data:
+                    return written
+                written += len(data)
+                if max_bytes is not None and written > max_bytes:
+                    raise UploadTooLargeError(f"exceeds the limit of {max_bytes} bytes")
+                buffer.write(data)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
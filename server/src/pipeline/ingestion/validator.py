@@ -1,8 +1,14 @@
 from fastapi import HTTPException
 
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt", ".md")
+
+def is_supported_filename(filename: str) -> bool:
+    """Returns True if the file extension is one the ingestion pipeline can process."""
+    return bool(filename) and filename.endswith(SUPPORTED_EXTENSIONS)
+
 def validate_file(file):
     """Validates file type, size, and integrity."""
     # Add file validation logic here
-    if not file.filename.endswith((".pdf", ".docx", ".txt", ".md")):
+    if not is_supported_filename(file.filename):
         raise HTTPException(status_code=400, detail="Invalid file type.")
     return True
@@ -0,0 +1,176 @@
+
+import logging
+import threading
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+@dataclass
+class GenerationJob:
+    """A single quiz, flashcard or summary generation request for one document."""
+    kind: str  # "quiz", "flashcards" or "summary"
+    job_id: str
+    doc_id: str
+    params: Dict
+
+class GenerationCoordinator:
+    """
+    Schedules quiz, flashcard and summary generation jobs onto an executor.
+
+    - Concurrent submissions of the same job_id are coalesced onto one
+      in-flight future.
+    - Jobs for the same document that arrive within `batch_window` seconds
+      are handed to `run_batch` together so they can share one retrieval
+      and one LLM call.
+    - Jobs missing from a batch result (or a batch that raised) are retried
+      with exponential backoff, up to `max_attempts` attempts in total. Each
+      retried job is sent on its own, so a response that ignored the batch
+      format is not simply repeated.
+
+    Args:
+        executor: The executor that runs the batches.
+        run_batch: Callable taking a list of jobs for one document and
+                   returning a dict of job_id -> generated items.
+        on_success: Called with (job, items) once a job has its items.
+        on_failure: Called with (job, error) once a job has exhausted its retries.
+    """
+    def __init__(
+        self,
+        executor: Executor,
+        run_batch: Callable[[List[GenerationJob]], Dict[str, List[Dict]]],
+        on_success: Callable[[GenerationJob, List[Dict]], None],
+        on_failure: Callable[[GenerationJob, Exception], None],
+        batch_window: float = 0.5,
+        max_batch_size: int = 4,
+        max_attempts: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        self.executor = executor
+        self.run_batch = run_batch
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.batch_window = batch_window
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}  # job_id -> future
+        self._pending: Dict[str, List[GenerationJob]] = {}  # doc_id -> jobs waiting for the window
+        self._timers: Dict[str, threading.Timer] = {}  # doc_id -> window timer
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs submitted but not yet completed or failed."""
+        return len(self._inflight)
+
+    def submit(self, job: GenerationJob) -> Future:
+        """Submits a job, returning the existing future if an identical job is in flight."""
+        ready_batch = None
+        with self._lock:
+            future = self._inflight.get(job.job_id)
+            if future is not None:
+                logger.info("Coalescing generation job %s onto in-flight request.", job.job_id)
+                return future
+
+            future = Future()
+            self._inflight[job.job_id] = future
+            pending = self._pending.setdefault(job.doc_id, [])
+            pending.append(job)
+
+            if len(pending) >= self.max_batch_size or self.batch_window <= 0:
+                ready_batch = self._pop_pending(job.doc_id)
+            elif job.doc_id not in self._timers:
+                timer = threading.Timer(self.batch_window, self._flush, args=(job.doc_id,))
+                timer.daemon = True
+                self._timers[job.doc_id] = timer
+                timer.start()
+
+        if ready_batch:
+            self._dispatch(ready_batch)
+        return future
+
+    def _pop_pending(self, doc_id: str) -> List[GenerationJob]:
+        """Removes and returns the pending jobs for a document. Caller must hold the lock."""
+        timer = self._timers.pop(doc_id, None)
+        if timer is not None:
+            timer.cancel()
+        return self._pending.pop(doc_id, [])
+
+    def _flush(self, doc_id: str):
+        """Dispatches whatever has accumulated for a document once its window closes."""
+        with self._lock:
+            batch = self._pop_pending(doc_id)
+        if batch:
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[GenerationJob], attempt: int = 1):
+        logger.info("Dispatching generation batch of %s job(s) for doc: %s", len(batch), batch[0].doc_id)
+        self.executor.submit(self._run, batch, attempt)
+
+    def _run(self, batch: List[GenerationJob], attempt: int = 1):
+        """
+        Runs one attempt of a batch. Jobs that did not produce a result are
+        resubmitted one by one after a backoff delay by a timer, so no
+        executor worker is held while waiting.
+        """
+        error = None
+        try:
+            results = self.run_batch(batch)
+        except Exception as e:
+            logger.error("Generation batch attempt %s failed: %s", attempt, e, exc_info=True)
+            results = {}
+            error = e
+
+        failed = []
+        for job in batch:
+            if job.job_id in results:
+                self._complete(job, results[job.job_id])
+            else:
+                failed.append(job)
+
+        if not failed:
+            return
+        if attempt >= self.max_attempts:
+            error = error or ValueError("LLM response did not contain a result for this job.")
+            for job in failed:
+                self._fail(job, error)
+            return
+
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        logger.warning("Retrying %s generation job(s) in %.1fs (attempt %s/%s).", len(failed), delay, attempt + 1, self.max_attempts)
+        timer = threading.Timer(delay, self._retry, args=(failed, attempt + 1))
+        timer.daemon = True
+        timer.start()
+
+    def _retry(self, jobs: List[GenerationJob], attempt: int):
+        """Dispatches each job that needs another attempt as a batch of its own."""
+        for job in jobs:
+            self._dispatch([job], attempt)
+
+    def _complete(self, job: GenerationJob, items: List[Dict]):
+        try:
+            self.on_success(job, items)
+        except Exception as e:
+            logger.error("Error storing result for generation job %s: %s", job.job_id, e, exc_info=True)
+        future = self._release(job)
+        if future is not None:
+            future.set_result(items)
+
+    def _fail(self, job: GenerationJob, error: Exception):
+        try:
+            self.on_failure(job, error)
+        except Exception as e:
+            logger.error("Error recording failure for generation job %s: %s", job.job_id, e, exc_info=True)
+        future = self._release(job)
+        if future is not None:
+            future.set_exception(error)
+
+    def _release(self, job: GenerationJob):
+        with self._lock:
+            return self._inflight.pop(job.job_id, None)
@@ -2,9 +2,21 @@
 import google.generativeai as genai
 import os
 
+from ..shared.metrics import LLM_ERRORS, LLM_TOKENS, time_stage
+
 def invoke_llm(prompt):
     """Invokes the LLM to generate a response."""
     genai.configure(api_key=os.environ["GEMINI_API_KEY"])
     model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
+    try:
+        with time_stage("llm_call"):
+            response = model.generate_content(prompt)
+    except Exception as e:
+        LLM_ERRORS.inc(error=type(e).__name__)
+        raise
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, direction="prompt")
+        LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, direction="completion")
     return response.text
@@ -0,0 +1,139 @@
+
+import contextvars
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def partition_sections(
+    chunks: Sequence[Dict],
+    max_sections: int,
+    section_chunks: int,
+    max_section_chunks: Optional[int] = None,
+) -> List[List[Dict]]:
+    """
+    Splits a document's chunks into at most `max_sections` contiguous sections.
+
+    Sections hold `section_chunks` chunks while that covers the document. For
+    larger documents the section size grows with the chunk count, up to
+    `max_section_chunks`, so every chunk is still seen by a map call. Only
+    documents larger than `max_sections * max_section_chunks` are sampled:
+    chunks are then picked evenly within each section, which bounds the
+    number and size of LLM calls at the cost of coverage.
+
+    Args:
+        chunks: The document's chunks, in document order.
+        max_sections: The maximum number of sections (i.e. map calls).
+        section_chunks: The preferred number of chunks per section.
+        max_section_chunks: The most chunks a section may grow to (the prompt
+                            size limit); defaults to `section_chunks`.
+
+    Returns:
+        A list of sections, each a list of chunk dictionaries.
+    """
+    if not chunks:
+        return []
+    section_count = min(max_sections, math.ceil(len(chunks) / section_chunks))
+    section_size = min(max(section_chunks, max_section_chunks or section_chunks), math.ceil(len(chunks) / section_count))
+    if section_count * section_size < len(chunks):
+        logger.info(
+            "Document has %s chunks; map-reduce samples %s of them (%s sections of %s).",
+            len(chunks), section_count * section_size, section_count, section_size,
+        )
+    bounds = np.linspace(0, len(chunks), section_count + 1).astype(int)
+
+    sections = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        span = chunks[start:end]
+        if len(span) > section_size:
+            picks = np.linspace(0, len(span) - 1, section_size).astype(int)
+            span = [span[i] for i in picks]
+        sections.append(list(span))
+    return sections
+
+class MapExecutor:
+    """
+    Runs the map step of every map-reduce job on one shared, bounded thread pool.
+
+    Sharing the pool caps the total number of concurrent section calls across
+    all jobs, not just within one job.
+    """
+    def __init__(self, max_concurrency: int):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="map-reduce")
+
+    def map_sections(self, sections: Sequence[Any], map_fn: Callable[[Any], Dict]) -> List[Dict]:
+        """
+        Applies `map_fn` to every section in parallel.
+
+        A section whose call raises contributes an empty dict rather than
+        failing the whole job. Each call runs in a copy of the caller's
+        context so profiling spans attach to the calling job.
+        """
+        futures = [self.pool.submit(contextvars.copy_context().run, map_fn, section) for section in sections]
+        results = []
+        for i, future in enumerate(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error("Map call for section %s failed: %s", i, e, exc_info=True)
+                results.append({})
+        return results
+
+def item_text(item: Any) -> str:
+    """Returns the text of a generated quiz question or flashcard used for similarity."""
+    if isinstance(item, dict):
+        for key in ("question", "front"):
+            if isinstance(item.get(key), str):
+                return item[key]
+        return json.dumps(item, sort_keys=True)
+    return str(item)
+
+def reduce_candidates(
+    candidates: Sequence[Sequence[Any]],
+    count: int,
+    embed_fn: Callable[[List[str]], List[List[float]]],
+    similarity_threshold: float = 0.9,
+) -> List[Any]:
+    """
+    Deduplicates per-section candidate items and selects `count` of them.
+
+    Candidates are interleaved round-robin across sections so the selection
+    covers the whole document, then an item is dropped if its embedding's
+    cosine similarity to an already selected item reaches `similarity_threshold`.
+
+    Args:
+        candidates: One list of generated items per section.
+        count: The number of items to select.
+        embed_fn: Embeds a batch of texts.
+        similarity_threshold: Cosine similarity at or above which items are duplicates.
+
+    Returns:
+        Up to `count` items.
+    """
+    ordered = [item for group in zip_longest(*candidates) for item in group if item is not None]
+    if not ordered:
+        return []
+
+    vectors = np.asarray(embed_fn([item_text(item) for item in ordered]), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    similarities = vectors @ vectors.T
+
+    selected: List[int] = []
+    for i in range(len(ordered)):
+        if selected and similarities[i, selected].max() >= similarity_threshold:
+            continue
+        selected.append(i)
+        if len(selected) == count:
+            break
+
+    logger.debug("Reduced %s candidates to %s items.", len(ordered), len(selected))
+    return [ordered[i] for i in selected]
@@ -0,0 +1,164 @@
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from ..shared.metrics import PRECOMPUTE_TASKS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PrecomputeTask:
+    """
+    One speculative generation for a processed document.
+
+    `run` blocks until the artifact is stored and returns False if there was
+    nothing to do (e.g. a user already requested it), in which case the task
+    is not charged to the session's budget.
+    """
+    name: str  # "quiz", "flashcards" or "summary"
+    doc_id: str
+    session_id: Optional[str]
+    run: Callable[[], bool]
+
+class Precomputer:
+    """
+    Runs speculative generation tasks one at a time on a low-priority worker
+    thread, and only while `is_idle()` reports no user-requested generation
+    in flight.
+
+    Each session may spend at most `session_budget` tasks; tasks beyond that
+    are dropped. Documents uploaded without a session are budgeted per
+    document instead of sharing one budget. A budget is forgotten once it has
+    not been charged for `budget_ttl_seconds`, and at most `max_budgets` are
+    tracked (least recently charged are forgotten first). Tasks enqueued
+    before `start()` (e.g. from the offline importer, which never starts a
+    worker) are ignored.
+
+    Args:
+        is_idle: Returns True when the LLM has no user work in flight.
+        session_budget: Maximum precomputed artifacts per session; 0 for unlimited.
+        idle_poll_interval: Seconds between idleness checks while work is waiting.
+        max_queued: Oldest tasks are dropped beyond this many.
+        budget_ttl_seconds: How long a session's spending is remembered since its last task.
+        max_budgets: Maximum number of sessions whose spending is tracked.
+    """
+    def __init__(
+        self,
+        is_idle: Callable[[], bool],
+        session_budget: int = 12,
+        idle_poll_interval: float = 1.0,
+        max_queued: int = 1000,
+        budget_ttl_seconds: float = 24 * 3600,
+        max_budgets: int = 10000,
+    ):
+        self.is_idle = is_idle
+        self.session_budget = session_budget
+        self.idle_poll_interval = idle_poll_interval
+        self._queue: Deque[PrecomputeTask] = deque(maxlen=max_queued)
+        self.budget_ttl_seconds = budget_ttl_seconds
+        self.max_budgets = max_budgets
+        self._spent: "OrderedDict[Hashable, Tuple[int, float]]" = OrderedDict()  # budget key -> (tasks run, last charged)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._work, name="precompute", daemon=True)
+        self._thread.start()
+        logger.info("Precompute worker started (session budget: %s).", self.session_budget or "unlimited")
+
+    def enqueue(self, tasks: List[PrecomputeTask]):
+        if self._thread is None or not tasks:
+            return
+        with self._lock:
+            self._queue.extend(tasks)
+        self._wakeup.set()
+        logger.debug("Queued %s precompute task(s) for doc: %s", len(tasks), tasks[0].doc_id)
+
+    def discard(self, doc_id: str):
+        """Drops queued tasks for a document, e.g. after it is deleted."""
+        with self._lock:
+            kept = [task for task in self._queue if task.doc_id != doc_id]
+            self._queue.clear()
+            self._queue.extend(kept)
+
+    @staticmethod
+    def _budget_key(session_id: Optional[str], doc_id: str) -> Hashable:
+        return session_id if session_id is not None else ("doc", doc_id)
+
+    def _spent_by(self, key: Hashable, now: float) -> int:
+        """Returns the tasks charged to a budget, forgetting it if it has expired. Caller must hold the lock."""
+        entry = self._spent.get(key)
+        if entry is None:
+            return 0
+        if self.budget_ttl_seconds > 0 and now - entry[1] > self.budget_ttl_seconds:
+            del self._spent[key]
+            return 0
+        return entry[0]
+
+    def remaining_budget(self, session_id: Optional[str], doc_id: Optional[str] = None) -> Optional[int]:
+        """Returns the tasks a session (or, without one, a document) may still run; None if unlimited."""
+        if not self.session_budget:
+            return None
+        with self._lock:
+            return max(0, self.session_budget - self._spent_by(self._budget_key(session_id, doc_id), time.time()))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"queued": len(self._queue), "sessions": len(self._spent), "spent": sum(count for count, _ in self._spent.values())}
+
+    def _next_task(self) -> Optional[PrecomputeTask]:
+        with self._lock:
+            while self._queue:
+                task = self._queue.popleft()
+                key = self._budget_key(task.session_id, task.doc_id)
+                if self.session_budget and self._spent_by(key, time.time()) >= self.session_budget:
+                    PRECOMPUTE_TASKS.inc(task=task.name, outcome="over_budget")
+                    continue
+                return task
+            self._wakeup.clear()
+            return None
+
+    def _charge(self, task: PrecomputeTask):
+        now = time.time()
+        key = self._budget_key(task.session_id, task.doc_id)
+        with self._lock:
+            self._spent[key] = (self._spent_by(key, now) + 1, now)
+            self._spent.move_to_end(key)
+            while self._spent:
+                oldest_key, (_, charged_at) = next(iter(self._spent.items()))
+                if len(self._spent) <= self.max_budgets and not (self.budget_ttl_seconds > 0 and now - charged_at > self.budget_ttl_seconds):
+                    break
+                del self._spent[oldest_key]
+
+    def _work(self):
+        while True:
+            self._wakeup.wait()
+            if not self.is_idle():
+                # The event stays set while tasks are queued, so back off until the LLM is idle
+                time.sleep(self.idle_poll_interval)
+                continue
+
+            task = self._next_task()
+            if task is None:
+                continue
+            try:
+                ran = task.run()
+            except Exception as e:
+                PRECOMPUTE_TASKS.inc(task=task.name, outcome="failed")
+                self._charge(task)
+                logger.error("Precompute %s failed for doc %s: %s", task.name, task.doc_id, e, exc_info=True)
+                continue
+            if ran:
+                self._charge(task)
+                PRECOMPUTE_TASKS.inc(task=task.name, outcome="ready")
+                logger.info("Precomputed %s for doc: %s", task.name, task.doc_id)
+            else:
+                PRECOMPUTE_TASKS.inc(task=task.name, outcome="skipped")
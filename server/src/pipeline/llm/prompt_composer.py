@@ -1,4 +1,7 @@
 
+from typing import Dict, Optional
+
+from .structured_output import is_multiple_choice
 
 def compose_prompt(context: str, query: str) -> str:
     """
@@ -32,3 +35,54 @@ def compose_prompt(context: str, query: str) -> str:
 ANSWER:"""
     
     return prompt
+
+def compose_batch_prompt(context: str, tasks: Dict[str, str]) -> str:
+    """
+    Composes a single prompt that asks the LLM to complete several generation
+    tasks over the same context, keyed so the output can be split back apart.
+
+    Args:
+        context: The relevant text retrieved from the knowledge base.
+        tasks: A mapping of task id to the instruction for that task.
+
+    Returns:
+        The fully formatted prompt string.
+    """
+    task_lines = "\n".join(f"- {task_id}: {instruction}" for task_id, instruction in tasks.items())
+    query = (
+        "Complete each of the following tasks using only the context above.\n"
+        f"{task_lines}\n\n"
+        "Respond with a single JSON object whose keys are the task ids "
+        f"({', '.join(tasks)}) and whose values are the JSON arrays produced for each task."
+    )
+    return compose_prompt(context, query)
+
+def compose_generation_instruction(kind: str, params: Dict, count: Optional[int] = None) -> str:
+    """
+    Builds the instruction for a quiz or flashcard generation task.
+
+    Args:
+        kind: "quiz" or "flashcards".
+        params: The request parameters of the job.
+        count: Overrides the number of items the request asks for.
+
+    Returns:
+        The instruction string.
+    """
+    if kind == "quiz":
+        count = count or params['question_count']
+        question_types = params.get('question_types') or ["multiple-choice"]
+        if all(is_multiple_choice(question_type) for question_type in question_types):
+            return (
+                f"Generate a {params['difficulty']} quiz with {count} questions in JSON format. "
+                "Each question should have a 'question', a list of 'options' and the correct 'answer', "
+                "which must repeat one of the options verbatim."
+            )
+        return (
+            f"Generate a {params['difficulty']} quiz with {count} questions in JSON format, "
+            f"using these question types: {', '.join(question_types)}. "
+            "Each question should have a 'type', a 'question' and the correct 'answer'. "
+            "Multiple-choice questions also need a list of 'options', and their 'answer' must repeat one of the options verbatim."
+        )
+    count = count or params['count']
+    return f"Generate {count} flashcards in JSON format. Each flashcard should have a 'front' and a 'back'."
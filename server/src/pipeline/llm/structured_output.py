@@ -0,0 +1,334 @@
+
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, validator
+
+from ..shared.metrics import STRUCTURED_OUTPUT
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _non_empty_string(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("must be a non-empty string")
+    return value
+
+# Question types whose answer must be one of the listed options
+_MULTIPLE_CHOICE_TYPES = {"multiple-choice", "mcq"}
+# The "A) " / "b. " / "(C) " label an option may start with
+_OPTION_LABEL = re.compile(r"^\(?[A-Za-z][).:]\s*")
+# An answer naming an option by its letter: "A", "b)", "(C)" or "D."
+_CHOICE_LETTER = re.compile(r"^\(?([A-Za-z])[).:]?$")
+
+def is_multiple_choice(question_type: str) -> bool:
+    """Returns True if a question type ("multiple-choice", "Multiple choice", "mcq", ...) lists options."""
+    return re.sub(r"[\s_]+", "-", str(question_type).strip().lower()) in _MULTIPLE_CHOICE_TYPES
+
+def _option_key(text: str) -> str:
+    return _OPTION_LABEL.sub("", text.strip(), count=1).strip().casefold()
+
+def _match_option(answer, options: List[str]) -> Optional[str]:
+    """
+    Returns the option an answer refers to: by its text (ignoring case and
+    any "A) " label), by a choice letter, or by a 0-based index. None if none match.
+    """
+    text = str(answer).strip()
+    exact = [option.strip() for option in options]
+    if text in exact:
+        return options[exact.index(text)]
+    keys = [_option_key(option) for option in options]
+    if _option_key(text) in keys:
+        return options[keys.index(_option_key(text))]
+    if isinstance(answer, int) and not isinstance(answer, bool):
+        return options[answer] if 0 <= answer < len(options) else None
+    letter = _CHOICE_LETTER.match(text)
+    if letter:
+        index = ord(letter.group(1).lower()) - ord("a")
+        return options[index] if index < len(options) else None
+    return None
+
+class QuizQuestion(BaseModel):
+    """A quiz question; if it lists options, its answer must be one of them."""
+    question: str
+    options: Optional[List[str]] = None
+    answer: str
+
+    class Config:
+        extra = "allow"
+
+    @validator("question", pre=True)
+    def _not_blank(cls, value):
+        return _non_empty_string(value)
+
+    @validator("options", pre=True)
+    def _option_strings(cls, value):
+        if not isinstance(value, list):
+            raise ValueError("must be a list")
+        return [_non_empty_string(option) for option in value]
+
+    @validator("answer", pre=True)
+    def _answer_is_an_option(cls, value, values):
+        # Letter or index answers ("B", 1) are replaced by the option text they name
+        options = values.get("options")
+        if not options:
+            return _non_empty_string(value)
+        option = _match_option(value, options)
+        if option is None:
+            raise ValueError("must be one of the options")
+        return option
+
+class MultipleChoiceQuestion(QuizQuestion):
+    """A multiple-choice question, which must list at least one option."""
+    options: List[str]
+
+    @validator("options")
+    def _has_options(cls, value):
+        if not value:
+            raise ValueError("must list at least one option")
+        return value
+
+class Flashcard(BaseModel):
+    front: str
+    back: str
+
+    class Config:
+        extra = "allow"
+
+    @validator("front", "back", pre=True)
+    def _not_blank(cls, value):
+        return _non_empty_string(value)
+
+# The schema each generated item must satisfy, by job kind
+ITEM_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    "quiz": MultipleChoiceQuestion,
+    "flashcards": Flashcard,
+}
+
+class StructuredOutputError(ValueError):
+    """Raised when no JSON value at all can be recovered from an LLM response."""
+
+def _strip_code_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        newline = text.find("\n")
+        text = text[newline + 1:] if newline != -1 else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+def _repair_candidates(text: str, start: int) -> Iterator[Tuple[str, int]]:
+    """
+    Scans a (possibly truncated) JSON value once and yields repaired documents
+    with the position they were cut at, most complete first.
+
+    Cuts are only made at element boundaries of the outermost arrays (the
+    item lists): cutting there and closing the still-open containers gives
+    valid JSON that keeps every complete item seen so far, while an item that
+    was cut off part-way is dropped entirely rather than kept half-filled.
+    """
+    stack: List[str] = []
+    arrays = 0  # open arrays on the stack
+    cuts: List[Tuple[int, str]] = []  # (end position, closing brackets)
+    in_string = escaped = False
+    for pos in range(start, len(text)):
+        char = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+            if char == "[":
+                arrays += 1
+                if arrays == 1:
+                    # An empty item list is also a valid cut
+                    cuts.append((pos + 1, "".join(reversed(stack))))
+        elif char in "}]":
+            if not stack:
+                break
+            closed = stack.pop()
+            if closed == "]":
+                arrays -= 1
+            # After a complete item of an outermost array, or after the array itself
+            if (closed == "]" and arrays == 0) or (stack and stack[-1] == "]" and arrays == 1):
+                cuts.append((pos + 1, "".join(reversed(stack))))
+            if not stack:
+                break
+        elif char == "," and stack and stack[-1] == "]" and arrays == 1:
+            cuts.append((pos, "".join(reversed(stack))))
+
+    for end, closers in reversed(cuts):
+        yield text[start:end] + closers, end
+
+def _next_start(text: str, pos: int) -> int:
+    starts = [found for found in (text.find("{", pos), text.find("[", pos)) if found != -1]
+    return min(starts) if starts else -1
+
+def parse_json_tolerant(text: str) -> Tuple[Any, bool]:
+    """
+    Parses the JSON object or array in an LLM response.
+
+    Surrounding prose and code fences are ignored, as are bracketed fragments
+    of the prose (e.g. citations like "[1]"): every bracket is tried in turn
+    and the largest value found wins. If a value is truncated or malformed,
+    it is cut back to the last complete item of its item list and its open
+    brackets are closed.
+
+    Returns:
+        A tuple of (value, recovered), where `recovered` is True if strict
+        parsing of the whole response would have failed (surrounding prose,
+        or a value that had to be cut back).
+
+    Raises:
+        StructuredOutputError: If no JSON value can be recovered.
+    """
+    text = _strip_code_fences(text)
+    decoder = json.JSONDecoder()
+    best: Optional[Tuple[Any, int, int, bool]] = None  # (value, start, end, repaired)
+    pos = _next_start(text, 0)
+    if pos == -1:
+        raise StructuredOutputError("No JSON object or array found in LLM response.")
+
+    while pos != -1:
+        try:
+            value, end = decoder.raw_decode(text, pos)
+            found = (value, pos, end, False)
+        except json.JSONDecodeError:
+            found = None
+            for candidate, end in _repair_candidates(text, pos):
+                try:
+                    found = (json.loads(candidate), pos, end, True)
+                    break
+                except json.JSONDecodeError:
+                    continue
+        if found is not None and (best is None or found[2] - found[1] > best[2] - best[1]):
+            best = found
+        # Skip brackets nested inside what was just parsed
+        pos = _next_start(text, found[2] if found is not None and found[2] > pos + 1 else pos + 1)
+
+    if best is None:
+        raise StructuredOutputError("LLM response did not contain a recoverable JSON value.")
+    value, start, end, repaired = best
+    return value, repaired or bool(text[:start].strip() or text[end:].strip())
+
+def _item_schema(item: Any, kind: str, question_types: Optional[List[str]]) -> Optional[Type[BaseModel]]:
+    """
+    Picks the schema for one item. Quiz questions need options only when
+    they are multiple-choice: by their own 'type' if they give one, else if
+    the job asked for multiple-choice questions only.
+    """
+    schema = ITEM_SCHEMAS.get(kind)
+    if schema is not MultipleChoiceQuestion:
+        return schema
+    item_type = item.get("type") if isinstance(item, dict) else None
+    if item_type:
+        return MultipleChoiceQuestion if is_multiple_choice(item_type) else QuizQuestion
+    question_types = question_types or ["multiple-choice"]
+    return MultipleChoiceQuestion if all(map(is_multiple_choice, question_types)) else QuizQuestion
+
+def validate_items(items: Any, kind: str, question_types: Optional[List[str]] = None) -> Tuple[List[Dict], int]:
+    """
+    Validates generated items one by one against the schema for `kind`.
+
+    Args:
+        items: The generated items.
+        kind: The job kind, "quiz" or "flashcards".
+        question_types: The question types a quiz job asked for (multiple-choice if not given).
+
+    Returns:
+        A tuple of (valid items as dicts, number of items rejected).
+    """
+    if not isinstance(items, list):
+        return [], 0
+    if ITEM_SCHEMAS.get(kind) is None:
+        return list(items), 0
+
+    valid, rejected = [], 0
+    for item in items:
+        try:
+            valid.append(_item_schema(item, kind, question_types).parse_obj(item).dict(exclude_unset=True))
+        except (ValidationError, TypeError) as e:
+            rejected += 1
+            logger.debug("Rejected generated %s item: %s", kind, e)
+    return valid, rejected
+
+class StructuredOutputStats:
+    """
+    Counts how LLM responses were recovered, to report the LLM calls saved:
+    responses that strict parsing would have rejected (failing the job and
+    forcing a full regeneration) but that yielded usable items here, less the
+    targeted continuation calls spent topping up short responses.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.saved_calls = 0
+        self.continuation_calls = 0
+        self.items_salvaged = 0
+        self.items_from_continuations = 0
+        self.items_rejected = 0
+
+    def record_response(self, recovered: bool, items: int, rejected: int):
+        """Records one parsed response with its number of valid and rejected items."""
+        outcome = "clean" if not recovered else ("salvaged" if items else "unusable")
+        STRUCTURED_OUTPUT.inc(outcome=outcome)
+        with self._lock:
+            self.responses += 1
+            self.items_rejected += rejected
+            if recovered and items:
+                self.saved_calls += 1
+                self.items_salvaged += items
+
+    def record_continuation(self, items_added: int):
+        STRUCTURED_OUTPUT.inc(outcome="continuation")
+        with self._lock:
+            self.continuation_calls += 1
+            self.items_from_continuations += items_added
+
+    def report(self) -> Dict:
+        with self._lock:
+            net_saved = self.saved_calls - self.continuation_calls
+            return {
+                "responses": self.responses,
+                "saved_calls": self.saved_calls,
+                "continuation_calls": self.continuation_calls,
+                "net_calls_saved": net_saved,
+                # Relative to the calls strict parsing would have needed: every response plus a regeneration per salvage
+                "saved_call_fraction": round(net_saved / (self.responses + self.saved_calls), 4) if self.responses else 0.0,
+                "items_salvaged": self.items_salvaged,
+                "items_from_continuations": self.items_from_continuations,
+                "items_rejected": self.items_rejected,
+            }
+
+stats = StructuredOutputStats()
+
+def extract_items(data: Any, kind: str, key: Optional[str] = None) -> Optional[List]:
+    """
+    Finds the list of generated items in parsed LLM output: the value itself,
+    `data[key]` for batch responses, or a list under the kind's name.
+    """
+    if key is not None:
+        data = data.get(key) if isinstance(data, dict) else None
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        if isinstance(data.get(kind), list):
+            return data[kind]
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if len(lists) == 1:
+            return lists[0]
+    return None
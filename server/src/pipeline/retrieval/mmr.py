@@ -0,0 +1,61 @@
+
+import logging
+from typing import List, Sequence
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def mmr_order(
+    query_embedding: Sequence[float],
+    candidate_embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Orders candidates by maximal marginal relevance.
+
+    Relevance to the query and all pairwise candidate similarities are computed
+    up front as two matrix products. Each selection step is then a handful of
+    vector operations over every candidate at once: the running maximum
+    similarity to the already selected set is updated with one `np.maximum`,
+    so there is no Python loop over candidates.
+
+    Args:
+        query_embedding: The query vector.
+        candidate_embeddings: One vector per candidate, as a list or 2-D array.
+        k: The number of candidates to select.
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0).
+
+    Returns:
+        Indices of the selected candidates, in selection order.
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or not len(candidates):
+        return []
+    k = min(k, len(candidates))
+
+    candidates = _normalize(candidates)
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected = np.empty(k, dtype=int)
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    for step in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected[step] = best
+        available[best] = False
+        redundancy = similarity[best] if step == 0 else np.maximum(redundancy, similarity[best])
+
+    logger.debug("MMR selected %s of %s candidates.", k, len(candidates))
+    return selected.tolist()
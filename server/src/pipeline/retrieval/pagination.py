@@ -0,0 +1,44 @@
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+class CursorExpiredError(KeyError):
+    """Raised when a pagination cursor is unknown or has expired."""
+
+class ResultCursors:
+    """
+    Holds the remaining ranked results of recent searches so later pages can be
+    served without re-running retrieval.
+
+    Each cursor is single-use: reading a page consumes it and returns a new
+    cursor for the page after, if any. At most `max_cursors` cursors are kept
+    (least recently created are dropped first), each for `ttl_seconds`.
+    """
+    def __init__(self, max_cursors: int = 1000, ttl_seconds: float = 600):
+        self.max_cursors = max_cursors
+        self.ttl_seconds = ttl_seconds
+        self._cursors: "OrderedDict[str, Tuple[List[Dict], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, remaining: List[Dict]) -> Optional[str]:
+        """Stores the results after the current page and returns a cursor for them, or None if there are none."""
+        if not remaining:
+            return None
+        cursor = uuid.uuid4().hex
+        with self._lock:
+            self._cursors[cursor] = (remaining, time.time())
+            while len(self._cursors) > self.max_cursors:
+                self._cursors.popitem(last=False)
+        return cursor
+
+    def next_page(self, cursor: str, k: int) -> Tuple[List[Dict], Optional[str]]:
+        """Returns the next `k` results for a cursor and the cursor for the page after."""
+        with self._lock:
+            entry = self._cursors.pop(cursor, None)
+        if entry is None or time.time() - entry[1] > self.ttl_seconds:
+            raise CursorExpiredError(cursor)
+        remaining = entry[0]
+        return remaining[:k], self.create(remaining[k:])
@@ -3,6 +3,9 @@ import logging
 from sentence_transformers import CrossEncoder
 import numpy as np
 
+from ..shared.logging_config import Payload
+from ..shared.metrics import time_stage
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -11,6 +14,7 @@ logger = logging.getLogger(__name__)
 # "ms-marco-MiniLM-L-6-v2" is a lightweight but powerful model trained for semantic matching.
 cross_encoder = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
 
+@time_stage("rerank")
 def rerank_results(results: dict) -> dict:
     """
     Re-ranks retrieved results using a cross-encoder model.
@@ -35,14 +39,14 @@ def rerank_results(results: dict) -> dict:
         logger.warning("No documents or query provided for reranking. Skipping.")
         return results
 
-    logger.info(f"Reranking {len(docs)} documents for query: '{query}'")
+    logger.info("Reranking %s documents for query: '%s'", len(docs), Payload(query))
 
     # Create pairs of [query, document_text] for the cross-encoder to score.
     pairs = [(query, doc["text"]) for doc in docs]
 
     # The predict method is highly optimized for batch processing.
     scores = cross_encoder.predict(pairs)
-    logger.debug(f"Cross-encoder scores: {scores}")
+    logger.debug("Cross-encoder scores: %s", Payload(scores))
 
     # Attach the new, more accurate scores to each document.
     for i, doc in enumerate(docs):
@@ -63,7 +67,7 @@ def rerank_results(results: dict) -> dict:
     
     reranked_docs = docs
     logger.info("Successfully reranked documents.")
-    logger.debug(f"Reranked documents: {reranked_docs}")
+    logger.debug("Reranked documents: %s", Payload(reranked_docs))
 
 
     # Return the full results object with the reranked documents.
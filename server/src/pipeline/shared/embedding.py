@@ -0,0 +1,42 @@
+import logging
+
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+from langchain_core.embeddings import Embeddings
+
+from ..ingestion.chunker import approximate_token_counts
+from .metrics import time_stage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# The name of the model to use for embeddings
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+class TimedEmbeddings(Embeddings):
+    """Wraps an embedding model to record each batch in the embedding_batch stage histogram."""
+    def __init__(self, model: Embeddings):
+        self.model = model
+
+    def embed_documents(self, texts):
+        with time_stage("embedding_batch"):
+            return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        with time_stage("embedding_batch"):
+            return self.model.embed_query(text)
+
+# Create the embedding function
+embedding_function = TimedEmbeddings(SentenceTransformerEmbeddings(model_name=MODEL_NAME))
+
+# The embedding model's tokenizer and input window, for sizing chunks in tokens
+_sentence_transformer = getattr(embedding_function.model, "client", None)
+tokenizer = getattr(_sentence_transformer, "tokenizer", None)
+# Room is left for the [CLS] and [SEP] tokens the model adds
+MAX_INPUT_TOKENS = (getattr(_sentence_transformer, "max_seq_length", None) or 256) - 2
+
+def count_tokens(texts):
+    """Counts the tokens of a batch of texts with the embedding model's tokenizer in one call."""
+    texts = list(texts)
+    if tokenizer is None or not texts:
+        return approximate_token_counts(texts)
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False, truncation=False)["input_ids"]]
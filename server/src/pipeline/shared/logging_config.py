@@ -0,0 +1,157 @@
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import reprlib
+import sys
+import time
+from typing import Any, Dict, Optional
+
+# Root level, and per-logger overrides as "name=LEVEL,name=LEVEL",
+# e.g. LOG_LEVELS="src.pipeline.retrieval=DEBUG,chromadb=WARNING".
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+# "json" for one JSON object per line, "text" for the classic human-readable format.
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+# Large payloads (retrieval results, contexts, prompts, LLM responses) are cut to this many characters...
+LOG_MAX_FIELD_CHARS = int(os.environ.get("LOG_MAX_FIELD_CHARS", 500))
+# ...and only this fraction of records over the limit include the payload at all.
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", 0.1))
+# Records are dropped (and counted) rather than blocking when this many are waiting.
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_repr = reprlib.Repr()
+_repr.maxstring = LOG_MAX_FIELD_CHARS
+_repr.maxother = LOG_MAX_FIELD_CHARS
+_repr.maxlist = _repr.maxtuple = _repr.maxset = _repr.maxdict = 10
+_repr.maxlevel = 4
+
+class Payload:
+    """
+    Wraps a large value passed as a logging argument so it is only rendered if
+    the record is emitted, and then only as a bounded, truncated string.
+
+    Usage: logger.debug("Retrieved results: %s", Payload(results))
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        value = self.value
+        try:
+            size = len(value)
+        except TypeError:
+            size = None
+        if isinstance(value, str):
+            if size <= LOG_MAX_FIELD_CHARS:
+                return value
+            if random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+                return f"<str len={size} omitted>"
+            return f"{value[:LOG_MAX_FIELD_CHARS]}... <truncated, len={size}>"
+        rendered = _repr.repr(value)
+        if size is not None and len(rendered) >= LOG_MAX_FIELD_CHARS and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+            return f"<{type(value).__name__} len={size} omitted>"
+        return rendered
+
+    __repr__ = __str__
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects, including any `extra` fields."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (int, float, bool, type(None))) else str(Payload(value))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background listener, dropping them instead of blocking
+    when the queue is full.
+
+    As with the stdlib QueueHandler, the message is rendered on the calling
+    thread so that arguments mutated after the call are logged as they were;
+    Payload arguments keep the rendering bounded, and records for disabled
+    levels never reach the handler, so their arguments are never rendered.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            # A queued traceback would keep its frames (and their locals) alive
+            record.exc_info = None
+        for key, value in list(record.__dict__.items()):
+            if key not in _STANDARD_ATTRS and not key.startswith("_") and not isinstance(value, (int, float, bool, str, type(None))):
+                setattr(record, key, str(Payload(value)))
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging():
+    """
+    Routes all logging through a queue to a background writer thread.
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL.upper())
+
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
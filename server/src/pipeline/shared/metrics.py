@@ -0,0 +1,263 @@
+
+import bisect
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import profiling
+
+# Recording is a dict lookup, a bisect and a locked increment; setting
+# METRICS_ENABLED=0 turns every timer and counter into a no-op.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    """Base class holding one value per label combination."""
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """A value that can go up and down, or be computed when scraped."""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        """Computes the gauge by calling `fn` at scrape time, so it costs nothing in between."""
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def render(self) -> List[str]:
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            with self._lock:
+                self._values[key] = value
+        return super().render()
+
+class _Timer(ContextDecorator):
+    """
+    Observes the elapsed time of a block or function call into a histogram,
+    and records it as a span when a profile is being captured.
+    """
+    def __init__(self, histogram: "Histogram", labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+        self.span = None
+
+    def _recreate_cm(self):
+        # A fresh timer per decorated call keeps concurrent calls independent.
+        return _Timer(self.histogram, self.labels)
+
+    def __enter__(self):
+        self.span = profiling.start_span(self.labels.get("stage", self.histogram.name))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        profiling.end_span(self.span)
+        return False
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, Prometheus style."""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels) -> _Timer:
+        """Returns a context manager / decorator that observes elapsed seconds."""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+class Registry:
+    """Holds every metric and renders them in the Prometheus text exposition format."""
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets or DEFAULT_BUCKETS))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# --- Pipeline metrics ---
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "contextiq_stage_duration_seconds",
+    "Latency of pipeline stages: extraction, chunking, embedding_batch, chroma_write "
+    "(includes its embedding_batch), chroma_persist, retrieval, rerank, compression, llm_call.",
+    ["stage"],
+)
+DOCUMENTS_BY_STATUS = REGISTRY.counter(
+    "contextiq_documents_status_total",
+    "Documents entering each processing status.",
+    ["status"],
+)
+LLM_TOKENS = REGISTRY.counter(
+    "contextiq_llm_tokens_total",
+    "LLM tokens used, by direction (prompt or completion).",
+    ["direction"],
+)
+LLM_ERRORS = REGISTRY.counter(
+    "contextiq_llm_errors_total",
+    "LLM calls that raised, by exception type.",
+    ["error"],
+)
+GENERATION_JOBS = REGISTRY.counter(
+    "contextiq_generation_jobs_total",
+    "Completed quiz/flashcard generation jobs, by kind and outcome.",
+    ["kind", "outcome"],
+)
+EXECUTOR_QUEUE_DEPTH = REGISTRY.gauge(
+    "contextiq_executor_queue_depth",
+    "Tasks waiting for a worker thread, by pool.",
+    ["pool"],
+)
+IN_FLIGHT_JOBS = REGISTRY.gauge(
+    "contextiq_in_flight_jobs",
+    "Jobs submitted but not yet finished, by kind.",
+    ["kind"],
+)
+RECLAIMED_BYTES = REGISTRY.counter(
+    "contextiq_reclaimed_bytes_total",
+    "Bytes reclaimed by the lifecycle compactor, by kind (memory or disk).",
+    ["kind"],
+)
+RECLAIMED_ITEMS = REGISTRY.counter(
+    "contextiq_reclaimed_items_total",
+    "Artifacts and upload files removed by the lifecycle compactor.",
+    ["kind"],
+)
+PRECOMPUTE_TASKS = REGISTRY.counter(
+    "contextiq_precompute_tasks_total",
+    "Speculative precompute tasks by task (quiz, flashcards, summary) and outcome (ready, skipped, over_budget, failed).",
+    ["task", "outcome"],
+)
+STRUCTURED_OUTPUT = REGISTRY.counter(
+    "contextiq_structured_output_total",
+    "LLM responses by how their JSON was recovered (clean, salvaged, unusable), plus targeted continuation calls.",
+    ["outcome"],
+)
+
+def time_stage(stage: str) -> _Timer:
+    """Times a pipeline stage; usable as `with time_stage("retrieval"):` or `@time_stage("retrieval")`."""
+    return STAGE_LATENCY.time(stage=stage)
@@ -5,6 +5,9 @@ from langchain_classic.retrievers.document_compressors import LLMChainExtractor
 from langchain_core.documents import Document
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from .metrics import time_stage
+
+@time_stage("compression")
 def compress_context(context: List[str], query: str) -> List[str]:
     """
     Compresses context using Gemini via LangChain based on the query.
@@ -0,0 +1,259 @@
+
+import contextvars
+import cProfile
+import functools
+import logging
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Header that forces profiling of a request (and of the jobs it creates).
+PROFILE_HEADER = "x-profile"
+# Fraction of requests and jobs profiled without the header.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0))
+# "sampling" (statistical stack sampler, all threads) or "cprofile" (deterministic, job thread only).
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sampling")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+PROFILE_RETENTION = int(os.environ.get("PROFILE_RETENTION", 50))
+
+class Span:
+    """A timed pipeline stage within a profile; spans nest into a tree."""
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+        self.token: Optional[contextvars.Token] = None
+
+    def to_dict(self, origin: float) -> Dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+class Profile:
+    """A captured profile: a span tree plus folded stacks and/or cProfile stats."""
+    def __init__(self, name: str, forced: bool, mode: str):
+        self.profile_id = uuid.uuid4().hex
+        self.name = name
+        self.forced = forced
+        self.mode = mode
+        self.created_at = time.time()
+        self.root = Span(name)
+        self.folded: Counter = Counter()
+        self.pstats: Optional[bytes] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return round((end - self.root.start) * 1000, 3)
+
+    def summary(self) -> Dict:
+        return {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "mode": self.mode,
+            "forced": self.forced,
+            "created_at": self.created_at,
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.folded.values()),
+        }
+
+    def to_dict(self) -> Dict:
+        return {**self.summary(), "spans": self.root.to_dict(self.root.start)}
+
+    def to_folded(self) -> str:
+        """Renders samples as collapsed stacks, the input format of flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.folded.most_common())
+
+class ProfileStore:
+    """Keeps the most recent profiles, dropping the oldest beyond `retention`."""
+    def __init__(self, retention: int):
+        self.retention = retention
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles[profile.profile_id] = profile
+            while len(self._profiles) > self.retention:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [profile.summary() for profile in reversed(profiles)]
+
+class StackSampler(threading.Thread):
+    """Periodically samples every other thread's stack into folded-stack counts."""
+    def __init__(self, profile: Profile, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._on_stopped: Optional[Callable[[], None]] = None
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.profile.folded[";".join(reversed(stack))] += 1
+        if self._on_stopped is not None:
+            self._on_stopped()
+
+    def stop(self, on_stopped: Optional[Callable[[], None]] = None):
+        """
+        Signals the sampler to stop without waiting for it, so it is safe to
+        call from the event loop. `on_stopped` runs on the sampler thread after
+        its last sample.
+        """
+        self._on_stopped = on_stopped
+        self._stop_event.set()
+
+store = ProfileStore(PROFILE_RETENTION)
+
+_current_profile: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar("current_profile", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+# Job keys (doc_id, quiz_id, ...) whose next run must be profiled, set by header-triggered requests.
+_requested_keys: "OrderedDict[str, None]" = OrderedDict()
+_requested_lock = threading.Lock()
+_MAX_REQUESTED_KEYS = 1000
+
+def current_profile() -> Optional[Profile]:
+    """Returns the profile being captured in this context, if any."""
+    return _current_profile.get()
+
+def request_profile(key: str):
+    """Marks a job key so the next background run for it is profiled."""
+    with _requested_lock:
+        _requested_keys[key] = None
+        while len(_requested_keys) > _MAX_REQUESTED_KEYS:
+            _requested_keys.popitem(last=False)
+
+def _take_requested(keys: Iterable[str]) -> bool:
+    with _requested_lock:
+        found = [key for key in keys if key in _requested_keys]
+        for key in found:
+            del _requested_keys[key]
+    return bool(found)
+
+def start_span(name: str) -> Optional[Span]:
+    """Opens a child span of the current span. Returns None (and costs nothing) outside a profile."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    child = Span(name)
+    parent.children.append(child)
+    child.token = _current_span.set(child)
+    return child
+
+def end_span(child: Optional[Span]):
+    if child is None:
+        return
+    child.end = time.perf_counter()
+    _current_span.reset(child.token)
+
+@contextmanager
+def span(name: str):
+    """Records a block as a span of the current profile, if one is active."""
+    current = start_span(name)
+    try:
+        yield current
+    finally:
+        end_span(current)
+
+@contextmanager
+def profile(name: str, forced: bool = False, mode: Optional[str] = None):
+    """
+    Profiles the enclosed block if `forced` or if it falls within PROFILE_SAMPLE_RATE.
+
+    Yields the Profile being captured, or None when the block is not profiled.
+    Nested calls inside an active profile record a span instead of a new profile.
+    """
+    if _current_profile.get() is not None:
+        with span(name):
+            yield _current_profile.get()
+        return
+    if not forced and (PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE):
+        yield None
+        return
+
+    mode = mode or PROFILE_MODE
+    captured = Profile(name, forced, mode)
+    sampler = profiler = None
+    try:
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler(captured, PROFILE_INTERVAL)
+            sampler.start()
+    except (RuntimeError, ValueError) as e:
+        # e.g. another profiler or tracer is already active (Python 3.12+), or no thread can be started
+        logger.warning("Could not start %s profiler for '%s', running unprofiled: %s", mode, name, e)
+        yield None
+        return
+    profile_token = _current_profile.set(captured)
+    span_token = _current_span.set(captured.root)
+    try:
+        yield captured
+    finally:
+        captured.root.end = time.perf_counter()
+        if profiler is not None:
+            profiler.disable()
+            profiler.create_stats()
+            captured.pstats = marshal.dumps(profiler.stats)
+        _current_span.reset(span_token)
+        _current_profile.reset(profile_token)
+        if sampler is not None:
+            # The profile is stored once the sampler has taken its last sample
+            sampler.stop(on_stopped=lambda: _store(captured))
+        else:
+            _store(captured)
+
+def _store(captured: Profile):
+    store.add(captured)
+    logger.info("Captured profile %s for '%s' (%s ms).", captured.profile_id, captured.name, captured.duration_ms)
+
+def profiled(name: Union[str, Callable[..., str]], keys: Optional[Callable[..., Iterable[str]]] = None):
+    """
+    Decorates a background job so it is profiled when sampled, or when any of
+    the job keys returned by `keys(*args, **kwargs)` was passed to request_profile().
+    `name` may be a callable taking the job's arguments.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            forced = _take_requested(keys(*args, **kwargs)) if keys else False
+            profile_name = name(*args, **kwargs) if callable(name) else name
+            with profile(profile_name, forced=forced):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,238 @@
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class ArtifactCache:
+    """
+    A bounded, LRU-ordered store for generated artifacts (quizzes, flashcards).
+
+    Entries expire `ttl_seconds` after they were last written. When more than
+    `max_items` entries are held in memory, the least recently used ones are
+    spilled to `spill_dir` as JSON (and transparently reloaded on access), or
+    dropped if no spill directory is configured. Entries for which `pinned`
+    returns True (e.g. jobs still generating) are never evicted. Entries
+    spilled by a previous process are indexed again on startup.
+
+    Args:
+        name: Used for the spill sub-directory and log messages.
+        max_items: Maximum number of entries kept in memory; 0 for unbounded.
+        ttl_seconds: Lifetime of an entry since its last write; 0 for no expiry.
+        spill_dir: Directory for spilled entries, or None to drop them instead.
+        pinned: Predicate over an entry's value that exempts it from eviction.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_items: int = 0,
+        ttl_seconds: float = 0,
+        spill_dir: Optional[str] = None,
+        pinned: Optional[Callable[[Dict], bool]] = None,
+    ):
+        self.name = name
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = os.path.join(spill_dir, name) if spill_dir else None
+        self.pinned = pinned or (lambda value: False)
+        self._entries: "OrderedDict[str, Tuple[Dict, float, int]]" = OrderedDict()  # key -> (value, written_at, size)
+        self._spilled: Dict[str, str] = {}  # key -> spill file path
+        self._lock = threading.RLock()
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._index_spilled()
+
+    def _index_spilled(self):
+        """Rebuilds the spill index from the files left in the spill directory."""
+        for name in os.listdir(self.spill_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.spill_dir, name)
+            try:
+                with open(path) as f:
+                    self._spilled[json.load(f)["key"]] = path
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("Ignoring unreadable spilled %s file %s: %s", self.name, path, e)
+        if self._spilled:
+            logger.info("Indexed %s spilled %s entries", len(self._spilled), self.name)
+
+    def _expired(self, written_at: float, now: Optional[float] = None) -> bool:
+        return self.ttl_seconds > 0 and (now or time.time()) - written_at > self.ttl_seconds
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def _load_spilled(self, key: str) -> Optional[Tuple[Dict, float]]:
+        path = self._spilled.get(key)
+        if not path:
+            return None
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not reload spilled %s entry %s: %s", self.name, key, e)
+            self._spilled.pop(key, None)
+            return None
+        return record["value"], record["written_at"]
+
+    def _remove_spilled(self, key: str) -> int:
+        path = self._spilled.pop(key, None)
+        if not path:
+            return 0
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Returns an entry, reloading it from disk if it was spilled, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                loaded = self._load_spilled(key)
+                if loaded is None:
+                    return None
+                self._remove_spilled(key)
+                value, written_at = loaded
+                self._entries[key] = (value, written_at, len(json.dumps(value, default=str)))
+                entry = self._entries[key]
+                self._evict_overflow()
+
+            value, written_at, _ = entry
+            if self._expired(written_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict):
+        """Stores or replaces an entry and resets its TTL."""
+        with self._lock:
+            self._remove_spilled(key)
+            self._entries[key] = (value, time.time(), len(json.dumps(value, default=str)))
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            return bool(self._remove_spilled(key)) or removed
+
+    def delete_where(self, predicate: Callable[[Dict], bool], key_predicate: Optional[Callable[[str], bool]] = None) -> int:
+        """
+        Deletes every entry (in memory or spilled) whose value matches `predicate`.
+
+        If `key_predicate` is given, only entries whose key matches it are
+        considered, so spilled entries with other keys are never read from disk.
+        """
+        key_predicate = key_predicate or (lambda key: True)
+        with self._lock:
+            keys = [key for key, (value, _, _) in self._entries.items() if key_predicate(key) and predicate(value)]
+            for key in [key for key in self._spilled if key_predicate(key)]:
+                loaded = self._load_spilled(key)
+                if loaded is not None and predicate(loaded[0]):
+                    keys.append(key)
+            for key in keys:
+                self.delete(key)
+            return len(keys)
+
+    def values(self) -> Iterator[Dict]:
+        """Iterates over in-memory entries only."""
+        with self._lock:
+            return iter([value for value, _, _ in self._entries.values()])
+
+    def _spill_or_drop(self, key: str) -> int:
+        """Evicts one in-memory entry; returns the approximate bytes freed from memory."""
+        value, written_at, size = self._entries.pop(key)
+        if self.spill_dir:
+            path = self._spill_path(key)
+            try:
+                with open(path, "w") as f:
+                    json.dump({"key": key, "written_at": written_at, "value": value}, f, default=str)
+                self._spilled[key] = path
+            except OSError as e:
+                logger.warning("Could not spill %s entry %s, dropping it: %s", self.name, key, e)
+        return size
+
+    def _evictable_keys(self) -> List[str]:
+        return [key for key, (value, _, _) in self._entries.items() if not self.pinned(value)]
+
+    def _evict_overflow(self):
+        if self.max_items <= 0 or len(self._entries) <= self.max_items:
+            return
+        overflow = len(self._entries) - self.max_items
+        for key in self._evictable_keys()[:overflow]:
+            self._spill_or_drop(key)
+
+    def memory_bytes(self) -> int:
+        """Approximate in-memory size of all entries (serialized JSON length)."""
+        with self._lock:
+            return sum(size for _, _, size in self._entries.values())
+
+    def disk_bytes(self) -> int:
+        with self._lock:
+            paths = list(self._spilled.values())
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "memory_items": len(self._entries),
+                "spilled_items": len(self._spilled),
+                "memory_bytes": self.memory_bytes(),
+                "disk_bytes": self.disk_bytes(),
+            }
+
+    def expire(self) -> Dict:
+        """Removes expired entries from memory and disk; returns what was reclaimed."""
+        reclaimed = {"items": 0, "memory_bytes": 0, "disk_bytes": 0}
+        now = time.time()
+        with self._lock:
+            for key, (_, written_at, size) in list(self._entries.items()):
+                if self._expired(written_at, now):
+                    del self._entries[key]
+                    reclaimed["items"] += 1
+                    reclaimed["memory_bytes"] += size
+            for key in list(self._spilled):
+                loaded = self._load_spilled(key)
+                if loaded is None or self._expired(loaded[1], now):
+                    reclaimed["disk_bytes"] += self._remove_spilled(key)
+                    reclaimed["items"] += 1
+        return reclaimed
+
+    def shrink_memory(self, budget_bytes: int) -> int:
+        """Evicts least recently used entries until memory use fits `budget_bytes`; returns bytes freed."""
+        freed = 0
+        with self._lock:
+            current = self.memory_bytes()
+            for key in self._evictable_keys():
+                if current - freed <= budget_bytes:
+                    break
+                freed += self._spill_or_drop(key)
+        return freed
+
+    def shrink_disk(self, budget_bytes: int) -> int:
+        """Deletes the oldest spilled entries until spill files fit `budget_bytes`; returns bytes freed."""
+        freed = 0
+        with self._lock:
+            paths = sorted(
+                ((os.path.getmtime(path), key) for key, path in self._spilled.items() if os.path.exists(path)),
+            )
+            current = self.disk_bytes()
+            for _, key in paths:
+                if current - freed <= budget_bytes:
+                    break
+                freed += self._remove_spilled(key)
+        return freed
@@ -0,0 +1,166 @@
+
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from ..pipeline.shared.metrics import RECLAIMED_BYTES, RECLAIMED_ITEMS
+from .metadata_store import MetadataStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _inside(path: str, directory: str) -> bool:
+    directory = os.path.abspath(directory)
+    return os.path.commonpath([os.path.abspath(path), directory]) == directory
+
+def delete_raw_upload(doc: Dict, upload_dir: str) -> int:
+    """
+    Deletes a document's raw upload if it lives in the upload directory (files
+    imported in place are never touched). Returns the bytes freed.
+    """
+    path = doc.get('file_path')
+    if not path or not _inside(path, upload_dir) or not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    os.remove(path)
+    doc['file_path'] = None
+    return size
+
+def _directory_bytes(directory: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(directory):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+class Compactor:
+    """
+    Enforces retention policies and memory/disk budgets on the metadata store
+    and the upload directory.
+
+    Args:
+        metadata_store: The store whose artifacts and documents are managed.
+        upload_dir: Directory holding raw uploads.
+        upload_retention: 'keep' to keep raw uploads, or 'delete_processed' to
+                          delete them once a document has been PROCESSED for
+                          `upload_grace_seconds`.
+        upload_grace_seconds: Minimum age before a raw upload (or, under
+                              'delete_processed', a file in the upload
+                              directory that no document references) may be deleted.
+        memory_budget_bytes: Budget for in-memory generated artifacts; 0 for none.
+        disk_budget_bytes: Budget for raw uploads plus spilled artifacts; 0 for none.
+    """
+    def __init__(
+        self,
+        metadata_store: MetadataStore,
+        upload_dir: str,
+        upload_retention: str = "keep",
+        upload_grace_seconds: float = 3600,
+        memory_budget_bytes: int = 0,
+        disk_budget_bytes: int = 0,
+    ):
+        self.metadata_store = metadata_store
+        self.upload_dir = upload_dir
+        self.upload_retention = upload_retention
+        self.upload_grace_seconds = upload_grace_seconds
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self.last_report: Optional[Dict] = None
+
+    def _artifact_caches(self):
+        return (self.metadata_store.quizzes, self.metadata_store.flashcards, self.metadata_store.summaries)
+
+    def _reclaim_uploads(self, report: Dict, processed_before: float, budget_bytes: Optional[int] = None):
+        """Deletes raw uploads of PROCESSED documents, oldest first, until under `budget_bytes` if given."""
+        processed = sorted(
+            (doc for doc in self.metadata_store.get_documents_by_status('PROCESSED') if doc.get('file_path')),
+            key=lambda doc: doc.get('status_updated_at', 0),
+        )
+        for doc in processed:
+            if budget_bytes is not None and self._disk_bytes() <= budget_bytes:
+                break
+            if budget_bytes is None and doc.get('status_updated_at', 0) > processed_before:
+                break
+            freed = delete_raw_upload(doc, self.upload_dir)
+            if freed:
+                report['uploads_deleted'] += 1
+                report['disk_bytes_reclaimed'] += freed
+
+    def _reclaim_orphans(self, report: Dict, older_than: float):
+        """Deletes files in the upload directory that no document references."""
+        if not os.path.isdir(self.upload_dir):
+            return
+        referenced = {
+            os.path.abspath(doc['file_path'])
+            for doc in self.metadata_store.list_documents() if doc.get('file_path')
+        }
+        for name in os.listdir(self.upload_dir):
+            path = os.path.abspath(os.path.join(self.upload_dir, name))
+            if path in referenced or not os.path.isfile(path) or os.path.getmtime(path) > older_than:
+                continue
+            size = os.path.getsize(path)
+            os.remove(path)
+            report['orphans_deleted'] += 1
+            report['disk_bytes_reclaimed'] += size
+
+    def _disk_bytes(self) -> int:
+        uploads = _directory_bytes(self.upload_dir) if os.path.isdir(self.upload_dir) else 0
+        return uploads + sum(cache.disk_bytes() for cache in self._artifact_caches())
+
+    def run_once(self) -> Dict:
+        """Runs one compaction pass and returns a report of what was reclaimed."""
+        started = time.perf_counter()
+        now = time.time()
+        report = {
+            'artifacts_expired': 0,
+            'memory_bytes_reclaimed': 0,
+            'disk_bytes_reclaimed': 0,
+            'uploads_deleted': 0,
+            'orphans_deleted': 0,
+        }
+
+        # 1. Expire generated artifacts past their TTL.
+        for cache in self._artifact_caches():
+            expired = cache.expire()
+            report['artifacts_expired'] += expired['items']
+            report['memory_bytes_reclaimed'] += expired['memory_bytes']
+            report['disk_bytes_reclaimed'] += expired['disk_bytes']
+
+        # 2. Keep in-memory artifacts within budget by spilling (or dropping) the least recently used.
+        if self.memory_budget_bytes > 0:
+            caches = self._artifact_caches()
+            for cache in caches:
+                report['memory_bytes_reclaimed'] += cache.shrink_memory(self.memory_budget_bytes // len(caches))
+
+        # 3. Apply the raw upload retention policy and clean up unreferenced files.
+        if self.upload_retention == "delete_processed":
+            self._reclaim_uploads(report, processed_before=now - self.upload_grace_seconds)
+            self._reclaim_orphans(report, older_than=now - self.upload_grace_seconds)
+
+        # 4. Enforce the disk budget: raw uploads of processed documents first, then spilled artifacts.
+        if self.disk_budget_bytes > 0 and self._disk_bytes() > self.disk_budget_bytes:
+            self._reclaim_uploads(report, processed_before=now, budget_bytes=self.disk_budget_bytes)
+            overage = self._disk_bytes() - self.disk_budget_bytes
+            for cache in self._artifact_caches():
+                if overage <= 0:
+                    break
+                freed = cache.shrink_disk(max(0, cache.disk_bytes() - overage))
+                overage -= freed
+                report['disk_bytes_reclaimed'] += freed
+
+        RECLAIMED_BYTES.inc(report['memory_bytes_reclaimed'], kind="memory")
+        RECLAIMED_BYTES.inc(report['disk_bytes_reclaimed'], kind="disk")
+        RECLAIMED_ITEMS.inc(report['artifacts_expired'], kind="artifacts")
+        RECLAIMED_ITEMS.inc(report['uploads_deleted'] + report['orphans_deleted'], kind="uploads")
+
+        report['artifacts'] = {cache.name: cache.stats() for cache in self._artifact_caches()}
+        report['disk_bytes'] = self._disk_bytes()
+        report['finished_at'] = now
+        report['duration_seconds'] = round(time.perf_counter() - started, 3)
+        self.last_report = report
+        logger.info("Compaction reclaimed %s memory bytes and %s disk bytes", report['memory_bytes_reclaimed'], report['disk_bytes_reclaimed'])
+        return report
@@ -1,75 +1,152 @@
 
 import logging
-from typing import Dict, List, Optional
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from ..pipeline.shared.metrics import DOCUMENTS_BY_STATUS
+from .artifact_cache import ArtifactCache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Generated quizzes/flashcards: in-memory entry limit per kind, lifetime, and where evicted entries are spilled
+ARTIFACT_MAX_ITEMS = int(os.environ.get('ARTIFACT_MAX_ITEMS', 1000))
+ARTIFACT_TTL_SECONDS = float(os.environ.get('ARTIFACT_TTL_SECONDS', 7 * 24 * 3600))
+ARTIFACT_SPILL_DIR = os.environ.get('ARTIFACT_SPILL_DIR', 'server/artifacts') or None
+# Ratings kept per document; the quality score still counts every rating
+FEEDBACK_MAX_PER_DOC = int(os.environ.get('FEEDBACK_MAX_PER_DOC', 100))
+
+def _is_generating(artifact: Dict) -> bool:
+    return artifact.get('status') == 'GENERATING'
+
 class MetadataStore:
-    """A simple in-memory metadata store to track documents, chunks, quizzes, and flashcards."""
+    """
+    An in-memory metadata store to track documents, chunks, quizzes, flashcards, and summaries, with bounded storage for generated artifacts.
+
+    The document table is guarded by a lock; readers that iterate over
+    documents get a snapshot list rather than a live view.
+    """
     def __init__(self):
+        self._lock = threading.RLock()
         self.documents: Dict[str, Dict] = {}
         self.chunks: Dict[str, List[Dict]] = {}  # doc_id -> list of chunks
-        self.quizzes: Dict[str, Dict] = {}
-        self.flashcards: Dict[str, Dict] = {}
-        self.feedback: Dict[str, List] = {}
+        self.quizzes = ArtifactCache('quizzes', ARTIFACT_MAX_ITEMS, ARTIFACT_TTL_SECONDS, ARTIFACT_SPILL_DIR, pinned=_is_generating)
+        self.flashcards = ArtifactCache('flashcards', ARTIFACT_MAX_ITEMS, ARTIFACT_TTL_SECONDS, ARTIFACT_SPILL_DIR, pinned=_is_generating)
+        self.summaries = ArtifactCache('summaries', ARTIFACT_MAX_ITEMS, ARTIFACT_TTL_SECONDS, ARTIFACT_SPILL_DIR, pinned=_is_generating)  # doc_id -> summary
+        self.feedback: Dict[str, Deque[int]] = {}
 
-    def add_document(self, doc_id: str, filename: str, file_path: str, session_id: Optional[str] = None) -> Dict:
-        """Adds a document to the store with an initial 'UPLOADED' status."""
+    def add_document(self, doc_id: str, filename: str, file_path: str, session_id: Optional[str] = None, status: str = 'UPLOADED') -> Dict:
+        """
+        Adds a document to the store with an initial status: 'UPLOADED' for the
+        polling worker to pick up, or 'QUEUED' when the caller schedules it itself.
+        """
         if doc_id in self.documents:
-            logger.warning(f"Document with id {doc_id} already exists. Overwriting.")
+            logger.warning("Document with id %s already exists. Overwriting.", doc_id)
         
         doc_metadata = {
             'doc_id': doc_id,
             'filename': filename,
             'file_path': file_path,
             'session_id': session_id,
-            'status': 'UPLOADED',  # Initial status
+            'status': status,
+            'status_updated_at': time.time(),
             'quality_score': 0
         }
-        self.documents[doc_id] = doc_metadata
-        logger.info(f"Added document: {doc_id} with status 'UPLOADED'")
+        with self._lock:
+            self.documents[doc_id] = doc_metadata
+        DOCUMENTS_BY_STATUS.inc(status=status)
+        logger.info("Added document: %s with status '%s'", doc_id, status)
         return doc_metadata
 
     def get_document(self, doc_id: str) -> Optional[Dict]:
         """Retrieves a document from the store."""
         return self.documents.get(doc_id)
 
+    def list_documents(self) -> List[Dict]:
+        """Returns a snapshot of all document records."""
+        with self._lock:
+            return list(self.documents.values())
+
     def get_documents_by_status(self, status: str) -> List[Dict]:
         """Retrieves all documents with a specific status."""
-        return [doc for doc in self.documents.values() if doc.get('status') == status]
+        return [doc for doc in self.list_documents() if doc.get('status') == status]
 
     def update_document_status(self, doc_id: str, status: str):
         """Updates the status of a document."""
-        if doc_id in self.documents:
-            self.documents[doc_id]['status'] = status
-            logger.info(f"Updated status for doc_id: {doc_id} to '{status}'")
+        with self._lock:
+            doc = self.documents.get(doc_id)
+            if doc is not None:
+                doc['status'] = status
+                doc['status_updated_at'] = time.time()
+        if doc is not None:
+            DOCUMENTS_BY_STATUS.inc(status=status)
+            logger.info("Updated status for doc_id: %s to '%s'", doc_id, status)
         else:
-            logger.warning(f"Document with doc_id: {doc_id} not found for status update.")
+            logger.warning("Document with doc_id: %s not found for status update.", doc_id)
             
     def get_documents_by_session(self, session_id: str) -> List[Dict]:
         """Retrieves all documents for a given session."""
-        return [doc for doc in self.documents.values() if doc.get('session_id') == session_id]
+        return [doc for doc in self.list_documents() if doc.get('session_id') == session_id]
 
     def add_chunks(self, doc_id: str, chunks: List[Dict]):
         """Adds processed chunks for a document."""
         self.chunks[doc_id] = chunks
-        logger.info(f"Added {len(chunks)} chunks for doc_id: {doc_id}")
+        logger.info("Added %s chunks for doc_id: %s", len(chunks), doc_id)
 
     def get_chunks(self, doc_id: str) -> Optional[List[Dict]]:
         """Retrieves all chunks for a document."""
         return self.chunks.get(doc_id)
 
+    def delete_document(self, doc_id: str) -> Optional[Dict]:
+        """
+        Removes a document with its chunks, feedback and generated quizzes,
+        flashcards and summary. Returns the removed document record with deletion counts,
+        or None if it did not exist.
+        """
+        with self._lock:
+            doc = self.documents.pop(doc_id, None)
+        if doc is None:
+            return None
+        chunks = self.chunks.pop(doc_id, None) or []
+        self.feedback.pop(doc_id, None)
+        # Artifact keys embed the doc_id, so spilled artifacts of other documents are never loaded
+        key_matches = lambda key: doc_id in key
+        artifacts = self.quizzes.delete_where(lambda quiz: quiz.get('doc_id') == doc_id, key_matches)
+        artifacts += self.flashcards.delete_where(lambda flashcards: flashcards.get('doc_id') == doc_id, key_matches)
+        artifacts += int(self.summaries.delete(doc_id))
+        logger.info("Deleted document %s with %s chunks and %s generated artifacts", doc_id, len(chunks), artifacts)
+        return {**doc, 'chunks_deleted': len(chunks), 'artifacts_deleted': artifacts}
+
+    def export_documents(self, doc_ids: List[str]) -> List[Dict]:
+        """Returns document records, with their chunks, for saving to an import manifest."""
+        with self._lock:
+            docs = [self.documents[doc_id] for doc_id in doc_ids if doc_id in self.documents]
+        return [{**doc, 'chunks': self.chunks.get(doc['doc_id'], [])} for doc in docs]
+
+    def import_documents(self, records: List[Dict]):
+        """Loads document records (with chunks) produced by export_documents, keeping their status."""
+        for record in records:
+            record = dict(record)
+            chunks = record.pop('chunks', [])
+            with self._lock:
+                self.documents[record['doc_id']] = record
+            if chunks:
+                self.chunks[record['doc_id']] = chunks
+        logger.info("Imported %s documents", len(records))
+
     def add_feedback(self, doc_id: str, rating: int):
         """Adds feedback for a document and updates its quality score."""
         if doc_id in self.documents:
             self.documents[doc_id]['quality_score'] += rating
             if doc_id not in self.feedback:
-                self.feedback[doc_id] = []
+                self.feedback[doc_id] = deque(maxlen=FEEDBACK_MAX_PER_DOC)
             self.feedback[doc_id].append(rating)
-            logger.info(f"Updated quality score for doc_id: {doc_id} to {self.documents[doc_id]['quality_score']}")
+            logger.info("Updated quality score for doc_id: %s to %s", doc_id, self.documents[doc_id]['quality_score'])
         else:
-            logger.warning(f"Document with doc_id: {doc_id} not found for feedback.")
+            logger.warning("Document with doc_id: %s not found for feedback.", doc_id)
 
     def create_quiz(self, quiz_id: str, doc_id: str, request_params: Dict) -> Dict:
         """Creates a new quiz record with 'GENERATING' status."""
@@ -80,8 +157,8 @@ class MetadataStore:
             "request_params": request_params,
             "questions": []
         }
-        self.quizzes[quiz_id] = quiz_metadata
-        logger.info(f"Created quiz {quiz_id} for doc_id {doc_id} with status 'GENERATING'")
+        self.quizzes.set(quiz_id, quiz_metadata)
+        logger.info("Created quiz %s for doc_id %s with status 'GENERATING'", quiz_id, doc_id)
         return quiz_metadata
         
     def get_quiz(self, quiz_id: str) -> Optional[Dict]:
@@ -90,13 +167,15 @@ class MetadataStore:
 
     def update_quiz_status(self, quiz_id: str, status: str, questions: Optional[List[Dict]] = None):
         """Updates the status and content of a quiz."""
-        if quiz_id in self.quizzes:
-            self.quizzes[quiz_id]['status'] = status
+        quiz = self.quizzes.get(quiz_id)
+        if quiz is not None:
+            quiz['status'] = status
             if questions:
-                self.quizzes[quiz_id]['questions'] = questions
-            logger.info(f"Updated status for quiz_id: {quiz_id} to '{status}'")
+                quiz['questions'] = questions
+            self.quizzes.set(quiz_id, quiz)
+            logger.info("Updated status for quiz_id: %s to '%s'", quiz_id, status)
         else:
-            logger.warning(f"Quiz with quiz_id: {quiz_id} not found for status update.")
+            logger.warning("Quiz with quiz_id: %s not found for status update.", quiz_id)
 
     def create_flashcards(self, flashcards_id: str, doc_id: str, request_params: Dict) -> Dict:
         """Creates a new flashcard set with 'GENERATING' status."""
@@ -107,8 +186,8 @@ class MetadataStore:
             "request_params": request_params,
             "flashcards": []
         }
-        self.flashcards[flashcards_id] = flashcards_metadata
-        logger.info(f"Created flashcards {flashcards_id} for doc_id {doc_id} with status 'GENERATING'")
+        self.flashcards.set(flashcards_id, flashcards_metadata)
+        logger.info("Created flashcards %s for doc_id %s with status 'GENERATING'", flashcards_id, doc_id)
         return flashcards_metadata
 
     def get_flashcards(self, flashcards_id: str) -> Optional[Dict]:
@@ -117,10 +196,42 @@ class MetadataStore:
 
     def update_flashcards_status(self, flashcards_id: str, status: str, flashcards: Optional[List[Dict]] = None):
         """Updates the status and content of a flashcard set."""
-        if flashcards_id in self.flashcards:
-            self.flashcards[flashcards_id]['status'] = status
+        flashcards_set = self.flashcards.get(flashcards_id)
+        if flashcards_set is not None:
+            flashcards_set['status'] = status
             if flashcards:
-                self.flashcards[flashcards_id]['flashcards'] = flashcards
-            logger.info(f"Updated status for flashcards_id: {flashcards_id} to '{status}'")
+                flashcards_set['flashcards'] = flashcards
+            self.flashcards.set(flashcards_id, flashcards_set)
+            logger.info("Updated status for flashcards_id: %s to '%s'", flashcards_id, status)
+        else:
+            logger.warning("Flashcards with flashcards_id: %s not found for status update.", flashcards_id)
+
+    def create_summary(self, doc_id: str) -> Dict:
+        """Creates a document summary record with 'GENERATING' status."""
+        summary_metadata = {
+            "doc_id": doc_id,
+            "status": "GENERATING",
+            "summary": None,
+            "key_points": [],
+        }
+        self.summaries.set(doc_id, summary_metadata)
+        logger.info("Created summary for doc_id %s with status 'GENERATING'", doc_id)
+        return summary_metadata
+
+    def get_summary(self, doc_id: str) -> Optional[Dict]:
+        """Retrieves a document summary from the store."""
+        return self.summaries.get(doc_id)
+
+    def update_summary_status(self, doc_id: str, status: str, summary: Optional[str] = None, key_points: Optional[List[Dict]] = None):
+        """Updates the status and content of a document summary."""
+        summary_record = self.summaries.get(doc_id)
+        if summary_record is not None:
+            summary_record['status'] = status
+            if summary:
+                summary_record['summary'] = summary
+            if key_points:
+                summary_record['key_points'] = key_points
+            self.summaries.set(doc_id, summary_record)
+            logger.info("Updated status for summary of doc_id: %s to '%s'", doc_id, status)
         else:
-            logger.warning(f"Flashcards with flashcards_id: {flashcards_id} not found for status update.")
+            logger.warning("Summary for doc_id: %s not found for status update.", doc_id)
@@ -1,19 +1,31 @@
 import os
 import logging
-from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import Chroma
 
+from ..pipeline.retrieval.mmr import mmr_order
+from ..pipeline.retrieval.pagination import ResultCursors
+from ..pipeline.shared.embedding import embedding_function
+from ..pipeline.shared.logging_config import Payload
+from ..pipeline.shared.metrics import time_stage
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# The name of the model to use for embeddings
-MODEL_NAME = "all-MiniLM-L6-v2"
-
 # The directory to store the vector database
 PERSIST_DIRECTORY = os.environ.get('PERSIST_DIRECTORY', 'server/db')
 
-# Create the embedding function
-embedding_function = SentenceTransformerEmbeddings(model_name=MODEL_NAME)
+# The number of chunks embedded per model call during batched ingestion
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', 64))
+
+# Default relevance/diversity trade-off for MMR, and how many candidates MMR considers per result requested
+MMR_LAMBDA = float(os.environ.get('MMR_LAMBDA', 0.5))
+MMR_FETCH_FACTOR = int(os.environ.get('MMR_FETCH_FACTOR', 4))
+
+# Ranked results kept for cursor pagination
+result_cursors = ResultCursors(
+    max_cursors=int(os.environ.get('RETRIEVAL_CURSOR_MAX', 1000)),
+    ttl_seconds=float(os.environ.get('RETRIEVAL_CURSOR_TTL_SECONDS', 600)),
+)
 
 # Create the vector store
 vector_store = Chroma(
@@ -23,29 +35,103 @@ vector_store = Chroma(
 
 def embed_and_store(text, metadata, chunk_id):
     """Embeds the given text and stores it in the vector store with the provided metadata and ID."""
-    logger.debug(f"Embedding and storing chunk with id: {chunk_id}")
-    vector_store.add_texts(texts=[text], metadatas=[metadata], ids=[chunk_id])
+    logger.debug("Embedding and storing chunk with id: %s", chunk_id)
+    with time_stage("chroma_write"):
+        vector_store.add_texts(texts=[text], metadatas=[metadata], ids=[chunk_id])
     # Persist the vector store to disk
-    vector_store.persist()
-    logger.debug(f"Successfully persisted chunk with id: {chunk_id}")
+    with time_stage("chroma_persist"):
+        vector_store.persist()
+    logger.debug("Successfully persisted chunk with id: %s", chunk_id)
+
+def embed_and_store_batch(texts, metadatas, ids, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embeds and stores many chunks, embedding `batch_size` texts per model call
+    and persisting once at the end instead of after every chunk.
+    """
+    logger.debug("Embedding and storing %s chunks in batches of %s", len(texts), batch_size)
+    for start in range(0, len(texts), batch_size):
+        end = start + batch_size
+        with time_stage("chroma_write"):
+            vector_store.add_texts(texts=texts[start:end], metadatas=metadatas[start:end], ids=ids[start:end])
+    with time_stage("chroma_persist"):
+        vector_store.persist()
+    logger.debug("Successfully persisted %s chunks", len(texts))
 
-def retrieve(query, k=5, filter=None):
-    """Retrieves the top k most similar documents to the given query."""
-    logger.info(f"Retrieving top {k} documents for query: '{query}' with filter: {filter}")
-    # Retrieve the most similar documents to the query
-    results = vector_store.similarity_search_with_score(query, k=k, filter=filter)
-    logger.debug(f"Raw retrieval results: {results}")
+def _mmr_search(query, k, fetch_k, lambda_mult, filter=None):
+    """Fetches `fetch_k` candidates with their embeddings and returns the first `k` in MMR order."""
+    query_embedding = embedding_function.embed_query(query)
+    candidates = vector_store._collection.query(
+        query_embeddings=[query_embedding],
+        n_results=fetch_k,
+        where=filter,
+        include=["documents", "metadatas", "distances", "embeddings"],
+    )
+    if not candidates["ids"] or not len(candidates["ids"][0]):
+        return []
+    order = mmr_order(query_embedding, candidates["embeddings"][0], k, lambda_mult)
+    return [
+        (candidates["documents"][0][i], candidates["metadatas"][0][i], candidates["distances"][0][i])
+        for i in order
+    ]
 
-    # Format the results as a dictionary
+@time_stage("retrieval")
+def retrieve(query, k=5, filter=None, mmr=False, lambda_mult=MMR_LAMBDA, fetch_k=None, cursor=None):
+    """
+    Retrieves the k most relevant chunks for the given query.
+
+    Args:
+        query: The search query.
+        k: The number of results to return (the page size when paginating).
+        filter: Optional metadata filter, e.g. {"doc_id": doc_id}.
+        mmr: Diversify results with maximal marginal relevance instead of
+             returning the top k by similarity alone.
+        lambda_mult: MMR trade-off between relevance (1.0) and diversity (0.0).
+        fetch_k: The number of results to rank. When larger than k, the
+                 results after the first page are kept and a `next_cursor`
+                 is returned. With MMR, this is also the candidate pool size
+                 (default k * MMR_FETCH_FACTOR).
+        cursor: A `next_cursor` from a previous call; returns the next page
+                of that search without re-running it (other arguments
+                except k are ignored). Raises CursorExpiredError if the
+                cursor is unknown or expired.
+
+    Returns:
+        A dictionary with the 'results' and the 'next_cursor' (or None).
+    """
+    if cursor:
+        page, next_cursor = result_cursors.next_page(cursor, k)
+        logger.info("Served %s paginated results.", len(page))
+        return {'results': page, 'next_cursor': next_cursor}
+
+    logger.info("Retrieving top %s documents for query: '%s' with filter: %s (mmr=%s)", k, Payload(query), filter, mmr)
+    if mmr:
+        pool_size = max(k, fetch_k or k * MMR_FETCH_FACTOR)
+        # Rank the whole pool so later pages continue the same MMR order
+        ranked = _mmr_search(query, pool_size if fetch_k else k, pool_size, lambda_mult, filter=filter)
+    else:
+        results = vector_store.similarity_search_with_score(query, k=max(k, fetch_k or k), filter=filter)
+        ranked = [(doc.page_content, doc.metadata, score) for doc, score in results]
+    logger.debug("Raw retrieval results: %s", Payload(ranked))
+
+    # Format the results as a list of dictionaries
+    formatted = [{'text': text, 'metadata': metadata, 'score': score} for text, metadata, score in ranked]
     formatted_results = {
-        'results': [
-            {
-                'text': doc.page_content,
-                'metadata': doc.metadata,
-                'score': score
-            }
-            for doc, score in results
-        ]
+        'results': formatted[:k],
+        'next_cursor': result_cursors.create(formatted[k:]),
     }
-    logger.info(f"Retrieved {len(formatted_results['results'])} documents.")
+    logger.info("Retrieved %s documents.", len(formatted_results['results']))
     return formatted_results
+
+def embed_texts(texts):
+    """Embeds a batch of texts with the store's embedding model, without storing them."""
+    return embedding_function.embed_documents(list(texts))
+
+def delete_document(doc_id):
+    """Removes every stored chunk of a document in one bulk delete and returns how many were removed."""
+    ids = vector_store.get(where={"doc_id": doc_id}, include=[])["ids"]
+    if ids:
+        vector_store.delete(ids=ids)
+        with time_stage("chroma_persist"):
+            vector_store.persist()
+    logger.info("Deleted %s vectors for doc_id: %s", len(ids), doc_id)
+    return len(ids)
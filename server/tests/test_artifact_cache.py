@@ -0,0 +1,81 @@
+import json
+import os
+
+from src.stores.artifact_cache import ArtifactCache
+
+def _generating(value):
+    return value.get("status") == "GENERATING"
+
+def test_least_recently_used_entries_spill_and_reload(tmp_path):
+    cache = ArtifactCache("quizzes", max_items=2, spill_dir=str(tmp_path))
+    cache.set("a", {"n": 1})
+    cache.set("b", {"n": 2})
+    cache.get("a")
+    cache.set("c", {"n": 3})
+
+    assert cache.stats()["memory_items"] == 2
+    assert cache.stats()["spilled_items"] == 1
+    assert cache.get("b") == {"n": 2}
+    assert cache.stats()["spilled_items"] == 1  # reloading "b" spilled "a"
+
+def test_entries_are_dropped_without_a_spill_dir():
+    cache = ArtifactCache("quizzes", max_items=1)
+    cache.set("a", {"n": 1})
+    cache.set("b", {"n": 2})
+    assert cache.get("a") is None
+    assert cache.get("b") == {"n": 2}
+
+def test_pinned_entries_are_never_evicted(tmp_path):
+    cache = ArtifactCache("quizzes", max_items=1, spill_dir=str(tmp_path), pinned=_generating)
+    cache.set("a", {"status": "GENERATING"})
+    cache.set("b", {"status": "COMPLETED"})
+    cache.set("c", {"status": "COMPLETED"})
+    assert list(cache._entries) == ["a"]
+    assert cache.stats()["spilled_items"] == 2
+    assert cache.shrink_memory(0) == 0
+    assert list(cache._entries) == ["a"]
+
+def test_expired_entries_are_removed_from_memory_and_disk(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.stores.artifact_cache.time.time", lambda: now[0])
+    cache = ArtifactCache("quizzes", max_items=1, ttl_seconds=10, spill_dir=str(tmp_path))
+    cache.set("a", {"n": 1})
+    cache.set("b", {"n": 2})
+    now[0] += 11
+
+    reclaimed = cache.expire()
+    assert reclaimed["items"] == 2
+    assert reclaimed["disk_bytes"] > 0
+    assert cache.get("a") is None and cache.get("b") is None
+    assert os.listdir(tmp_path / "quizzes") == []
+
+def test_spill_index_is_rebuilt_on_startup(tmp_path):
+    cache = ArtifactCache("quizzes", max_items=1, spill_dir=str(tmp_path))
+    cache.set("a", {"n": 1})
+    cache.set("b", {"n": 2})
+
+    restarted = ArtifactCache("quizzes", max_items=1, spill_dir=str(tmp_path))
+    assert restarted.stats()["spilled_items"] == 1
+    assert restarted.get("a") == {"n": 1}
+    assert restarted.delete("a") is True
+
+def test_delete_where_only_loads_spilled_entries_with_matching_keys(tmp_path):
+    cache = ArtifactCache("quizzes", max_items=1, spill_dir=str(tmp_path))
+    cache.set("quiz_doc1_x", {"doc_id": "doc1"})
+    cache.set("quiz_doc2_x", {"doc_id": "doc2"})
+    cache.set("quiz_doc1_y", {"doc_id": "doc1"})
+    # Corrupt the spilled entry of the other document: reading it would drop it from the index
+    with open(cache._spilled["quiz_doc2_x"], "w") as f:
+        f.write("not json")
+
+    deleted = cache.delete_where(lambda value: value.get("doc_id") == "doc1", lambda key: "doc1" in key)
+    assert deleted == 2
+    assert "quiz_doc2_x" in cache._spilled
+
+def test_shrink_disk_deletes_spilled_entries(tmp_path):
+    cache = ArtifactCache("quizzes", max_items=1, spill_dir=str(tmp_path))
+    for key in "abc":
+        cache.set(key, {"key": key})
+    assert cache.disk_bytes() > 0
+    assert cache.shrink_disk(0) > 0
+    assert cache.disk_bytes() == 0
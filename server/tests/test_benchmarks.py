@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from benchmarks.harness import BenchmarkResult, RssMonitor, compare_to_baseline, measure, percentile
+from src.pipeline.llm.prompt_composer import compose_batch_prompt, compose_generation_instruction, compose_prompt
+
+def _result(name="case", p50=10.0, p99=20.0, throughput=100.0, rss=10.0):
+    return BenchmarkResult(name, 10, 10, throughput, p50, p99, peak_rss_mb=500.0, rss_increase_mb=rss)
+
+def _baseline(**overrides):
+    base = {"p50_ms": 10.0, "p99_ms": 20.0, "throughput": 100.0, "rss_increase_mb": 10.0}
+    base.update(overrides)
+    return {"case": base}
+
+def test_percentile_uses_nearest_rank():
+    samples = [5, 1, 4, 2, 3]
+    assert percentile(samples, 50) == 3
+    assert percentile(samples, 99) == 5
+    assert percentile(samples, 0) == 1
+    assert percentile([7], 99) == 7
+
+def test_results_within_tolerance_pass():
+    assert compare_to_baseline([_result(p50=11.0, throughput=90.0, rss=12.0)], _baseline(), 0.2) == []
+
+def test_latency_and_throughput_regressions_are_reported():
+    regressions = compare_to_baseline([_result(p50=13.0, p99=30.0, throughput=70.0)], _baseline(), 0.2)
+    assert [regression.split(":")[1].split()[0] for regression in regressions] == ["p50_ms", "p99_ms", "throughput"]
+
+def test_rss_regressions_are_gated_with_slack():
+    assert compare_to_baseline([_result(rss=12.9)], _baseline(), 0.2) == []
+    assert "RSS increase" in compare_to_baseline([_result(rss=13.5)], _baseline(), 0.2)[0]
+    # Baselines recorded before RSS was compared are not gated on it
+    base = _baseline()
+    del base["case"]["rss_increase_mb"]
+    assert compare_to_baseline([_result(rss=100.0)], base, 0.2) == []
+
+def test_cases_missing_from_the_baseline_are_ignored():
+    assert compare_to_baseline([_result(name="new", p50=1000.0)], _baseline(), 0.2) == []
+
+def test_rss_monitor_sees_memory_allocated_inside_the_block():
+    with RssMonitor() as rss:
+        block = bytearray(64 * 1024 * 1024)
+        block[::4096] = b"x" * len(block[::4096])
+    assert rss.increase_mb >= 0.0
+    del block
+
+def test_measure_counts_items_and_records_rss_increase():
+    result = measure("case", lambda: 3, iterations=4, warmup=1)
+    assert result.items == 12 and result.iterations == 4
+    assert result.rss_increase_mb >= 0.0
+
+def test_stub_llm_answers_the_real_prompts():
+    fakes = pytest.importorskip("benchmarks.fakes")
+    llm = fakes.StubLLM()
+    quiz = compose_generation_instruction("quiz", {"difficulty": "easy", "question_count": 3})
+    flashcards = compose_generation_instruction("flashcards", {"count": 2})
+
+    single = llm.complete(compose_prompt("context", quiz))
+    assert len(json.loads(single.strip("`\n").removeprefix("json"))) == 3
+
+    batch = json.loads(llm.complete(compose_batch_prompt("context", {"task_0": quiz, "task_1": flashcards})))
+    assert len(batch["task_0"]) == 3 and len(batch["task_1"]) == 2
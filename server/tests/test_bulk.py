@@ -0,0 +1,74 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from src.pipeline.ingestion.storage import UploadTooLargeError, save_raw_stream
+
+def test_save_raw_stream_returns_bytes_written(tmp_path):
+    path = tmp_path / "doc.txt"
+    assert save_raw_stream(io.BytesIO(b"hello"), str(path), max_bytes=5) == 5
+    assert path.read_bytes() == b"hello"
+
+def test_save_raw_stream_stops_at_the_limit_and_removes_the_file(tmp_path):
+    path = tmp_path / "bomb.txt"
+    with pytest.raises(UploadTooLargeError):
+        save_raw_stream(io.BytesIO(b"x" * 10), str(path), max_bytes=9)
+    assert not path.exists()
+
+def test_compressed_member_is_capped_while_streaming(tmp_path):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("bomb.txt", b"0" * (8 * 1024 * 1024))
+    data.seek(0)
+    with zipfile.ZipFile(data) as archive, archive.open("bomb.txt") as member:
+        with pytest.raises(UploadTooLargeError):
+            save_raw_stream(member, str(tmp_path / "bomb.txt"), max_bytes=1024 * 1024)
+    assert not (tmp_path / "bomb.txt").exists()
+
+def test_open_batch_is_not_done_until_sealed():
+    bulk = pytest.importorskip("src.pipeline.ingestion.bulk")
+    batch = bulk.IngestionBatch(sealed=False)
+    batch.add("a", 10)
+    batch.record(True, chunk_count=3, size_bytes=10)
+    assert not batch.done
+    assert batch.progress()["status"] == "PROCESSING"
+
+    batch.add("b", 5)
+    batch.seal()
+    assert not batch.done
+    batch.record(False)
+    assert batch.done
+    progress = batch.progress()
+    assert progress["status"] == "COMPLETED"
+    assert (progress["total"], progress["processed"], progress["failed"], progress["bytes"]) == (2, 1, 1, 15)
+
+def test_seal_completes_a_batch_whose_documents_already_finished():
+    bulk = pytest.importorskip("src.pipeline.ingestion.bulk")
+    batch = bulk.IngestionBatch(sealed=False)
+    batch.add("a", 1)
+    batch.record(True)
+    batch.seal()
+    assert batch.done and batch.finished_at is not None
+
+def test_bulk_uploads_are_queued_under_their_base_name(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from types import SimpleNamespace
+
+    from src import main as app_main
+    from src.pipeline.ingestion.bulk import IngestionBatch
+
+    monkeypatch.setattr(app_main, "UPLOAD_DIR", str(tmp_path))
+    submitted = []
+    monkeypatch.setattr(app_main.executor, "submit", lambda fn, *args: submitted.append(args))
+    batch = IngestionBatch(sealed=False)
+    upload = SimpleNamespace(filename="../../notes.txt", file=io.BytesIO(b"hello"))
+
+    skipped, errors = app_main._store_bulk_uploads([upload], None, batch)
+    assert (skipped, errors) == ([], [])
+    doc = app_main.metadata_store.get_document(batch.doc_ids[0])
+    assert doc["status"] == "QUEUED"
+    assert doc["filename"] == "notes.txt"
+    assert os.path.dirname(doc["file_path"]) == str(tmp_path)
+    assert submitted == [(batch, doc["doc_id"])]
@@ -0,0 +1,70 @@
+from src.pipeline.ingestion.chunker import (
+    PAGE_SEPARATOR,
+    ChunkingConfig,
+    approximate_token_counts,
+    chunk_pages,
+    load_configs,
+)
+
+def _chars(texts):
+    """A token counter where every character is a token, to make limits exact."""
+    return [len(text) for text in texts]
+
+def test_chunks_never_exceed_the_limit_and_cover_the_text():
+    text = "\n\n".join(f"Paragraph {i} has a few words in it." for i in range(30))
+    chunks = chunk_pages([text], ".txt", max_input_tokens=20, config=ChunkingConfig(overlap_tokens=0))
+    assert all(chunk["token_count"] <= 20 for chunk in chunks)
+    assert all(text[chunk["start_offset"]:chunk["end_offset"]] == chunk["text"] for chunk in chunks)
+    assert [chunk["paragraph_id"] for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[0]["start_offset"] == 0 and chunks[-1]["end_offset"] == len(text)
+
+def test_long_paragraphs_split_at_sentences_then_words():
+    text = "One two three. Four five six seven eight nine ten eleven twelve."
+    chunks = chunk_pages([text], ".txt", count_tokens=_chars, max_input_tokens=20, config=ChunkingConfig(overlap_tokens=0, min_tokens=0))
+    words = set(text.split())
+    assert all(chunk["token_count"] <= 20 for chunk in chunks)
+    assert all(set(chunk["text"].split()) <= words for chunk in chunks)
+    assert chunks[0]["text"].startswith("One two three.")
+
+def test_runs_without_whitespace_are_hard_split():
+    blob = "x" * 1000
+    chunks = chunk_pages([f"Intro.\n\n{blob}"], ".txt", count_tokens=_chars, max_input_tokens=64, config=ChunkingConfig(overlap_tokens=0))
+    assert all(chunk["token_count"] <= 64 for chunk in chunks)
+    assert "".join(chunk["text"] for chunk in chunks[1:]) == blob
+
+def test_hard_split_uses_the_counter_not_characters():
+    # Two characters per token: pieces may be twice as long as the limit in characters
+    two_per_token = lambda texts: [-(-len(text) // 2) for text in texts]
+    chunks = chunk_pages(["y" * 500], ".txt", count_tokens=two_per_token, max_input_tokens=50, config=ChunkingConfig(overlap_tokens=0))
+    assert all(chunk["token_count"] <= 50 for chunk in chunks)
+    assert sum(len(chunk["text"]) for chunk in chunks) == 500
+
+def test_overlap_repeats_trailing_paragraphs():
+    text = "\n\n".join(["aaaa", "bbbb", "cccc", "dddd"])
+    chunks = chunk_pages([text], ".txt", count_tokens=_chars, max_input_tokens=10, config=ChunkingConfig(overlap_tokens=4, min_tokens=0))
+    assert [chunk["text"] for chunk in chunks] == ["aaaa\n\nbbbb", "bbbb\n\ncccc", "cccc\n\ndddd"]
+
+def test_markdown_headings_start_chunks_and_record_sections():
+    text = "# Title\n\nIntro text.\n\n## Part\n\nPart text."
+    chunks = chunk_pages([text], ".md", count_tokens=_chars, max_input_tokens=200, config=ChunkingConfig(respect_headings=True, min_tokens=0))
+    assert [chunk["section"] for chunk in chunks] == ["Title", "Title > Part"]
+
+def test_pdf_pages_start_chunks_and_record_page_numbers():
+    pages = ["Page one text.", "Page two text."]
+    chunks = chunk_pages(pages, ".pdf", count_tokens=_chars, max_input_tokens=200, config=ChunkingConfig(respect_pages=True, min_tokens=0))
+    assert [(chunk["page"], chunk["page_end"]) for chunk in chunks] == [(1, 1), (2, 2)]
+    assert chunks[1]["start_offset"] == len(pages[0]) + len(PAGE_SEPARATOR)
+
+def test_short_sections_are_merged_until_min_tokens():
+    pages = ["a", "b", "c"]
+    chunks = chunk_pages(pages, ".pdf", count_tokens=_chars, max_input_tokens=200, config=ChunkingConfig(respect_pages=True, min_tokens=2))
+    assert [(chunk["page"], chunk["page_end"]) for chunk in chunks] == [(1, 2), (3, 3)]
+
+def test_empty_document_has_no_chunks():
+    assert chunk_pages(["", "  "], ".txt") == []
+
+def test_config_overrides_and_approximate_counts():
+    configs = load_configs('{".pdf": {"chunk_tokens": 200, "respect_pages": false}, ".csv": {"overlap_tokens": 0}}')
+    assert configs[".pdf"].chunk_tokens == 200 and not configs[".pdf"].respect_pages
+    assert configs[".csv"].overlap_tokens == 0
+    assert approximate_token_counts(["Hello, world!"]) == [4]
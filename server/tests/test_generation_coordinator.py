@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.pipeline.llm.generation_coordinator import GenerationCoordinator, GenerationJob
+
+def _job(job_id, doc_id="doc"):
+    return GenerationJob("quiz", job_id, doc_id, {"question_count": 1})
+
+class Recorder:
+    def __init__(self, results=None, failures_before_success=0):
+        self.batches = []
+        self.results = results
+        self.failures_before_success = failures_before_success
+        self.lock = threading.Lock()
+
+    def run_batch(self, jobs):
+        with self.lock:
+            self.batches.append([job.job_id for job in jobs])
+            if len(self.batches) <= self.failures_before_success:
+                raise RuntimeError("LLM unavailable")
+        if self.results is not None:
+            return {job.job_id: self.results[job.job_id] for job in jobs if job.job_id in self.results}
+        return {job.job_id: [{"question": job.job_id}] for job in jobs}
+
+def _coordinator(recorder, executor, **kwargs):
+    succeeded, failed = [], []
+    coordinator = GenerationCoordinator(
+        executor,
+        recorder.run_batch,
+        on_success=lambda job, items: succeeded.append(job.job_id),
+        on_failure=lambda job, error: failed.append(job.job_id),
+        **kwargs,
+    )
+    return coordinator, succeeded, failed
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield pool
+    pool.shutdown(wait=True)
+
+def test_identical_jobs_are_coalesced(executor):
+    recorder = Recorder()
+    coordinator, succeeded, _ = _coordinator(recorder, executor, batch_window=0.05)
+    first = coordinator.submit(_job("q1"))
+    second = coordinator.submit(_job("q1"))
+    assert first is second
+    assert first.result(timeout=5) == [{"question": "q1"}]
+    assert recorder.batches == [["q1"]]
+    assert succeeded == ["q1"]
+    assert coordinator.in_flight == 0
+
+def test_jobs_for_one_document_are_batched_within_the_window(executor):
+    recorder = Recorder()
+    coordinator, _, _ = _coordinator(recorder, executor, batch_window=0.2)
+    futures = [coordinator.submit(_job("q1")), coordinator.submit(_job("q2")), coordinator.submit(_job("other", doc_id="doc2"))]
+    for future in futures:
+        future.result(timeout=5)
+    assert sorted(map(sorted, recorder.batches)) == [["other"], ["q1", "q2"]]
+
+def test_full_batch_is_dispatched_without_waiting_for_the_window(executor):
+    recorder = Recorder()
+    coordinator, _, _ = _coordinator(recorder, executor, batch_window=60, max_batch_size=2)
+    futures = [coordinator.submit(_job("q1")), coordinator.submit(_job("q2"))]
+    for future in futures:
+        future.result(timeout=5)
+    assert recorder.batches == [["q1", "q2"]]
+
+def test_failed_batch_is_retried_with_backoff(executor):
+    recorder = Recorder(failures_before_success=1)
+    coordinator, succeeded, failed = _coordinator(recorder, executor, batch_window=0, backoff_base=0.01)
+    assert coordinator.submit(_job("q1")).result(timeout=5) == [{"question": "q1"}]
+    assert recorder.batches == [["q1"], ["q1"]]
+    assert succeeded == ["q1"] and failed == []
+
+def test_only_missing_jobs_are_retried_and_exhausted_jobs_fail(executor):
+    recorder = Recorder(results={"q1": [{"question": "q1"}]})
+    coordinator, succeeded, failed = _coordinator(
+        recorder, executor, batch_window=60, max_batch_size=2, max_attempts=2, backoff_base=0.01
+    )
+    ok, missing = coordinator.submit(_job("q1")), coordinator.submit(_job("q2"))
+    assert ok.result(timeout=5) == [{"question": "q1"}]
+    with pytest.raises(ValueError):
+        missing.result(timeout=5)
+    assert recorder.batches == [["q1", "q2"], ["q2"]]
+    assert succeeded == ["q1"] and failed == ["q2"]
+
+def test_failed_jobs_are_retried_one_per_batch(executor):
+    class BatchFormatIgnored(Recorder):
+        def run_batch(self, jobs):
+            with self.lock:
+                self.batches.append([job.job_id for job in jobs])
+            # A combined prompt gets an unusable answer; a single-job prompt works
+            return {} if len(jobs) > 1 else {jobs[0].job_id: [{"question": jobs[0].job_id}]}
+
+    recorder = BatchFormatIgnored()
+    coordinator, succeeded, failed = _coordinator(
+        recorder, executor, batch_window=60, max_batch_size=2, max_attempts=2, backoff_base=0.01
+    )
+    futures = [coordinator.submit(_job("q1")), coordinator.submit(_job("q2"))]
+    for future in futures:
+        future.result(timeout=5)
+    assert recorder.batches[0] == ["q1", "q2"]
+    assert sorted(recorder.batches[1:]) == [["q1"], ["q2"]]
+    assert sorted(succeeded) == ["q1", "q2"] and failed == []
+
+def test_backoff_does_not_hold_an_executor_worker():
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        recorder = Recorder(failures_before_success=1)
+        coordinator, _, _ = _coordinator(recorder, pool, batch_window=0, backoff_base=0.5)
+        future = coordinator.submit(_job("q1"))
+        # While the retry is waiting out its backoff, the single worker is free for other work
+        assert pool.submit(lambda: "ingested").result(timeout=0.4) == "ingested"
+        assert future.result(timeout=5) == [{"question": "q1"}]
+    finally:
+        pool.shutdown(wait=True)
@@ -0,0 +1,77 @@
+import os
+import time
+
+from src.stores import metadata_store as metadata_store_module
+from src.stores.lifecycle import Compactor
+
+def _store(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata_store_module, "ARTIFACT_SPILL_DIR", str(tmp_path / "artifacts"))
+    return metadata_store_module.MetadataStore()
+
+def _upload(directory, name, age_seconds=0):
+    path = directory / name
+    path.write_bytes(b"x" * 100)
+    past = time.time() - age_seconds
+    os.utime(path, (past, past))
+    return str(path)
+
+def test_processed_uploads_and_orphans_are_reclaimed(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch)
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    store.add_document("done", "done.txt", _upload(uploads, "done.txt", 100))
+    store.update_document_status("done", "PROCESSED")
+    store.documents["done"]["status_updated_at"] -= 100
+    store.add_document("pending", "pending.txt", _upload(uploads, "pending.txt", 100))
+    _upload(uploads, "orphan.txt", 100)
+    _upload(uploads, "fresh_orphan.txt")
+
+    report = Compactor(store, str(uploads), upload_retention="delete_processed", upload_grace_seconds=10).run_once()
+
+    assert report["uploads_deleted"] == 1
+    assert report["orphans_deleted"] == 1
+    assert sorted(os.listdir(uploads)) == ["fresh_orphan.txt", "pending.txt"]
+    assert store.get_document("done")["file_path"] is None
+
+def test_orphan_scan_tolerates_documents_added_concurrently(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch)
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    store.add_document("a", "a.txt", _upload(uploads, "a.txt", 100))
+
+    snapshot = store.list_documents()
+    store.add_document("b", "b.txt", _upload(uploads, "b.txt", 100))
+    assert [doc["doc_id"] for doc in snapshot] == ["a"]
+
+    report = Compactor(store, str(uploads), upload_retention="delete_processed", upload_grace_seconds=10).run_once()
+    assert report["orphans_deleted"] == 0
+
+def test_delete_document_removes_its_artifacts(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch)
+    store.add_document("doc1", "a.txt", "a.txt")
+    store.add_document("doc2", "b.txt", "b.txt")
+    store.create_quiz("quiz_doc1_x", "doc1", {})
+    store.create_quiz("quiz_doc2_x", "doc2", {})
+    store.create_summary("doc1")
+
+    deleted = store.delete_document("doc1")
+    assert deleted["artifacts_deleted"] == 2
+    assert store.get_quiz("quiz_doc2_x") is not None
+    assert store.get_documents_by_status("UPLOADED") == [store.get_document("doc2")]
+
+def test_memory_budget_spills_artifacts(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch)
+    for i in range(5):
+        store.create_quiz(f"quiz_doc_{i}", "doc", {})
+        store.update_quiz_status(f"quiz_doc_{i}", "COMPLETED", [{"question": "q" * 100}])
+
+    report = Compactor(store, str(tmp_path / "uploads"), memory_budget_bytes=300).run_once()
+    assert report["memory_bytes_reclaimed"] > 0
+    assert report["artifacts"]["quizzes"]["spilled_items"] > 0
+
+def test_documents_can_be_registered_as_queued(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch)
+    store.add_document("bulk", "a.txt", "a.txt", status="QUEUED")
+    store.add_document("single", "b.txt", "b.txt")
+    assert store.get_document("bulk")["status"] == "QUEUED"
+    assert store.get_documents_by_status("UPLOADED") == [store.get_document("single")]
@@ -0,0 +1,58 @@
+import logging
+import queue
+
+from src.pipeline.shared.logging_config import JsonFormatter, NonBlockingQueueHandler, Payload
+
+class _Counted:
+    renders = 0
+
+    def __str__(self):
+        _Counted.renders += 1
+        return "counted"
+
+def _logger(handler, level=logging.DEBUG):
+    logger = logging.getLogger("tests.logging_config")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+def test_message_is_rendered_on_the_calling_thread():
+    log_queue = queue.Queue()
+    logger = _logger(NonBlockingQueueHandler(log_queue))
+    items = ["a"]
+    logger.info("items: %s", items)
+    items.append("b")
+
+    record = log_queue.get_nowait()
+    assert record.msg == "items: ['a']"
+    assert record.args is None
+    assert record.getMessage() == "items: ['a']"
+
+def test_disabled_levels_never_render_payloads():
+    log_queue = queue.Queue()
+    logger = _logger(NonBlockingQueueHandler(log_queue), level=logging.INFO)
+    _Counted.renders = 0
+    logger.debug("payload: %s", Payload(_Counted()))
+    assert _Counted.renders == 0
+    assert log_queue.empty()
+
+def test_exceptions_are_rendered_to_text():
+    log_queue = queue.Queue()
+    logger = _logger(NonBlockingQueueHandler(log_queue))
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+
+    record = log_queue.get_nowait()
+    assert record.exc_info is None
+    assert "ValueError: boom" in record.exc_text
+    assert "ValueError: boom" in JsonFormatter().format(record)
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    logger = _logger(handler)
+    logger.info("one")
+    logger.info("two")
+    assert handler.dropped == 1
@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.pipeline.llm.map_reduce import MapExecutor, item_text, partition_sections, reduce_candidates
+
+def _chunks(count):
+    return [{"paragraph_id": i, "text": f"chunk {i}"} for i in range(count)]
+
+def _ids(sections):
+    return [[chunk["paragraph_id"] for chunk in section] for section in sections]
+
+def test_small_document_is_split_into_contiguous_sections():
+    sections = partition_sections(_chunks(25), max_sections=8, section_chunks=10)
+    assert len(sections) == 3
+    assert sum(_ids(sections), []) == list(range(25))
+
+def test_sections_grow_to_cover_large_documents():
+    sections = partition_sections(_chunks(160), max_sections=8, section_chunks=10, max_section_chunks=25)
+    assert len(sections) == 8
+    assert sum(_ids(sections), []) == list(range(160))
+
+def test_documents_beyond_the_cap_are_sampled_evenly():
+    sections = partition_sections(_chunks(1000), max_sections=4, section_chunks=10, max_section_chunks=20)
+    assert [len(section) for section in sections] == [20, 20, 20, 20]
+    ids = sum(_ids(sections), [])
+    assert ids == sorted(ids) and ids[0] == 0 and ids[-1] == 999
+
+def test_empty_document_has_no_sections():
+    assert partition_sections([], 8, 10) == []
+
+def _embed(texts):
+    # Items with the same first word embed identically
+    vocabulary = sorted({text.split()[0] for text in texts})
+    return [[1.0 if text.split()[0] == word else 0.0 for word in vocabulary] for text in texts]
+
+def test_reduce_deduplicates_and_interleaves_sections():
+    candidates = [
+        [{"question": "alpha one"}, {"question": "beta one"}],
+        [{"question": "alpha two"}, {"question": "gamma two"}],
+    ]
+    reduced = reduce_candidates(candidates, 3, _embed)
+    assert [item["question"] for item in reduced] == ["alpha one", "beta one", "gamma two"]
+
+def test_reduce_returns_fewer_items_when_too_many_are_duplicates():
+    reduced = reduce_candidates([[{"front": "same a"}, {"front": "same b"}]], 2, _embed)
+    assert len(reduced) == 1
+
+def test_item_text_prefers_question_or_front():
+    assert item_text({"question": "Q?", "answer": "A"}) == "Q?"
+    assert item_text({"front": "F", "back": "B"}) == "F"
+    assert item_text({"other": 1}) == '{"other": 1}'
+
+def test_map_sections_isolates_failing_sections():
+    executor = MapExecutor(max_concurrency=2)
+
+    def map_fn(section):
+        if section == "bad":
+            raise RuntimeError("boom")
+        return {"section": section}
+
+    assert executor.map_sections(["a", "bad", "b"], map_fn) == [{"section": "a"}, {}, {"section": "b"}]
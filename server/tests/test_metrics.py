@@ -0,0 +1,80 @@
+import pytest
+
+from src.pipeline.shared import metrics
+from src.pipeline.shared.metrics import Registry
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+def _samples(text):
+    """Parses rendered metrics into {series: value}, skipping comments."""
+    return {line.rsplit(" ", 1)[0]: line.rsplit(" ", 1)[1] for line in text.splitlines() if line and not line.startswith("#")}
+
+def test_histogram_buckets_are_cumulative_and_edges_are_inclusive(registry):
+    histogram = registry.histogram("latency_seconds", "Latency.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 5.0):
+        histogram.observe(value, stage="x")
+
+    samples = _samples(registry.render())
+    assert samples['latency_seconds_bucket{stage="x",le="0.1"}'] == "2"
+    assert samples['latency_seconds_bucket{stage="x",le="1"}'] == "4"
+    assert samples['latency_seconds_bucket{stage="x",le="+Inf"}'] == "5"
+    assert samples['latency_seconds_count{stage="x"}'] == "5"
+    assert float(samples['latency_seconds_sum{stage="x"}']) == pytest.approx(6.65)
+
+def test_timer_observes_elapsed_time(registry):
+    histogram = registry.histogram("op_seconds", "Op.")
+    with histogram.time():
+        pass
+
+    @histogram.time()
+    def op():
+        return 1
+
+    assert op() == 1
+    assert _samples(registry.render())["op_seconds_count"] == "2"
+
+def test_rendered_text_format_and_label_escaping(registry):
+    counter = registry.counter("jobs_total", "Jobs done.", ["kind"])
+    counter.inc(kind='say "hi"\\now\n')
+    counter.inc(2, kind="plain")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP jobs_total Jobs done.", "# TYPE jobs_total counter"]
+    assert 'jobs_total{kind="say \\"hi\\"\\\\now\\n"} 1' in lines
+    assert 'jobs_total{kind="plain"} 2' in lines
+    assert registry.render().endswith("\n")
+
+def test_registering_a_name_twice_returns_the_same_metric(registry):
+    assert registry.counter("a_total", "A.") is registry.counter("a_total", "A.")
+
+def test_gauge_functions_are_computed_at_scrape_time(registry):
+    gauge = registry.gauge("queue_depth", "Depth.", ["pool"])
+    depth = [3]
+    gauge.set_function(lambda: depth[0], pool="main")
+    depth[0] = 7
+    assert _samples(registry.render())['queue_depth{pool="main"}'] == "7"
+    depth[0] = 1.5
+    assert _samples(registry.render())['queue_depth{pool="main"}'] == "1.5"
+
+def test_gauge_functions_that_raise_are_skipped(registry):
+    gauge = registry.gauge("broken", "Broken.", ["pool"])
+    gauge.set_function(lambda: 1 / 0, pool="bad")
+    gauge.set(4, pool="ok")
+    samples = _samples(registry.render())
+    assert samples == {'broken{pool="ok"}': "4"}
+
+def test_disabled_metrics_record_nothing(registry, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    counter = registry.counter("c_total", "C.")
+    gauge = registry.gauge("g", "G.")
+    histogram = registry.histogram("h_seconds", "H.")
+    counter.inc()
+    gauge.set(1)
+    gauge.inc()
+    gauge.set_function(lambda: 1)
+    histogram.observe(0.1)
+    with histogram.time():
+        pass
+    assert _samples(registry.render()) == {}
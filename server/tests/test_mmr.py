@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from src.pipeline.retrieval.mmr import mmr_order
+
+def _reference_mmr(query, candidates, k, lambda_mult):
+    """A direct, loop-based MMR to check the vectorized version against."""
+    def cosine(a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    selected = []
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            redundancy = max((cosine(candidate, candidates[j]) for j in selected), default=0.0)
+            score = lambda_mult * cosine(candidate, query) - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+def test_matches_the_reference_implementation():
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=16)
+    candidates = rng.normal(size=(40, 16))
+    for lambda_mult in (0.0, 0.3, 0.5, 1.0):
+        assert mmr_order(query, candidates, 10, lambda_mult) == _reference_mmr(query, candidates, 10, lambda_mult)
+
+def test_relevance_only_orders_by_similarity_to_the_query():
+    query = [1.0, 0.0]
+    candidates = [[0.0, 1.0], [1.0, 0.1], [1.0, 0.5]]
+    assert mmr_order(query, candidates, 3, lambda_mult=1.0) == [1, 2, 0]
+
+def test_diversity_skips_near_duplicates():
+    query = [1.0, 0.2]
+    candidates = [[1.0, 0.0], [1.0, 0.01], [0.6, 0.8]]
+    assert mmr_order(query, candidates, 2, lambda_mult=1.0) == [1, 0]
+    assert mmr_order(query, candidates, 2, lambda_mult=0.5) == [1, 2]
+
+def test_k_is_capped_and_empty_input_selects_nothing():
+    assert mmr_order([1.0, 0.0], [[1.0, 0.0]], 5) == [0]
+    assert mmr_order([1.0, 0.0], [], 5) == []
+
+def test_zero_vectors_do_not_produce_nans():
+    assert sorted(mmr_order([1.0, 0.0], [[0.0, 0.0], [1.0, 0.0]], 2)) == [0, 1]
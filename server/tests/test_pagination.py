@@ -0,0 +1,50 @@
+import pytest
+
+from src.pipeline.retrieval.pagination import CursorExpiredError, ResultCursors
+
+def _results(n):
+    return [{"id": i} for i in range(n)]
+
+def test_pages_through_results_until_exhausted():
+    cursors = ResultCursors()
+    cursor = cursors.create(_results(5))
+    page, cursor = cursors.next_page(cursor, 2)
+    assert [r["id"] for r in page] == [0, 1]
+    page, cursor = cursors.next_page(cursor, 2)
+    assert [r["id"] for r in page] == [2, 3]
+    page, cursor = cursors.next_page(cursor, 2)
+    assert [r["id"] for r in page] == [4]
+    assert cursor is None
+
+def test_no_cursor_when_nothing_remains():
+    assert ResultCursors().create([]) is None
+
+def test_cursors_are_single_use():
+    cursors = ResultCursors()
+    cursor = cursors.create(_results(3))
+    cursors.next_page(cursor, 1)
+    with pytest.raises(CursorExpiredError):
+        cursors.next_page(cursor, 1)
+
+def test_cursors_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.pipeline.retrieval.pagination.time.time", lambda: now[0])
+    cursors = ResultCursors(ttl_seconds=10)
+    cursor = cursors.create(_results(3))
+    now[0] += 11
+    with pytest.raises(CursorExpiredError):
+        cursors.next_page(cursor, 1)
+
+def test_oldest_cursors_are_dropped_beyond_the_limit():
+    cursors = ResultCursors(max_cursors=2)
+    first = cursors.create(_results(1))
+    second = cursors.create(_results(1))
+    third = cursors.create(_results(1))
+    with pytest.raises(CursorExpiredError):
+        cursors.next_page(first, 1)
+    assert cursors.next_page(second, 1)[0] == [{"id": 0}]
+    assert cursors.next_page(third, 1)[0] == [{"id": 0}]
+
+def test_unknown_cursor_is_rejected():
+    with pytest.raises(CursorExpiredError):
+        ResultCursors().next_page("missing", 1)
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from src.pipeline.llm.precompute import Precomputer, PrecomputeTask
+
+def _task(session_id, doc_id="doc", name="quiz", ran=None, result=True):
+    def run():
+        if ran is not None:
+            ran.append((session_id, doc_id, name))
+        return result
+    return PrecomputeTask(name, doc_id, session_id, run)
+
+def _drain(precomputer, timeout=2.0):
+    deadline = time.time() + timeout
+    while precomputer.stats()["queued"] and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+def test_tasks_beyond_the_session_budget_are_dropped():
+    ran = []
+    precomputer = Precomputer(lambda: True, session_budget=2)
+    precomputer.start()
+    precomputer.enqueue([_task("s1", name=str(i), ran=ran) for i in range(4)])
+    _drain(precomputer)
+    assert len(ran) == 2
+    assert precomputer.remaining_budget("s1") == 0
+    assert precomputer.remaining_budget("s2") == 2
+
+def test_skipped_tasks_are_not_charged():
+    precomputer = Precomputer(lambda: True, session_budget=2)
+    precomputer.start()
+    precomputer.enqueue([_task("s1", result=False) for _ in range(3)])
+    _drain(precomputer)
+    assert precomputer.remaining_budget("s1") == 2
+
+def test_documents_without_a_session_do_not_share_a_budget():
+    ran = []
+    precomputer = Precomputer(lambda: True, session_budget=1)
+    precomputer.start()
+    precomputer.enqueue([_task(None, doc_id="a", ran=ran), _task(None, doc_id="b", ran=ran), _task(None, doc_id="b", ran=ran)])
+    _drain(precomputer)
+    assert ran == [(None, "a", "quiz"), (None, "b", "quiz")]
+    assert precomputer.remaining_budget(None, "c") == 1
+
+def test_budgets_expire_and_are_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.pipeline.llm.precompute.time.time", lambda: now[0])
+    precomputer = Precomputer(lambda: True, session_budget=1, budget_ttl_seconds=10, max_budgets=2)
+    for session_id in ("s1", "s2", "s3"):
+        precomputer._charge(_task(session_id))
+    assert precomputer.stats()["sessions"] == 2
+    assert precomputer.remaining_budget("s1") == 1
+
+    now[0] += 11
+    assert precomputer.remaining_budget("s3") == 1
+    precomputer._charge(_task("s4"))
+    assert precomputer.stats()["sessions"] == 1
+
+def test_waits_until_idle():
+    idle = threading.Event()
+    ran = []
+    precomputer = Precomputer(idle.is_set, idle_poll_interval=0.01)
+    precomputer.start()
+    precomputer.enqueue([_task("s1", ran=ran)])
+    time.sleep(0.1)
+    assert ran == []
+    idle.set()
+    _drain(precomputer)
+    assert len(ran) == 1
+
+def test_discard_drops_queued_tasks_for_a_document():
+    precomputer = Precomputer(lambda: False, idle_poll_interval=0.01)
+    precomputer.start()
+    precomputer.enqueue([_task("s1", doc_id="a"), _task("s1", doc_id="b")])
+    precomputer.discard("a")
+    assert precomputer.stats()["queued"] == 1
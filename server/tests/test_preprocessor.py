@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+pytest.importorskip("nltk")
+from src.pipeline.ingestion import preprocessor
+
+@pytest.fixture
+def no_nltk_data(monkeypatch):
+    """Stands in for the NLTK corpora: a small stopword list and identity lemmas."""
+    monkeypatch.setattr(preprocessor, "_stop_words", frozenset({"the", "a", "is"}))
+    monkeypatch.setattr(preprocessor, "lemmatize", lambda word: word)
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(preprocessor, "PREPROCESS_WORKERS", 2)
+    monkeypatch.setattr(preprocessor, "_pool", None)
+    yield
+    preprocessor._shutdown_pool()
+
+def test_tokens_are_words_not_whitespace_runs(no_nltk_data):
+    text = "The cat's toy is red,blue... and (green)!"
+    assert preprocessor.preprocess_text(text) == "cat's toy red blue and green"
+    # Splitting on whitespace would keep punctuation glued to the words
+    assert "red,blue..." in text.lower().split()
+
+def test_stopwords_are_loaded_once_on_first_use(monkeypatch):
+    import nltk.corpus
+
+    calls = []
+
+    class Stopwords:
+        def words(self, language):
+            calls.append(language)
+            return ["the"]
+
+    monkeypatch.setattr(nltk.corpus, "stopwords", Stopwords())
+    monkeypatch.setattr(preprocessor, "_stop_words", None)
+    monkeypatch.setattr(preprocessor, "lemmatize", lambda word: word)
+    assert preprocessor.preprocess_text("the end") == "end"
+    assert preprocessor.preprocess_text("the start") == "start"
+    assert calls == ["english"]
+
+def test_missing_stopwords_name_the_data_directory(monkeypatch):
+    import nltk.corpus
+
+    class Missing:
+        def words(self, language):
+            raise LookupError("stopwords not found")
+
+    monkeypatch.setattr(nltk.corpus, "stopwords", Missing())
+    monkeypatch.setattr(preprocessor, "_stop_words", None)
+    with pytest.raises(LookupError, match="nltk.downloader"):
+        preprocessor.preprocess_text("text")
+
+def test_serial_batch_keeps_order(no_nltk_data):
+    texts = [f"chunk {i} is the {i}th" for i in range(10)]
+    assert preprocessor.preprocess_batch(texts, parallel=False) == [f"chunk {i} {i}th" for i in range(10)]
+
+def test_pool_is_created_once_with_spawned_workers(pool):
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(preprocessor._get_pool())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(created) for created in pools}) == 1
+    assert pools[0]._mp_context.get_start_method() == "spawn"
+
+def test_parallel_batch_keeps_order(pool):
+    try:
+        preprocessor._get_stop_words()
+        preprocessor.lemmatize("cats")
+    except LookupError:
+        pytest.skip("NLTK data is not installed")
+    texts = [f"chunk number {i}" for i in range(7)]
+    expected = preprocessor.preprocess_batch(texts, parallel=False)
+    assert preprocessor.preprocess_batch(texts, parallel=True) == expected
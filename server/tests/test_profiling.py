@@ -0,0 +1,71 @@
+import time
+
+from src.pipeline.shared import profiling
+
+def _wait_for(profile_id, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        captured = profiling.store.get(profile_id)
+        if captured is not None:
+            return captured
+        time.sleep(0.01)
+    return None
+
+def test_unforced_block_is_not_profiled_without_sampling(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    with profiling.profile("noop") as captured:
+        assert captured is None
+
+def test_sampling_profile_is_stored_after_the_sampler_stops():
+    with profiling.profile("work", forced=True, mode="sampling") as captured:
+        with profiling.span("stage"):
+            time.sleep(0.05)
+    stored = _wait_for(captured.profile_id)
+    assert stored is captured
+    assert [child.name for child in stored.root.children] == ["stage"]
+
+def test_stop_does_not_wait_for_the_sampler():
+    captured = profiling.Profile("p", True, "sampling")
+    sampler = profiling.StackSampler(captured, interval=0.5)
+    sampler.start()
+    started = time.perf_counter()
+    sampler.stop()
+    assert time.perf_counter() - started < 0.1
+    sampler.join(timeout=2)
+
+def test_requested_job_keys_force_one_profiled_run(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    seen = []
+
+    @profiling.profiled("job", keys=lambda key: [key])
+    def job(key):
+        seen.append(profiling.current_profile())
+
+    profiling.request_profile("doc-1")
+    job("doc-1")
+    job("doc-1")
+    assert seen[0] is not None and seen[0].forced
+    assert seen[1] is None
+
+def test_profiler_start_up_errors_run_the_job_unprofiled(monkeypatch):
+    class BusyProfiler:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    def fail_to_start(self):
+        raise RuntimeError("can't start new thread")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfiler)
+    monkeypatch.setattr(profiling.StackSampler, "start", fail_to_start)
+    ran = []
+
+    @profiling.profiled("job", keys=lambda key: [key])
+    def job(key):
+        ran.append(profiling.current_profile())
+
+    for mode in ("cprofile", "sampling"):
+        monkeypatch.setattr(profiling, "PROFILE_MODE", mode)
+        profiling.request_profile("doc-1")
+        job("doc-1")
+    assert ran == [None, None]
+    assert profiling.current_profile() is None
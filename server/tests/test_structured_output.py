@@ -0,0 +1,108 @@
+import pytest
+
+pytest.importorskip("pydantic")
+from src.pipeline.llm.structured_output import (
+    StructuredOutputError,
+    StructuredOutputStats,
+    extract_items,
+    parse_json_tolerant,
+    validate_items,
+)
+
+QUIZ = '[{"question": "q1", "options": ["a", "b"], "answer": "a"}, {"question": "q2", "options": ["c", "d"], "answer": "d"}]'
+
+def test_clean_json_is_not_recovered():
+    value, recovered = parse_json_tolerant(QUIZ)
+    assert len(value) == 2 and not recovered
+
+def test_code_fences_and_prose_are_ignored():
+    value, recovered = parse_json_tolerant(f"Here is your quiz:\n```json\n{QUIZ}\n```")
+    assert len(value) == 2 and recovered
+
+def test_truncated_item_is_dropped_not_half_kept():
+    value, recovered = parse_json_tolerant(QUIZ[:-30])
+    assert recovered
+    assert value == [{"question": "q1", "options": ["a", "b"], "answer": "a"}]
+
+def test_truncated_inside_a_string():
+    value, _ = parse_json_tolerant('[{"front": "a", "back": "b"}, {"front": "c", "back": "unfinished')
+    assert value == [{"front": "a", "back": "b"}]
+
+def test_truncated_batch_response_keeps_complete_lists():
+    value, _ = parse_json_tolerant('{"job1": [{"front": "a", "back": "b"}], "job2": [{"front": "c", "back": "d"}, {"fr')
+    assert value == {"job1": [{"front": "a", "back": "b"}], "job2": [{"front": "c", "back": "d"}]}
+
+def test_bracketed_prose_before_the_value_is_skipped():
+    value, recovered = parse_json_tolerant(f"As noted in [1] and [see above], the quiz is: {QUIZ}")
+    assert len(value) == 2 and recovered
+
+def test_bracketed_prose_before_a_truncated_value_is_skipped():
+    value, _ = parse_json_tolerant(f"See [1]. {QUIZ[:-30]}")
+    assert value == [{"question": "q1", "options": ["a", "b"], "answer": "a"}]
+
+def test_no_json_raises():
+    with pytest.raises(StructuredOutputError):
+        parse_json_tolerant("Sorry, I cannot help with that.")
+
+def test_quiz_items_are_validated_individually():
+    items = [
+        {"question": "ok", "options": ["a", "b"], "answer": "b"},
+        {"question": "no options", "options": [], "answer": "a"},
+        {"question": "missing options", "answer": "a"},
+        {"question": "answer not an option", "options": ["a", "b"], "answer": "c"},
+        {"question": " ", "options": ["a"], "answer": "a"},
+        {"question": 7, "options": [1, 2], "answer": 2},
+    ]
+    valid, rejected = validate_items(items, "quiz")
+    assert [item["question"] for item in valid] == ["ok", "7"]
+    assert rejected == 4
+
+def test_letter_and_index_answers_become_the_option_text():
+    items = [
+        {"question": "letter", "options": ["A) x", "B) y"], "answer": "A"},
+        {"question": "label", "options": ["x", "y"], "answer": "b)"},
+        {"question": "labelled text", "options": ["x", "y"], "answer": "B) y"},
+        {"question": "index", "options": ["x", "y"], "answer": 1},
+        {"question": "case", "options": ["True", "False"], "answer": "false"},
+        {"question": "no such letter", "options": ["x", "y"], "answer": "C"},
+        {"question": "no such index", "options": ["x", "y"], "answer": 5},
+    ]
+    valid, rejected = validate_items(items, "quiz")
+    assert [item["answer"] for item in valid] == ["A) x", "y", "y", "y", "False"]
+    assert rejected == 2
+
+def test_only_multiple_choice_questions_need_options():
+    open_question = {"question": "Why?", "answer": "Because."}
+    assert validate_items([open_question], "quiz") == ([], 1)
+    assert validate_items([open_question], "quiz", ["short-answer"]) == ([open_question], 0)
+
+    typed = [
+        {"question": "Why?", "type": "short_answer", "answer": "Because."},
+        {"question": "Which?", "type": "Multiple choice", "answer": "x"},
+        {"question": "True?", "type": "true-false", "options": ["True", "False"], "answer": "Maybe"},
+    ]
+    valid, rejected = validate_items(typed, "quiz", ["multiple-choice", "short-answer", "true-false"])
+    assert valid == [typed[0]]
+    assert rejected == 2
+
+def test_flashcards_accept_numbers_and_reject_blanks():
+    valid, rejected = validate_items([{"front": 1, "back": "one"}, {"front": "x", "back": ""}, "not a card"], "flashcards")
+    assert valid == [{"front": "1", "back": "one"}]
+    assert rejected == 2
+
+def test_extract_items_finds_the_list():
+    assert extract_items([1], "quiz") == [1]
+    assert extract_items({"quiz": [1], "other": [2]}, "quiz") == [1]
+    assert extract_items({"questions": [1]}, "quiz") == [1]
+    assert extract_items({"job": {"questions": [1]}}, "quiz", key="job") == [1]
+    assert extract_items({"a": [1], "b": [2]}, "quiz") is None
+
+def test_stats_count_saved_calls():
+    stats = StructuredOutputStats()
+    stats.record_response(recovered=False, items=5, rejected=0)
+    stats.record_response(recovered=True, items=3, rejected=1)
+    stats.record_continuation(items_added=2)
+    report = stats.report()
+    assert report["saved_calls"] == 1
+    assert report["net_calls_saved"] == 0
+    assert report["items_rejected"] == 1